@@ -10,13 +10,7 @@ from opentelemetry.sdk.metrics import MeterProvider
 from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 
 from pnorm import AsyncPostgresClient, PostgresCredentials, QueryContext
-from pnorm.hooks.opentelemetry import (
-    RequestsCounterHook,
-    RequestsFailureHook,
-    RequestsSuccessHook,
-    RequestsTimingHook,
-    SpanHook,
-)
+from pnorm.hooks.opentelemetry import OpenTelemetryHook
 
 db_client = AsyncPostgresClient(
     PostgresCredentials(
@@ -69,13 +63,7 @@ async def read_root(db: ClientDep) -> dict[str, dict[str, Any]]:
             operation_name="select",
             query_summary="select from test",
         ),
-        hooks=[
-            SpanHook(),
-            RequestsCounterHook(),
-            RequestsTimingHook(),
-            RequestsSuccessHook(),
-            RequestsFailureHook(),
-        ],
+        hooks=[OpenTelemetryHook()],
     )
     return {"message": res}
 
@@ -1,13 +1,24 @@
 from .async_client import AsyncPostgresClient
+from .batch_writer import BatchWriter
 from .credentials import PostgresCredentials
+from .deadlines import deadline
 from .exceptions import (
     ConnectionAlreadyEstablishedException,
     ConnectionNotEstablishedException,
+    DeadlineExceededException,
     MarshallRecordException,
     MultipleRecordsReturnedException,
     NoRecordsReturnedException,
 )
-from .pnorm_types import PostgresJSON, QueryContext
+from .loader import Loader
+from .pnorm_types import (
+    HedgePolicy,
+    Notification,
+    PostgresJSON,
+    QueryContext,
+    RetryPolicy,
+)
+from .sharded_client import ShardedPostgresClient
 from .sync_client import PostgresClient
 
 __all__ = [
@@ -20,5 +31,13 @@ __all__ = [
     "PostgresJSON",
     "PostgresClient",
     "AsyncPostgresClient",
+    "ShardedPostgresClient",
+    "Loader",
+    "BatchWriter",
     "QueryContext",
+    "RetryPolicy",
+    "HedgePolicy",
+    "Notification",
+    "deadline",
+    "DeadlineExceededException",
 ]
@@ -0,0 +1,246 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import random
+import time
+from collections.abc import Sequence
+from functools import partial
+from typing import Any, Awaitable, Callable, Optional, TypeVar, get_args
+
+import psycopg
+from psycopg import sql
+from pydantic import BaseModel
+
+from . import deadlines
+from .credentials import CredentialsDict, CredentialsProtocol, PostgresCredentials
+from .hooks.base import BaseHook, HookContext, RetryOperation
+from .pnorm_types import IsolationLevel, Query, SynchronousCommit
+
+ResultT = TypeVar("ResultT")
+
+# Serialization failures (40001) and deadlocks (40P01) succeed when the
+# transaction is run again
+RETRYABLE_TRANSACTION_ERRORS = (
+    psycopg.errors.SerializationFailure,
+    psycopg.errors.DeadlockDetected,
+)
+
+
+def get_credentials(
+    credentials: CredentialsProtocol | CredentialsDict | PostgresCredentials,
+) -> PostgresCredentials:
+    # Want to keep as the PostgresCredentials class for SecretStr
+    if isinstance(credentials, PostgresCredentials):
+        return credentials
+
+    if isinstance(credentials, dict):
+        return PostgresCredentials.model_validate(credentials)
+
+    return PostgresCredentials.model_validate(credentials.as_dict())
+
+
+async def gather_targets(
+    target_selects: Sequence[tuple[str, Callable[[], Awaitable[tuple[Any, ...]]]]],
+    max_concurrency: int,
+    hooks: list[BaseHook],
+    hook_context: HookContext,
+) -> list[tuple[Any, ...]]:
+    """Rows of each target's select, in the order of `target_selects`"""
+
+    def timed(
+        target: str,
+        select: Callable[[], Awaitable[tuple[Any, ...]]],
+    ) -> Callable[[], Awaitable[tuple[Any, ...]]]:
+        async def run() -> tuple[Any, ...]:
+            start = time.perf_counter()
+            rows = await select()
+            duration = time.perf_counter() - start
+            apply_gather_hooks(hooks, hook_context, target, duration, len(rows))
+            return rows
+
+        return run
+
+    return await run_concurrently(
+        [timed(target, select) for target, select in target_selects],
+        max_concurrency,
+    )
+
+
+async def run_concurrently(
+    calls: Sequence[Callable[[], Awaitable[ResultT]]],
+    max_concurrency: int,
+) -> list[ResultT]:
+    """Results of `calls` in order, running at most `max_concurrency` at once
+
+    When one fails the others are cancelled and its exception is raised.
+    """
+    if max_concurrency < 1:
+        raise ValueError("max_concurrency must be at least 1")
+
+    slots = asyncio.Semaphore(max_concurrency)
+
+    async def run(call: Callable[[], Awaitable[ResultT]]) -> ResultT:
+        async with slots:
+            return await call()
+
+    tasks = [asyncio.create_task(run(call)) for call in calls]
+
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+
+def merge_results(
+    results: Sequence[tuple[Any, ...]],
+    order_by: Optional[str | Sequence[str]],
+    descending: bool,
+) -> tuple[Any, ...]:
+    if order_by is None:
+        return tuple(itertools.chain.from_iterable(results))
+
+    columns = (order_by,) if isinstance(order_by, str) else tuple(order_by)
+
+    # Each target's rows are already sorted, a k-way merge keeps them sorted
+    return tuple(
+        heapq.merge(
+            *results,
+            key=partial(_get_sort_key, columns=columns),
+            reverse=descending,
+        )
+    )
+
+
+def get_columns(row: Any, columns: Sequence[str]) -> tuple[Any, ...]:
+    if isinstance(row, BaseModel):
+        return tuple(getattr(row, column) for column in columns)
+
+    return tuple(row[column] for column in columns)
+
+
+def _get_sort_key(row: Any, columns: Sequence[str]) -> tuple[tuple[Any, ...], ...]:
+    # Postgres sorts nulls after every value, so first when descending, and
+    # nulls are never compared to values or each other
+    return tuple(
+        (True,) if value is None else (False, value)
+        for value in get_columns(row, columns)
+    )
+
+
+def describe_target(credentials: PostgresCredentials) -> str:
+    addresses = ",".join(f"{host}:{port}" for host, port in credentials.addresses())
+    return f"{addresses}/{credentials.dbname}"
+
+
+def get_retry_delay(
+    attempt: int,
+    retries: int,
+    backoff: float,
+    max_backoff: float,
+) -> Optional[float]:
+    """Seconds to wait before retrying, or None when it shouldn't be retried"""
+    if attempt > retries:
+        return None
+
+    # Exponential backoff with full jitter
+    delay = random.uniform(0, min(max_backoff, backoff * 2 ** (attempt - 1)))
+    remaining = deadlines.remaining_time()
+
+    # The retry couldn't finish before the deadline
+    if remaining is not None and remaining <= delay:
+        return None
+
+    return delay
+
+
+def get_transaction_options_statement(
+    isolation: Optional[IsolationLevel],
+    read_only: bool,
+    deferrable: bool,
+    synchronous_commit: Optional[SynchronousCommit],
+) -> Optional[sql.Composed]:
+    modes: list[sql.Composable] = []
+    statements: list[sql.Composable] = []
+
+    if isolation is not None:
+        if isolation not in get_args(IsolationLevel):
+            raise ValueError(f"Invalid isolation level: {isolation}")
+
+        modes.append(sql.SQL(f"isolation level {isolation}"))
+
+    if read_only:
+        modes.append(sql.SQL("read only"))
+
+    if deferrable:
+        modes.append(sql.SQL("deferrable"))
+
+    if len(modes) > 0:
+        statements.append(
+            sql.SQL("set transaction {}").format(sql.SQL(", ").join(modes))
+        )
+
+    if synchronous_commit is not None:
+        if synchronous_commit not in get_args(SynchronousCommit):
+            raise ValueError(f"Invalid synchronous_commit: {synchronous_commit}")
+
+        statements.append(
+            sql.SQL("set local synchronous_commit = {}").format(
+                sql.Literal(synchronous_commit)
+            )
+        )
+
+    if len(statements) == 0:
+        return None
+
+    return sql.SQL("; ").join(statements)
+
+
+def apply_retry_hooks(
+    hooks: list[BaseHook],
+    hook_context: Optional[HookContext],
+    operation: RetryOperation,
+    attempt: int,
+    exception: BaseException,
+    delay: float,
+) -> None:
+    for hook in hooks:
+        hook.on_retry(hook_context, operation, attempt, exception, delay)
+
+
+def apply_gather_hooks(
+    hooks: list[BaseHook],
+    hook_context: HookContext,
+    target: str,
+    duration: float,
+    rows_returned: int,
+) -> None:
+    for hook in hooks:
+        hook.on_gather_target(hook_context, target, duration, rows_returned)
+
+
+def query_as_string(query: Query) -> str:
+    """The query's SQL, without a connection to render it with"""
+    if isinstance(query, str):
+        return query
+
+    if isinstance(query, bytes):
+        return query.decode("utf-8")
+
+    if isinstance(query, sql.Composable):
+        return query.as_string(None)
+
+    return str(query)
+
+
+def merge_hooks(
+    default_hooks: Optional[list[BaseHook]],
+    hooks: Optional[list[BaseHook]],
+) -> list[BaseHook]:
+    """The client's default hooks followed by the query's hooks"""
+    return [*(default_hooks or []), *(hooks or [])]
@@ -1,25 +1,72 @@
 from __future__ import annotations
 
 import asyncio
-from collections.abc import MutableMapping, Sequence
-from contextlib import asynccontextmanager
-from typing import Any, AsyncGenerator, Literal, Optional, cast, overload
+import dataclasses
+import re
+from collections.abc import (
+    AsyncIterable,
+    Iterable,
+    Mapping,
+    MutableMapping,
+    Sequence,
+)
+from contextlib import asynccontextmanager, nullcontext
+from functools import partial
+from typing import (
+    Any,
+    AsyncGenerator,
+    Awaitable,
+    Callable,
+    Literal,
+    Optional,
+    TypeVar,
+    cast,
+    overload,
+)
 
 import psycopg
-from psycopg import AsyncConnection
+from psycopg import AsyncConnection, AsyncCursor, sql
+from psycopg.pq import TransactionStatus
 from psycopg.rows import DictRow, dict_row
 from pydantic import BaseModel
 from rcheck import r
 
+from . import deadlines
+from . import replicas as replicas_module
+from ._util import (
+    RETRYABLE_TRANSACTION_ERRORS,
+    apply_retry_hooks,
+    describe_target,
+    gather_targets,
+    get_columns,
+    get_credentials,
+    get_retry_delay,
+    get_transaction_options_statement,
+    merge_hooks,
+    merge_results,
+    query_as_string,
+    run_concurrently,
+)
 from .async_cursor import SingleCommitCursor, TransactionCursor
+from .batch_writer import BatchWriter
 from .credentials import CredentialsDict, CredentialsProtocol, PostgresCredentials
 from .exceptions import (
     ConnectionAlreadyEstablishedException,
+    DeadlineExceededException,
+    MarshallRecordException,
     MultipleRecordsReturnedException,
     NoRecordsReturnedException,
     connection_not_created,
 )
-from .hooks.base import BaseHook
+from .hooks.attributes import TelemetryOptions
+from .hooks.base import (
+    BaseHook,
+    BatchOperation,
+    HookContext,
+    QueryPhase,
+    StartedHooks,
+)
+from .loader import Loader
 from .mapping_utilities import (
     combine_into_return,
     combine_many_into_return,
@@ -29,11 +76,66 @@ from .mapping_utilities import (
 from .pnorm_types import (
     BaseModelMappingT,
     BaseModelT,
+    HedgePolicy,
+    IsolationLevel,
     MappingT,
+    Notification,
     ParamType,
     Query,
     QueryContext,
+    ReplicaSelection,
+    RetryPolicy,
+    SynchronousCommit,
 )
+from .replicas import Replica, ReplicaSet
+
+FetchT = TypeVar("FetchT")
+ResultT = TypeVar("ResultT")
+ResultT1 = TypeVar("ResultT1")
+ResultT2 = TypeVar("ResultT2")
+ResultT3 = TypeVar("ResultT3")
+ResultT4 = TypeVar("ResultT4")
+ResultT5 = TypeVar("ResultT5")
+
+# Seconds to wait for the server to acknowledge a query cancellation
+_CANCEL_TIMEOUT = 5.0
+
+# prefer-standby is tried as standby on every host before connecting to any
+_TARGET_SESSION_ATTRS_PASSES: dict[Optional[str], tuple[Optional[str], ...]] = {
+    "prefer-standby": ("standby", "any"),
+}
+
+# Server errors that mean the connection was lost: connection exceptions
+# (class 08), and the server shutting down or starting up
+_CONNECTION_ERROR_SQLSTATES = ("57P01", "57P02", "57P03")
+
+# Extra seconds given to the server to enforce a deadline before the client
+# gives up on the query
+_DEADLINE_GRACE = 0.5
+
+# Local to the current transaction, which the query is part of. The previous
+# value is kept to restore it in a transaction
+_SET_STATEMENT_TIMEOUT = """
+select
+    set_config('pnorm.statement_timeout', current_setting('statement_timeout'), true),
+    set_config('statement_timeout', %(timeout)s, true)
+"""
+_RESTORE_STATEMENT_TIMEOUT = """
+select set_config(
+    'statement_timeout',
+    current_setting('pnorm.statement_timeout'),
+    true
+)
+"""
+
+# Comments and whitespace before the first keyword of a query
+_LEADING_COMMENTS = re.compile(r"^(\s+|--[^\n]*(\n|$)|/\*.*?\*/)*", re.DOTALL)
+
+# Queries that can be wrapped in a subquery to limit the rows they return
+_LIMITABLE_QUERY = re.compile(r"(select|values|table|with)\b", re.IGNORECASE)
+
+# Statements that can't be inside a subquery, or that write to the database
+_UNLIMITABLE_QUERY = re.compile(r"\b(insert|update|delete|merge|into)\b", re.IGNORECASE)
 
 
 class AsyncPostgresClient:
@@ -42,6 +144,16 @@ class AsyncPostgresClient:
         credentials: CredentialsProtocol | CredentialsDict | PostgresCredentials,
         auto_create_connection: bool = True,
         hooks: Optional[list[BaseHook]] = None,
+        telemetry_options: Optional[TelemetryOptions] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        replicas: Optional[
+            Sequence[CredentialsProtocol | CredentialsDict | PostgresCredentials]
+        ] = None,
+        replica_selection: ReplicaSelection = "round_robin",
+        read_your_writes: bool = False,
+        max_replica_wait: float = 1.0,
+        hedge_policy: Optional[HedgePolicy] = None,
+        single_flight: bool = False,
     ) -> None:
         """Async Postgres Client
 
@@ -53,14 +165,35 @@ class AsyncPostgresClient:
             Whether to automatically create a connection when executing a query
         hooks: Optional[list[BaseHook]] = None
             List of hooks to run before and after the query. See pnorm.hooks.opentelemetry for examples
+        telemetry_options: Optional[TelemetryOptions] = None
+            Limits and sampling for the parameters recorded by hooks
+        retry_policy: Optional[RetryPolicy] = None
+            Retry reads outside of transactions after a connection error.
+            Defaults to no retries
+        replicas: Optional[Sequence[CredentialsProtocol | CredentialsDict | PostgresCredentials]] = None
+            Read replicas of the database in `credentials`. get, find and
+            select outside of a transaction are run on a replica, everything
+            else on the primary
+        replica_selection: ReplicaSelection = "round_robin"
+            How a replica is chosen for a read, either in turn or the one with
+            the fewest running queries and lowest latency. A session keeps
+            using the same replica
+        read_your_writes: bool = False
+            After a write, wait for the replica to replay it before reading
+            from it in the same context (asyncio task)
+        max_replica_wait: float = 1.0
+            Seconds to wait for a replica to replay a write before reading
+            from the primary instead
+        hedge_policy: Optional[HedgePolicy] = None
+            Send reads that are slow to answer to a second replica as well.
+            Needs at least two replicas. Hedged reads inside a session use
+            their own connections
+        single_flight: bool = False
+            Identical get, find and select calls (same SQL and parameters)
+            made while one is already running outside of a transaction wait
+            for its result instead of querying the database again
         """
-        # Want to keep as the PostgresCredentials class for SecretStr
-        if isinstance(credentials, PostgresCredentials):
-            self.credentials = credentials
-        elif isinstance(credentials, dict):
-            self.credentials = PostgresCredentials.model_validate(credentials)
-        else:
-            self.credentials = PostgresCredentials.model_validate(credentials.as_dict())
+        self.credentials = get_credentials(credentials)
 
         self.connection: AsyncConnection[DictRow] | None = None
         self.auto_create_connection = r.check_bool(
@@ -72,6 +205,32 @@ class AsyncPostgresClient:
         )
         self.user_set_schema: str | None = None
         self.default_hooks = hooks
+        self.telemetry_options = telemetry_options or TelemetryOptions()
+        self.retry_policy = retry_policy
+        self.replicas = (
+            ReplicaSet(
+                [get_credentials(replica) for replica in replicas],
+                replica_selection,
+            )
+            if replicas is not None
+            else None
+        )
+        self.read_your_writes = r.check_bool("read_your_writes", read_your_writes)
+        self.hedge_policy = hedge_policy
+        self.max_replica_wait = max_replica_wait
+        if hedge_policy is not None and (
+            self.replicas is None or len(self.replicas.replicas) < 2
+        ):
+            raise ValueError("Hedged reads need at least two replicas")
+
+        # Cancelled hedged reads that are still closing their connection
+        self._background_tasks: set[asyncio.Task[Any]] = set()
+        self.single_flight = r.check_bool("single_flight", single_flight)
+        # Result of each read in flight, shared with identical reads
+        self._flights: dict[tuple[Any, ...], asyncio.Future[Any]] = {}
+        # Replica used by reads inside the current session
+        self.replica_connection: AsyncConnection[DictRow] | None = None
+        self.session_replica: Replica | None = None
 
     async def set_schema(self, *, schema: str) -> None:
         """Set the schema for the current session"""
@@ -161,49 +320,53 @@ class AsyncPostgresClient:
         query_as_string = await self._query_as_string(query)
         query_params = get_params("Query Params", params)
         hooks = self._get_hooks(hooks)
-
-        async with self._handle_auto_connection():
-            async with self.cursor(self.connection) as cursor:
-                _apply_pre_hooks(hooks, query_as_string, query_params, query_context)
-
-                try:
-                    async with asyncio.timeout(timeout):
-                        await cursor.execute(query, query_params)
-                        query_result = await cursor.fetchmany(2)
-                except asyncio.TimeoutError as e:
-                    _apply_exception_hooks(hooks, e)
-
-                    if self.connection is not None:
-                        self.connection.cancel()
-
-                    raise
+        hook_context = HookContext(
+            query_as_string,
+            query_params,
+            query_context,
+            self.telemetry_options,
+        )
+        started_hooks = _apply_pre_hooks(hooks, hook_context)
+
+        query_result = await self._execute_read(
+            started_hooks,
+            hook_context,
+            _limit_query(query, query_as_string, 2),
+            query_params,
+            lambda cursor: cursor.fetchmany(2),
+            "get",
+            timeout=timeout,
+        )
 
         if len(query_result) >= 2:
             msg = f"Received two or more records for query: {query_as_string}"
-            _apply_post_hooks(hooks, "error", len(query_result))
+            _apply_post_hooks(started_hooks, hook_context, "error", len(query_result))
             raise MultipleRecordsReturnedException(msg)
 
         single: MutableMapping[str, Any]
         if len(query_result) == 0:
             if default is None:
                 msg = f"Did not receive any records for query: {query_as_string}"
-                _apply_post_hooks(hooks, "error", 0)
+                _apply_post_hooks(started_hooks, hook_context, "error", 0)
                 raise NoRecordsReturnedException(msg)
 
-            _apply_post_hooks(hooks, "success", 0)
+            _apply_post_hooks(started_hooks, hook_context, "success", 0)
             if isinstance(default, BaseModel):
                 single = default.model_dump()
             else:
                 single = default
         else:
             single = query_result[0]
-            _apply_post_hooks(hooks, "success", 1)
+            _apply_post_hooks(started_hooks, hook_context, "success", 1)
 
-        return combine_into_return(
+        result = combine_into_return(
             return_model,
             single,
             params if combine_into_return_model else None,
         )
+        _apply_phase_hooks(started_hooks, hook_context, "marshal_complete")
+
+        return result
 
     @overload
     async def find(
@@ -308,37 +471,42 @@ class AsyncPostgresClient:
         query_params = get_params("Query Params", params)
         query_result: DictRow | BaseModel | MappingT | None
         hooks = self._get_hooks(hooks)
-
-        async with self._handle_auto_connection():
-            async with self.cursor(self.connection) as cursor:
-                _apply_pre_hooks(hooks, query_as_string, query_params, query_context)
-
-                try:
-                    async with asyncio.timeout(timeout):
-                        await cursor.execute(query, query_params)
-                        query_result = await cursor.fetchone()
-                except asyncio.TimeoutError as e:
-                    _apply_exception_hooks(hooks, e)
-
-                    if self.connection is not None:
-                        self.connection.cancel()
-
-                    raise
+        hook_context = HookContext(
+            query_as_string,
+            query_params,
+            query_context,
+            self.telemetry_options,
+        )
+        started_hooks = _apply_pre_hooks(hooks, hook_context)
+
+        query_result = await self._execute_read(
+            started_hooks,
+            hook_context,
+            _limit_query(query, query_as_string, 1),
+            query_params,
+            lambda cursor: cursor.fetchone(),
+            "find",
+            timeout=timeout,
+        )
 
         if query_result is None:
-            _apply_post_hooks(hooks, "success", 0)
+            _apply_post_hooks(started_hooks, hook_context, "success", 0)
 
             if default is None:
                 return None
 
             query_result = default
+        else:
+            _apply_post_hooks(started_hooks, hook_context, "success", 1)
 
-        _apply_post_hooks(hooks, "success", 1)
-        return combine_into_return(
+        result = combine_into_return(
             return_model,
             query_result,
             params if combine_into_return_model else None,
         )
+        _apply_phase_hooks(started_hooks, hook_context, "marshal_complete")
+
+        return result
 
     @overload
     async def select(
@@ -405,29 +573,33 @@ class AsyncPostgresClient:
 
         query_params = get_params("Query Params", params)
         hooks = self._get_hooks(hooks)
+        hook_context = HookContext(
+            query_as_string,
+            query_params,
+            query_context,
+            self.telemetry_options,
+        )
+        started_hooks = _apply_pre_hooks(hooks, hook_context)
+
+        query_result = await self._execute_read(
+            started_hooks,
+            hook_context,
+            query,
+            query_params,
+            lambda cursor: cursor.fetchall(),
+            "select",
+            timeout=timeout,
+        )
 
-        async with self._handle_auto_connection():
-            async with self.cursor(self.connection) as cursor:
-                _apply_pre_hooks(hooks, query_as_string, query_params, query_context)
-
-                try:
-                    async with asyncio.timeout(timeout):
-                        await cursor.execute(query, query_params)
-                        query_result = await cursor.fetchall()
-                except asyncio.TimeoutError as e:
-                    _apply_exception_hooks(hooks, e)
-
-                    if self.connection is not None:
-                        self.connection.cancel()
-
-                    raise
-
-        _apply_post_hooks(hooks, "success", len(query_result))
+        _apply_post_hooks(started_hooks, hook_context, "success", len(query_result))
 
         if len(query_result) == 0:
             return tuple()
 
-        return combine_many_into_return(return_model, query_result)
+        result = combine_many_into_return(return_model, query_result)
+        _apply_phase_hooks(started_hooks, hook_context, "marshal_complete")
+
+        return result
 
     async def execute(
         self,
@@ -457,205 +629,2330 @@ class AsyncPostgresClient:
 
         query_params = get_param_maybe_list("Query Params", params)
         hooks = self._get_hooks(hooks)
+        hook_context = HookContext(
+            query_as_string,
+            query_params,
+            query_context,
+            self.telemetry_options,
+        )
+        started_hooks = _apply_pre_hooks(hooks, hook_context)
+
+        await self._execute_query(
+            started_hooks,
+            hook_context,
+            query,
+            query_params,
+            _fetch_nothing,
+            timeout=timeout,
+        )
 
-        async with self._handle_auto_connection():
-            async with self.cursor(self.connection) as cursor:
-                _apply_pre_hooks(hooks, query_as_string, query_params, query_context)
-
-                try:
-                    async with asyncio.timeout(timeout):
-                        if isinstance(query_params, Sequence):
-                            await cursor.executemany(query, query_params)
-                        else:
-                            await cursor.execute(query, query_params)
-
-                        _apply_post_hooks(
-                            hooks,
-                            "success",
-                            rows_returned=0,
-                            batch_size=(
-                                len(query_params)
-                                if isinstance(query_params, Sequence)
-                                else 1
-                            ),
-                        )
-                except asyncio.TimeoutError as e:
-                    _apply_exception_hooks(hooks, e)
-
-                    if self.connection is not None:
-                        self.connection.cancel()
-
-                    raise
+        _apply_post_hooks(
+            started_hooks,
+            hook_context,
+            "success",
+            rows_returned=0,
+            batch_size=(len(query_params) if isinstance(query_params, Sequence) else 1),
+        )
 
-    @asynccontextmanager
-    async def start_session(
+    async def execute_many(
         self,
+        query: Query,
+        params: Iterable[ParamType] | AsyncIterable[ParamType],
         *,
-        schema: Optional[str] = None,
-    ) -> AsyncGenerator[AsyncPostgresClient, None]:
-        """Start database session
+        chunk_size: int = 1000,
+        timeout: Optional[float] = None,
+        query_context: Optional[QueryContext] = None,
+        hooks: Optional[list[BaseHook]] = None,
+    ) -> int:
+        """Execute a SQL query once for each set of parameters, sending them
+        in chunks
+
+        Parameters are taken from `params` one chunk at a time, so generators
+        of any length can be executed without holding all of them in memory.
+        Each chunk is sent in a pipeline and runs as its own query for the
+        hooks. Outside of a transaction each chunk is committed on its own, a
+        failure leaves the chunks before it in place.
 
         Parameters
         ----------
-        schema : Optional[str] = None
-            Schema to set for the session
+        query : str
+            SQL query to execute
+        params : Iterable[Mapping[str, Any] | BaseModel] | AsyncIterable[Mapping[str, Any] | BaseModel]
+            Named parameters for each execution of the SQL query
+        chunk_size : int = 1000
+            Maximum number of parameter sets sent at once
+        timeout : Optional[float] = None
+            Amount of time in seconds to wait for each chunk to complete. Default to no timeout
+        query_context : Optional[QueryContext] = None
+            Query metadata for telemetry purposes
+        hooks: Optional[list[BaseHook]] = None
+            List of hooks to run before and after each chunk.
+            BaseHook.on_batch is called as each chunk finishes
+
+        Returns
+        -------
+        int
+            Number of parameter sets executed
 
         Examples
         --------
-        async with db.start_session() as session:
-            await session.get(...)
+        await db.execute_many(
+            "insert into events (id, name) values (%(id)s, %(name)s)",
+            read_events(path),
+            chunk_size=500,
+        )
         """
-        original_auto_create_connection = self.auto_create_connection
-        self.auto_create_connection = False
-        close_connection_after_use = False
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1")
 
-        if self.connection is None:
-            await self._create_connection()
-            close_connection_after_use = True
+        if isinstance(params, BaseModel | Mapping):
+            msg = "execute_many takes an iterable of parameters, use execute for one"
+            raise ValueError(msg)
 
-        if schema is not None:
-            await self.set_schema(schema=schema)
+        query_as_string = await self._query_as_string(query)
+        hooks = self._get_hooks(hooks)
+        executed = 0
+        batch = 0
 
-        try:
-            yield self
-        except:
-            await self._rollback()
-            raise
-        finally:
-            if self.connection is not None and close_connection_after_use:
-                await self._end_connection()
+        # One connection for every chunk instead of one each
+        async with self._handle_auto_connection():
+            async for chunk in _chunk_params(params, chunk_size):
+                batch += 1
+                query_params = [
+                    get_params("Query Params", chunk_params) for chunk_params in chunk
+                ]
+                hook_context = HookContext(
+                    query_as_string,
+                    query_params,
+                    query_context,
+                    self.telemetry_options,
+                )
+                started_hooks = _apply_pre_hooks(hooks, hook_context)
+
+                await self._execute_query(
+                    started_hooks,
+                    hook_context,
+                    query,
+                    query_params,
+                    _fetch_nothing,
+                    timeout=timeout,
+                )
+
+                _apply_post_hooks(
+                    started_hooks,
+                    hook_context,
+                    "success",
+                    rows_returned=0,
+                    batch_size=len(query_params),
+                )
+                _apply_batch_hooks(
+                    hooks,
+                    hook_context,
+                    "execute_many",
+                    batch,
+                    len(query_params),
+                )
+                executed += len(query_params)
+
+        return executed
+
+    async def execute_in_batches(
+        self,
+        query: Query,
+        params: Optional[ParamType] = None,
+        *,
+        batch_size: int = 1000,
+        pause: float = 0.0,
+        timeout: Optional[float] = None,
+        query_context: Optional[QueryContext] = None,
+        hooks: Optional[list[BaseHook]] = None,
+    ) -> int:
+        """Run an update or delete that affects at most `batch_size` rows
+        again and again until it no longer affects any
 
-            self.auto_create_connection = original_auto_create_connection
+        Each run is committed on its own, so locks are held and WAL is written
+        a batch at a time instead of all at once. The query limits itself
+        with the `batch_size` parameter, usually by picking the rows through
+        their ctid or primary key.
 
-    @asynccontextmanager
-    async def start_transaction(self) -> AsyncGenerator[AsyncPostgresClient, None]:
-        """Start a transaction
+        Parameters
+        ----------
+        query : str
+            SQL query to execute, using the %(batch_size)s parameter
+        params : Optional[Mapping[str, Any] | BaseModel] = None
+            Named parameters for the SQL query
+        batch_size : int = 1000
+            Maximum number of rows the query should affect each time
+        pause : float = 0.0
+            Seconds to wait between batches, to leave room for other queries
+        timeout : Optional[float] = None
+            Amount of time in seconds to wait for each batch to complete. Default to no timeout
+        query_context : Optional[QueryContext] = None
+            Query metadata for telemetry purposes
+        hooks: Optional[list[BaseHook]] = None
+            List of hooks to run before and after each batch.
+            BaseHook.on_batch is called with the rows affected by each batch
+
+        Returns
+        -------
+        int
+            Number of rows affected by all batches
+
+        Raises
+        ------
+        RuntimeError
+            When called in a transaction, the batches couldn't be committed
+            on their own
 
         Examples
         --------
-        async with session.start_transaction() as tx:
-            await tx.get(...)
+        await db.execute_in_batches(
+            '''
+            delete from events
+            where ctid = any(array(
+                select ctid from events where ts < %(before)s limit %(batch_size)s
+            ))
+            ''',
+            {"before": before},
+            batch_size=10_000,
+            pause=0.5,
+        )
         """
-        self._create_transaction()
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
 
-        try:
-            yield self
-        except:
-            await self._rollback()
-            raise
-        finally:
-            await self._end_transaction()
+        if isinstance(self.cursor, TransactionCursor):
+            msg = "execute_in_batches can't run in a transaction"
+            raise RuntimeError(msg)
 
-    async def _create_connection(self) -> None:
-        if self.connection is not None:
-            raise ConnectionAlreadyEstablishedException()
+        query_as_string = await self._query_as_string(query)
+        query_params = {
+            **(get_params("Query Params", params) or {}),
+            "batch_size": batch_size,
+        }
+        hooks = self._get_hooks(hooks)
+        total_rows = 0
+        batch = 0
 
-        self.connection = cast(
-            AsyncConnection[DictRow],
-            await psycopg.AsyncConnection.connect(
-                **self.credentials.as_dict(),
-                row_factory=dict_row,
-            ),
-        )
+        # One connection for every batch instead of one each
+        async with self._handle_auto_connection():
+            while True:
+                if batch > 0 and pause > 0:
+                    await asyncio.sleep(pause)
+
+                batch += 1
+                hook_context = HookContext(
+                    query_as_string,
+                    query_params,
+                    query_context,
+                    self.telemetry_options,
+                )
+                started_hooks = _apply_pre_hooks(hooks, hook_context)
+
+                rows = await self._execute_query(
+                    started_hooks,
+                    hook_context,
+                    query,
+                    query_params,
+                    _fetch_rowcount,
+                    timeout=timeout,
+                )
+
+                _apply_post_hooks(
+                    started_hooks,
+                    hook_context,
+                    "success",
+                    rows_returned=0,
+                )
+                _apply_batch_hooks(
+                    hooks,
+                    hook_context,
+                    "execute_in_batches",
+                    batch,
+                    rows,
+                )
+                total_rows += rows
+
+                if rows == 0:
+                    return total_rows
 
-    async def _end_connection(self) -> None:
-        if self.connection is None:
-            connection_not_created()
+    @overload
+    async def gather_select(
+        self,
+        return_model: type[BaseModelT],
+        query: Query,
+        params: Optional[ParamType] = None,
+        *,
+        targets: Sequence[CredentialsProtocol | CredentialsDict | PostgresCredentials],
+        order_by: Optional[str | Sequence[str]] = None,
+        descending: bool = False,
+        max_concurrency: int = 10,
+        timeout: Optional[float] = None,
+        query_context: Optional[QueryContext] = None,
+        hooks: Optional[list[BaseHook]] = None,
+    ) -> tuple[BaseModelT, ...]: ...
 
-        self.cursor.close()
-        await self.connection.close()
-        self.connection = None
+    @overload
+    async def gather_select(
+        self,
+        return_model: type[MappingT],
+        query: Query,
+        params: Optional[ParamType] = None,
+        *,
+        targets: Sequence[CredentialsProtocol | CredentialsDict | PostgresCredentials],
+        order_by: Optional[str | Sequence[str]] = None,
+        descending: bool = False,
+        max_concurrency: int = 10,
+        timeout: Optional[float] = None,
+        query_context: Optional[QueryContext] = None,
+        hooks: Optional[list[BaseHook]] = None,
+    ) -> tuple[MappingT, ...]: ...
 
-    async def _rollback(self) -> None:
-        if self.connection is None:
-            connection_not_created()
+    async def gather_select(
+        self,
+        return_model: type[BaseModelT] | type[MappingT],
+        query: Query,
+        params: Optional[ParamType] = None,
+        *,
+        targets: Sequence[CredentialsProtocol | CredentialsDict | PostgresCredentials],
+        order_by: Optional[str | Sequence[str]] = None,
+        descending: bool = False,
+        max_concurrency: int = 10,
+        timeout: Optional[float] = None,
+        query_context: Optional[QueryContext] = None,
+        hooks: Optional[list[BaseHook]] = None,
+    ) -> tuple[BaseModelT, ...] | tuple[MappingT, ...]:
+        """Run the same query on several databases at once and return all of
+        their rows
 
-        await self.connection.rollback()
+        Each target gets its own connection, with this client's hooks,
+        telemetry options and retry policy. When any target fails the
+        others are cancelled and the exception is raised.
 
-    def _create_transaction(self) -> None:
-        self.cursor = TransactionCursor(self)
+        Parameters
+        ----------
+        return_model : type[T of BaseModel]
+            Pydantic model to marshall the SQL query results into
+        query : str
+            SQL query to execute
+        params : Optional[Mapping[str, Any] | BaseModel] = None
+            Named parameters for the SQL query
+        targets : Sequence[CredentialsProtocol | CredentialsDict | PostgresCredentials]
+            Databases to run the query on
+        order_by : Optional[str | Sequence[str]] = None
+            Columns the query sorts its rows by. The sorted rows of each
+            target are merged so the result is sorted too. Without it the
+            rows are returned target by target, in the order of `targets`
+        descending : bool = False
+            Whether the query sorts the `order_by` columns in descending order
+        max_concurrency : int = 10
+            Maximum number of targets queried at the same time
+        timeout : Optional[float] = None
+            Amount of time in seconds to wait for the query to complete on each target. Default to no timeout
+        query_context : Optional[QueryContext] = None
+            Query metadata for telemetry purposes
+        hooks: Optional[list[BaseHook]] = None
+            List of hooks to run before and after the query on each target.
+            BaseHook.on_gather_target is called as each target finishes
 
-    async def _end_transaction(self) -> None:
-        await self.cursor.commit()
-        self.cursor = SingleCommitCursor(self)
+        Examples
+        --------
+        orders = await db.gather_select(
+            Order,
+            "select * from orders where created_at > %(since)s order by created_at",
+            {"since": since},
+            targets=[tenant_1_credentials, tenant_2_credentials],
+            order_by="created_at",
+        )
+        """
+        # Rendered without a connection, the query runs on the targets only
+        hook_context = HookContext(
+            query_as_string(query),
+            get_params("Query Params", params),
+            query_context,
+            self.telemetry_options,
+        )
+        target_selects = []
+
+        for credentials in targets:
+            client = AsyncPostgresClient(
+                credentials,
+                hooks=self.default_hooks,
+                telemetry_options=self.telemetry_options,
+                retry_policy=self.retry_policy,
+            )
+            target_selects.append(
+                (
+                    describe_target(client.credentials),
+                    partial(
+                        client.select,
+                        return_model,
+                        query,
+                        params,
+                        timeout=timeout,
+                        query_context=query_context,
+                        hooks=hooks,
+                    ),
+                )
+            )
+
+        results = await gather_targets(
+            target_selects,
+            max_concurrency,
+            self._get_hooks(hooks),
+            hook_context,
+        )
 
-    @asynccontextmanager
-    async def _handle_auto_connection(self) -> AsyncGenerator[None, None]:
-        close_connection_after_use = False
+        return merge_results(results, order_by, descending)
 
-        if self.auto_create_connection:
-            if self.connection is None:
-                await self._create_connection()
-                close_connection_after_use = True
-        elif self.connection is None:
-            connection_not_created()
+    @overload
+    async def gather(
+        self,
+        query_1: Callable[[AsyncPostgresClient], Awaitable[ResultT1]],
+        /,
+        *,
+        max_concurrency: int = 10,
+    ) -> tuple[ResultT1]: ...
 
-        try:
-            yield
-        finally:
-            if close_connection_after_use:
-                await self._end_connection()
+    @overload
+    async def gather(
+        self,
+        query_1: Callable[[AsyncPostgresClient], Awaitable[ResultT1]],
+        query_2: Callable[[AsyncPostgresClient], Awaitable[ResultT2]],
+        /,
+        *,
+        max_concurrency: int = 10,
+    ) -> tuple[ResultT1, ResultT2]: ...
 
-    async def _query_as_string(self, query: Query) -> str:
-        if isinstance(query, str):
-            return query
+    @overload
+    async def gather(
+        self,
+        query_1: Callable[[AsyncPostgresClient], Awaitable[ResultT1]],
+        query_2: Callable[[AsyncPostgresClient], Awaitable[ResultT2]],
+        query_3: Callable[[AsyncPostgresClient], Awaitable[ResultT3]],
+        /,
+        *,
+        max_concurrency: int = 10,
+    ) -> tuple[ResultT1, ResultT2, ResultT3]: ...
 
-        if isinstance(query, bytes):
-            return query.decode("utf-8")
+    @overload
+    async def gather(
+        self,
+        query_1: Callable[[AsyncPostgresClient], Awaitable[ResultT1]],
+        query_2: Callable[[AsyncPostgresClient], Awaitable[ResultT2]],
+        query_3: Callable[[AsyncPostgresClient], Awaitable[ResultT3]],
+        query_4: Callable[[AsyncPostgresClient], Awaitable[ResultT4]],
+        /,
+        *,
+        max_concurrency: int = 10,
+    ) -> tuple[ResultT1, ResultT2, ResultT3, ResultT4]: ...
 
-        async with self._handle_auto_connection():
-            async with self.cursor(self.connection) as cursor:
-                return query.as_string(cursor)
+    @overload
+    async def gather(
+        self,
+        query_1: Callable[[AsyncPostgresClient], Awaitable[ResultT1]],
+        query_2: Callable[[AsyncPostgresClient], Awaitable[ResultT2]],
+        query_3: Callable[[AsyncPostgresClient], Awaitable[ResultT3]],
+        query_4: Callable[[AsyncPostgresClient], Awaitable[ResultT4]],
+        query_5: Callable[[AsyncPostgresClient], Awaitable[ResultT5]],
+        /,
+        *,
+        max_concurrency: int = 10,
+    ) -> tuple[ResultT1, ResultT2, ResultT3, ResultT4, ResultT5]: ...
 
-    def _get_hooks(self, hooks: Optional[list[BaseHook]]) -> list[BaseHook]:
-        match self.default_hooks, hooks:
-            case None, None:
-                return []
-            case None, _:
-                # Mypy doesn't like this without the cast, but it should be correct...
-                return cast(list[BaseHook], hooks)
-            case _, None:
-                return cast(list[BaseHook], self.default_hooks)
-            case _, _:
-                df = cast(list[BaseHook], self.default_hooks)
-                h = cast(list[BaseHook], hooks)
-                return df + h
-
-        raise ValueError("UNREACHABLE: Invalid hooks supplied")
+    @overload
+    async def gather(
+        self,
+        *queries: Callable[[AsyncPostgresClient], Awaitable[ResultT]],
+        max_concurrency: int = 10,
+    ) -> tuple[ResultT, ...]: ...
 
+    async def gather(
+        self,
+        *queries: Callable[[AsyncPostgresClient], Awaitable[Any]],
+        max_concurrency: int = 10,
+    ) -> tuple[Any, ...]:
+        """Run independent queries at the same time, each on its own
+        connection, and return their results in order
 
-def _apply_pre_hooks(
-    hooks: Optional[list[BaseHook]],
-    query: str,
-    query_params: Optional[dict[str, Any] | Sequence[dict[str, Any]]],
-    query_context: Optional[QueryContext],
-) -> None:
-    if hooks is None:
-        return
+        Each query is a function that receives a client in a session of its
+        own. They run outside of any transaction this client is in, so they
+        don't see its uncommitted writes. When one fails the others are
+        cancelled and the exception is raised.
 
-    for hook in hooks:
-        hook.pre_query(query, query_params, query_context)
+        Parameters
+        ----------
+        *queries : Callable[[AsyncPostgresClient], Awaitable[T]]
+            Queries to run, called with the client to run them with
+        max_concurrency : int = 10
+            Maximum number of queries running, and connections open, at the
+            same time
 
+        Examples
+        --------
+        user, orders = await db.gather(
+            lambda db: db.get(User, "select * from users where id = %(id)s", {"id": user_id}),
+            lambda db: db.select(Order, "select * from orders where user_id = %(id)s", {"id": user_id}),
+        )
+        """
 
-def _apply_post_hooks(
-    hooks: Optional[list[BaseHook]],
-    result_type: Literal["success", "error"],
-    rows_returned: int,
-    batch_size: int = 1,
+        def in_session(
+            query: Callable[[AsyncPostgresClient], Awaitable[Any]],
+        ) -> Callable[[], Awaitable[Any]]:
+            async def run() -> Any:
+                async with self._new_client().start_session(
+                    schema=self.user_set_schema,
+                ) as session:
+                    return await query(session)
+
+            return run
+
+        results = await run_concurrently(
+            [in_session(query) for query in queries],
+            max_concurrency,
+        )
+
+        return tuple(results)
+
+    def loader(
+        self,
+        return_model: type[BaseModelMappingT],
+        query: Query,
+        *,
+        key_column: str = "id",
+        param_name: str = "ids",
+        max_batch_size: int = 1000,
+        timeout: Optional[float] = None,
+        query_context: Optional[QueryContext] = None,
+        hooks: Optional[list[BaseHook]] = None,
+    ) -> Loader[BaseModelMappingT]:
+        """Load single records by key, batching concurrent loads into one
+        query
+
+        Replaces many concurrent `get` calls that each select one record by
+        its key. Keys loaded at the same time are passed to `query` as a list
+        in the `param_name` parameter, and the rows returned are matched back
+        to each key by `key_column`.
+
+        Parameters
+        ----------
+        return_model : type[T of BaseModel]
+            Pydantic model to marshall the SQL query results into
+        query : str
+            SQL query selecting the records for a list of keys, e.g.
+            "select * from users where id = any(%(ids)s)"
+        key_column : str = "id"
+            Column returned by the query that holds each record's key
+        param_name : str = "ids"
+            Name of the query parameter that receives the list of keys
+        max_batch_size : int = 1000
+            Maximum number of keys queried at once, larger batches are split
+        timeout : Optional[float] = None
+            Amount of time in seconds to wait for each batch's query to complete. Default to no timeout
+        query_context : Optional[QueryContext] = None
+            Query metadata for telemetry purposes
+        hooks: Optional[list[BaseHook]] = None
+            List of hooks to run before and after each batch's query. See pnorm.hooks.opentelemetry for examples
+
+        Examples
+        --------
+        users = db.loader(User, "select * from users where id = any(%(ids)s)")
+
+        # Both are fetched with one query
+        alice, bob = await asyncio.gather(users.load(1), users.load(2))
+        """
+        return Loader(
+            self,
+            return_model,
+            query,
+            r.check_str("key_column", key_column),
+            r.check_str("param_name", param_name),
+            max_batch_size,
+            timeout,
+            query_context,
+            hooks,
+        )
+
+    @asynccontextmanager
+    async def batch_writer(
+        self,
+        query: Query,
+        *,
+        max_rows: int = 1000,
+        max_delay: float = 1.0,
+        max_buffered_rows: Optional[int] = None,
+        timeout: Optional[float] = None,
+        query_context: Optional[QueryContext] = None,
+        hooks: Optional[list[BaseHook]] = None,
+    ) -> AsyncGenerator[BatchWriter, None]:
+        """Write rows from concurrent producers in batches instead of one
+        query each
+
+        Rows are buffered and written with execute_many by a background task
+        on a connection of its own, outside of any transaction this client
+        is in. Buffered rows are written when the block exits. When a batch
+        fails its rows are lost, and the exception is raised by the next
+        write, flush or when the block exits.
+
+        Parameters
+        ----------
+        query : str
+            SQL query to execute for each row, e.g. an insert with named
+            parameters
+        max_rows : int = 1000
+            Number of buffered rows that are written right away as a batch
+        max_delay : float = 1.0
+            Maximum seconds a row is buffered before its batch is written
+        max_buffered_rows : Optional[int] = None
+            Number of buffered rows at which writes wait for a batch to be
+            taken. Default to twice max_rows
+        timeout : Optional[float] = None
+            Amount of time in seconds to wait for each batch to complete. Default to no timeout
+        query_context : Optional[QueryContext] = None
+            Query metadata for telemetry purposes
+        hooks: Optional[list[BaseHook]] = None
+            List of hooks to run before and after each batch
+
+        Examples
+        --------
+        async with db.batch_writer(
+            "insert into events (id, name) values (%(id)s, %(name)s)",
+            max_rows=500,
+            max_delay=0.1,
+        ) as events:
+            await asyncio.gather(*[consume(queue, events) for queue in queues])
+        """
+        async with self._new_client().start_session(
+            schema=self.user_set_schema,
+        ) as session:
+            writer = BatchWriter(
+                session,
+                query,
+                max_rows,
+                max_delay,
+                max_buffered_rows if max_buffered_rows is not None else 2 * max_rows,
+                timeout,
+                query_context,
+                hooks,
+            )
+            writer._start()
+
+            try:
+                yield writer
+            except asyncio.CancelledError:
+                await writer._cancel()
+                raise
+            except BaseException:
+                await writer.close()
+                raise
+
+            await writer.close()
+
+    @overload
+    def paginate(
+        self,
+        return_model: type[BaseModelT],
+        query: Query,
+        params: Optional[ParamType] = None,
+        *,
+        key_columns: str | Sequence[str],
+        page_size: int = 1000,
+        descending: bool = False,
+        prefetch: bool = False,
+        timeout: Optional[float] = None,
+        query_context: Optional[QueryContext] = None,
+        hooks: Optional[list[BaseHook]] = None,
+    ) -> AsyncGenerator[tuple[BaseModelT, ...], None]: ...
+
+    @overload
+    def paginate(
+        self,
+        return_model: type[MappingT],
+        query: Query,
+        params: Optional[ParamType] = None,
+        *,
+        key_columns: str | Sequence[str],
+        page_size: int = 1000,
+        descending: bool = False,
+        prefetch: bool = False,
+        timeout: Optional[float] = None,
+        query_context: Optional[QueryContext] = None,
+        hooks: Optional[list[BaseHook]] = None,
+    ) -> AsyncGenerator[tuple[MappingT, ...], None]: ...
+
+    async def paginate(
+        self,
+        return_model: type[BaseModelT] | type[MappingT],
+        query: Query,
+        params: Optional[ParamType] = None,
+        *,
+        key_columns: str | Sequence[str],
+        page_size: int = 1000,
+        descending: bool = False,
+        prefetch: bool = False,
+        timeout: Optional[float] = None,
+        query_context: Optional[QueryContext] = None,
+        hooks: Optional[list[BaseHook]] = None,
+    ) -> AsyncGenerator[tuple[BaseModelT, ...] | tuple[MappingT, ...], None]:
+        """Page through the rows of a query, sorted by unique key columns
+
+        Each page is queried with `where (keys) > (keys of the last row)
+        order by keys limit page_size`, so pages deep into a table are as
+        fast as the first one, unlike with OFFSET. The key columns must be
+        returned by the query, be unique together and never be null. Each
+        page is a separate query, rows changed while paging may be missed or
+        seen twice.
+
+        Parameters
+        ----------
+        return_model : type[T of BaseModel]
+            Pydantic model to marshall the SQL query results into
+        query : str
+            SQL query to execute, without an ORDER BY or LIMIT
+        params : Optional[Mapping[str, Any] | BaseModel] = None
+            Named parameters for the SQL query
+        key_columns : str | Sequence[str]
+            Columns to sort and page by
+        page_size : int = 1000
+            Maximum number of rows in each page
+        descending : bool = False
+            Whether to page from the largest keys to the smallest
+        prefetch : bool = False
+            Whether to query the next page on a separate connection while
+            the current page is processed. That connection does not see
+            changes made in this client's transaction
+        timeout : Optional[float] = None
+            Amount of time in seconds to wait for each page. Default to no timeout
+        query_context : Optional[QueryContext] = None
+            Query metadata for telemetry purposes
+        hooks: Optional[list[BaseHook]] = None
+            List of hooks to run before and after each page's query
+
+        Examples
+        --------
+        async with aclosing(
+            db.paginate(User, "select * from users", key_columns="id")
+        ) as pages:
+            async for users in pages:
+                await export(users)
+        """
+        if page_size < 1:
+            raise ValueError("page_size must be at least 1")
+
+        columns = (key_columns,) if isinstance(key_columns, str) else tuple(key_columns)
+
+        if len(columns) == 0:
+            raise ValueError("At least one key column is required to paginate")
+
+        first_page_query = _keyset_query(query, columns, False, descending)
+        next_page_query = _keyset_query(query, columns, True, descending)
+        query_params = get_params("Query Params", params) or {}
+
+        async def fetch_page(
+            client: AsyncPostgresClient,
+            after: Optional[tuple[Any, ...]],
+        ) -> tuple[Any, ...]:
+            page_params = {**query_params, "pnorm_page_size": page_size}
+
+            if after is not None:
+                page_params.update(
+                    {f"pnorm_after_{i}": value for i, value in enumerate(after)}
+                )
+
+            return await client.select(
+                return_model,
+                first_page_query if after is None else next_page_query,
+                page_params,
+                timeout=timeout,
+                query_context=query_context,
+                hooks=hooks,
+            )
+
+        reader_scope = (
+            self._new_client().start_session(schema=self.user_set_schema)
+            if prefetch
+            else nullcontext(self)
+        )
+
+        async with reader_scope as reader:
+            next_page: Optional[asyncio.Task[tuple[Any, ...]]] = None
+            after: Optional[tuple[Any, ...]] = None
+
+            try:
+                while True:
+                    if next_page is not None:
+                        page = await next_page
+                        next_page = None
+                    else:
+                        page = await fetch_page(reader, after)
+
+                    if len(page) == 0:
+                        return
+
+                    after = get_columns(page[-1], columns)
+
+                    # Only one page is queried at a time, the reader connection
+                    # is free again by the time the caller wants the next one
+                    if prefetch and len(page) == page_size:
+                        next_page = asyncio.create_task(fetch_page(reader, after))
+
+                    yield page
+
+                    if len(page) < page_size:
+                        return
+            finally:
+                if next_page is not None:
+                    next_page.cancel()
+                    await asyncio.gather(next_page, return_exceptions=True)
+
+    @overload
+    def parallel_scan(
+        self,
+        return_model: type[BaseModelT],
+        query: Query,
+        params: Optional[ParamType] = None,
+        *,
+        partition_column: str,
+        partitions: int = 4,
+        include_nulls: bool = False,
+        max_concurrency: Optional[int] = None,
+        timeout: Optional[float] = None,
+        query_context: Optional[QueryContext] = None,
+        hooks: Optional[list[BaseHook]] = None,
+    ) -> AsyncGenerator[tuple[BaseModelT, ...], None]: ...
+
+    @overload
+    def parallel_scan(
+        self,
+        return_model: type[MappingT],
+        query: Query,
+        params: Optional[ParamType] = None,
+        *,
+        partition_column: str,
+        partitions: int = 4,
+        include_nulls: bool = False,
+        max_concurrency: Optional[int] = None,
+        timeout: Optional[float] = None,
+        query_context: Optional[QueryContext] = None,
+        hooks: Optional[list[BaseHook]] = None,
+    ) -> AsyncGenerator[tuple[MappingT, ...], None]: ...
+
+    async def parallel_scan(
+        self,
+        return_model: type[BaseModelT] | type[MappingT],
+        query: Query,
+        params: Optional[ParamType] = None,
+        *,
+        partition_column: str,
+        partitions: int = 4,
+        include_nulls: bool = False,
+        max_concurrency: Optional[int] = None,
+        timeout: Optional[float] = None,
+        query_context: Optional[QueryContext] = None,
+        hooks: Optional[list[BaseHook]] = None,
+    ) -> AsyncGenerator[tuple[BaseModelT, ...] | tuple[MappingT, ...], None]:
+        """Read all rows of a query by splitting it into ranges of an integer
+        column and querying the ranges at the same time, each on its own
+        connection
+
+        The range between the smallest and largest value of the partition
+        column is split into `partitions` equal ranges. The rows of each
+        partition are yielded together as soon as it is done, in no
+        particular order.
+        Partitions run outside of any transaction this client is in and
+        don't share a snapshot, rows changed during the scan may be missed.
+
+        Parameters
+        ----------
+        return_model : type[T of BaseModel]
+            Pydantic model to marshall the SQL query results into
+        query : str
+            SQL query to execute, e.g. "select * from events"
+        params : Optional[Mapping[str, Any] | BaseModel] = None
+            Named parameters for the SQL query
+        partition_column : str
+            Integer column returned by the query to split its rows by,
+            ideally indexed
+        partitions : int = 4
+            Number of ranges to split the rows into
+        include_nulls : bool = False
+            Also read the rows where the partition column is null, as one
+            more partition. Costs an extra query, which scans the whole table
+            unless the column is indexed
+        max_concurrency : Optional[int] = None
+            Maximum number of partitions queried or waiting to be yielded at
+            the same time. Defaults to one connection per partition. Use more
+            partitions than connections to hold fewer rows in memory at once
+        timeout : Optional[float] = None
+            Amount of time in seconds to wait for each partition. Default to no timeout
+        query_context : Optional[QueryContext] = None
+            Query metadata for telemetry purposes
+        hooks: Optional[list[BaseHook]] = None
+            List of hooks to run before and after each partition's query
+
+        Raises
+        ------
+        ValueError
+            When the partition column doesn't hold integers
+
+        Examples
+        --------
+        async with aclosing(
+            db.parallel_scan(
+                Event,
+                "select * from events",
+                partition_column="id",
+                partitions=32,
+                max_concurrency=4,
+            )
+        ) as scan:
+            async for events in scan:
+                await export(events)
+        """
+        if partitions < 1:
+            raise ValueError("partitions must be at least 1")
+
+        if max_concurrency is None:
+            max_concurrency = partitions + 1 if include_nulls else partitions
+
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+
+        r.check_str("partition_column", partition_column)
+        query_params = get_params("Query Params", params) or {}
+        bounds = await self.get(
+            dict,
+            _partition_bounds_query(query, partition_column),
+            query_params,
+            timeout=timeout,
+            query_context=query_context,
+            hooks=hooks,
+        )
+        lower, upper = bounds["lower"], bounds["upper"]
+        ranges: list[Optional[tuple[int, int]]] = [None] if include_nulls else []
+
+        if lower is not None:
+            if not _is_integer(lower) or not _is_integer(upper):
+                msg = f"The partition column {partition_column} must hold integers"
+                raise ValueError(msg)
+
+            step = -(-(upper - lower + 1) // partitions)
+            ranges.extend(
+                (start, min(start + step, upper + 1))
+                for start in range(lower, upper + 1, step)
+            )
+
+        bounded_query = _partition_query(query, partition_column, True)
+        null_query = _partition_query(query, partition_column, False)
+        # Taken when a partition starts and given back once its rows are
+        # yielded, so finished partitions waiting for the caller count too
+        slots = asyncio.Semaphore(max_concurrency)
+
+        async def scan(partition: Optional[tuple[int, int]]) -> tuple[Any, ...]:
+            await slots.acquire()
+
+            try:
+                async with self._new_client().start_session(
+                    schema=self.user_set_schema,
+                ) as session:
+                    if partition is None:
+                        return await session.select(
+                            return_model,
+                            null_query,
+                            query_params,
+                            timeout=timeout,
+                            query_context=query_context,
+                            hooks=hooks,
+                        )
+
+                    return await session.select(
+                        return_model,
+                        bounded_query,
+                        {
+                            **query_params,
+                            "pnorm_scan_lower": partition[0],
+                            "pnorm_scan_upper": partition[1],
+                        },
+                        timeout=timeout,
+                        query_context=query_context,
+                        hooks=hooks,
+                    )
+            except BaseException:
+                slots.release()
+                raise
+
+        tasks = [asyncio.create_task(scan(partition)) for partition in ranges]
+
+        try:
+            for done in asyncio.as_completed(tasks):
+                rows = await done
+
+                if len(rows) > 0:
+                    yield rows
+
+                slots.release()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    @asynccontextmanager
+    async def start_session(
+        self,
+        *,
+        schema: Optional[str] = None,
+        deadline: Optional[float] = None,
+    ) -> AsyncGenerator[AsyncPostgresClient, None]:
+        """Start database session
+
+        Parameters
+        ----------
+        schema : Optional[str] = None
+            Schema to set for the session
+        deadline : Optional[float] = None
+            Seconds from now that every query in the session must finish by.
+            See pnorm.deadline
+
+        Examples
+        --------
+        async with db.start_session() as session:
+            await session.get(...)
+        """
+        deadline_scope = (
+            deadlines.deadline(deadline) if deadline is not None else nullcontext()
+        )
+
+        with deadline_scope:
+            original_auto_create_connection = self.auto_create_connection
+            self.auto_create_connection = False
+            close_connection_after_use = False
+
+            if self.connection is None:
+                await self._create_connection()
+                close_connection_after_use = True
+
+            if schema is not None:
+                await self.set_schema(schema=schema)
+
+            try:
+                yield self
+            except:
+                await self._rollback()
+                raise
+            finally:
+                if self.connection is not None and close_connection_after_use:
+                    await self._end_connection()
+
+                self.auto_create_connection = original_auto_create_connection
+
+    @asynccontextmanager
+    async def start_transaction(
+        self,
+        *,
+        isolation: Optional[IsolationLevel] = None,
+        read_only: bool = False,
+        deferrable: bool = False,
+        synchronous_commit: Optional[SynchronousCommit] = None,
+    ) -> AsyncGenerator[AsyncPostgresClient, None]:
+        """Start a transaction
+
+        Parameters
+        ----------
+        isolation : Optional[IsolationLevel] = None
+            Isolation level of the transaction, defaults to the server's
+            default_transaction_isolation
+        read_only : bool = False
+            Reject writes inside the transaction
+        deferrable : bool = False
+            With a serializable read only transaction, wait for a snapshot
+            that can't cause serialization failures instead of tracking them
+        synchronous_commit : Optional[SynchronousCommit] = None
+            Override synchronous_commit for the transaction. With "off" the
+            commit returns before it is flushed to disk, a crash can lose the
+            transaction but never corrupts the database
+
+        Examples
+        --------
+        async with session.start_transaction() as tx:
+            await tx.get(...)
+
+        async with session.start_transaction(
+            isolation="serializable",
+            read_only=True,
+            deferrable=True,
+        ) as tx:
+            await tx.select(...)
+        """
+        transaction_options = get_transaction_options_statement(
+            isolation,
+            read_only,
+            deferrable,
+            synchronous_commit,
+        )
+        self._create_transaction()
+
+        try:
+            await self._set_transaction_options(transaction_options)
+            yield self
+        except:
+            await self._rollback()
+            raise
+        else:
+            await self.cursor.commit()
+
+            if self.read_your_writes and self.connection is not None:
+                await _record_write_lsn(self.connection)
+        finally:
+            self.cursor = SingleCommitCursor(self)
+
+    async def run_transaction(
+        self,
+        fn: Callable[[AsyncPostgresClient], Awaitable[ResultT]],
+        *,
+        retries: int = 3,
+        backoff: float = 0.05,
+        max_backoff: float = 2.0,
+        isolation: Optional[IsolationLevel] = None,
+        read_only: bool = False,
+        deferrable: bool = False,
+        synchronous_commit: Optional[SynchronousCommit] = None,
+        hooks: Optional[list[BaseHook]] = None,
+    ) -> ResultT:
+        """Run `fn` in a transaction, retrying it on serialization failures
+        and deadlocks
+
+        The whole transaction is rolled back and `fn` is called again, so it
+        shouldn't have side effects outside of the database.
+
+        Parameters
+        ----------
+        fn : Callable[[AsyncPostgresClient], Awaitable[ResultT]]
+            Body of the transaction, receives the transaction's client
+        retries : int = 3
+            Maximum number of times to retry the transaction
+        backoff : float = 0.05
+            Seconds to wait before the first retry, doubled for each retry. A
+            random part of the wait is used so conflicting transactions don't
+            retry at the same time
+        max_backoff : float = 2.0
+            Maximum seconds to wait between retries
+        isolation, read_only, deferrable, synchronous_commit
+            Options for the transaction, see start_transaction
+        hooks : Optional[list[BaseHook]] = None
+            Hooks notified with BaseHook.on_retry before each retry
+
+        Raises
+        ------
+        RuntimeError
+            When called in a transaction, retrying would roll back or commit
+            the outer transaction
+
+        Examples
+        --------
+        async def transfer(tx: AsyncPostgresClient) -> None:
+            await tx.execute(...)
+            await tx.execute(...)
+
+        await client.run_transaction(transfer, isolation="serializable")
+        """
+        if isinstance(self.cursor, TransactionCursor):
+            msg = "run_transaction can't run in a transaction"
+            raise RuntimeError(msg)
+
+        hooks = self._get_hooks(hooks)
+        attempt = 0
+
+        async with self.start_session() as session:
+            while True:
+                attempt += 1
+
+                try:
+                    async with session.start_transaction(
+                        isolation=isolation,
+                        read_only=read_only,
+                        deferrable=deferrable,
+                        synchronous_commit=synchronous_commit,
+                    ) as tx:
+                        return await fn(tx)
+                except RETRYABLE_TRANSACTION_ERRORS as e:
+                    delay = get_retry_delay(attempt, retries, backoff, max_backoff)
+
+                    if delay is None:
+                        raise
+
+                    apply_retry_hooks(hooks, None, "transaction", attempt, e, delay)
+                    await asyncio.sleep(delay)
+
+    @overload
+    def listen(
+        self,
+        *channels: str,
+        payload_model: None = None,
+        reconnect_delay: float = 1.0,
+        max_reconnect_delay: float = 30.0,
+        ping_interval: float = 30.0,
+    ) -> AsyncGenerator[Notification[str], None]: ...
+
+    @overload
+    def listen(
+        self,
+        *channels: str,
+        payload_model: type[BaseModelT],
+        reconnect_delay: float = 1.0,
+        max_reconnect_delay: float = 30.0,
+        ping_interval: float = 30.0,
+    ) -> AsyncGenerator[Notification[BaseModelT], None]: ...
+
+    async def listen(
+        self,
+        *channels: str,
+        payload_model: Optional[type[BaseModelT]] = None,
+        reconnect_delay: float = 1.0,
+        max_reconnect_delay: float = 30.0,
+        ping_interval: float = 30.0,
+    ) -> AsyncGenerator[Notification[str] | Notification[BaseModelT], None]:
+        """Listen for notifications sent with NOTIFY or pg_notify
+
+        Notifications are received on a dedicated connection that is separate
+        from the connection used by queries and sessions. If that connection is
+        lost, it is re-created with exponential backoff and the channels are
+        listened to again. Notifications sent while disconnected are lost. The
+        connection is checked every `ping_interval` seconds, so a server that
+        disappeared without closing it is noticed too.
+        Wrap the generator in contextlib.aclosing so the connection is closed
+        as soon as the loop stops, not when the generator is garbage collected.
+
+        Parameters
+        ----------
+        *channels : str
+            Names of the channels to listen to
+        payload_model : Optional[type[T of BaseModel]] = None
+            Pydantic model to parse the JSON payload of each notification into
+        reconnect_delay : float = 1.0
+            Seconds to wait before the first reconnection attempt
+        max_reconnect_delay : float = 30.0
+            Upper bound in seconds on the wait between reconnection attempts
+        ping_interval : float = 30.0
+            Seconds between checks that the connection is alive, and how long
+            each check may take before the connection is treated as lost
+
+        Raises
+        ------
+        MarshallRecordException
+            When a payload cannot be parsed into the payload_model
+
+        Examples
+        --------
+        async with aclosing(db.listen("jobs", payload_model=Job)) as notifications:
+            async for notification in notifications:
+                await handle(notification.payload)
+        """
+        channels = tuple(r.check_str("channel", channel) for channel in channels)
+
+        if len(channels) == 0:
+            raise ValueError("At least one channel is required to listen")
+
+        # Fail fast on the first connection, only reconnects are retried
+        connection = await self._create_listen_connection(channels)
+        delay = reconnect_delay
+
+        while True:
+            try:
+                while True:
+                    async for notify in connection.notifies(timeout=ping_interval):
+                        yield _parse_notification(notify, payload_model)
+
+                        # Connection has been healthy since the last reconnect
+                        delay = reconnect_delay
+
+                    # Without a ping a connection to a server that vanished
+                    # without closing it would wait for notifications forever
+                    await _ping(connection, ping_interval)
+            except psycopg.OperationalError:
+                ...
+            finally:
+                await connection.close()
+
+            while True:
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, max_reconnect_delay)
+
+                try:
+                    connection = await self._create_listen_connection(channels)
+                    break
+                except psycopg.OperationalError:
+                    continue
+
+    async def _execute_read(
+        self,
+        started_hooks: StartedHooks,
+        hook_context: HookContext,
+        query: Query,
+        query_params: Optional[dict[str, Any]],
+        fetch: Callable[[AsyncCursor[DictRow]], Awaitable[FetchT]],
+        operation: str,
+        *,
+        timeout: Optional[float],
+    ) -> FetchT:
+        """Run a read, or with single_flight wait for an identical one that is
+        already running"""
+        key = self._get_flight_key(hook_context, operation)
+        loop = asyncio.get_running_loop()
+        started_at = loop.time()
+
+        while key is not None and key in self._flights:
+            flight = self._flights[key]
+
+            try:
+                outcome = await self._wait_for_flight(
+                    hook_context,
+                    flight,
+                    _get_remaining_timeout(timeout, loop.time() - started_at),
+                )
+            except asyncio.CancelledError as e:
+                current_task = asyncio.current_task()
+
+                # The read it was waiting for was cancelled or ran out of its
+                # own time budget, run it instead
+                if flight.cancelled() and (
+                    current_task is None or current_task.cancelling() == 0
+                ):
+                    continue
+
+                _apply_exception_hooks(started_hooks, hook_context, e)
+                raise
+            except Exception as e:
+                _apply_exception_hooks(started_hooks, hook_context, e)
+                raise
+
+            if isinstance(outcome, BaseException):
+                _apply_exception_hooks(started_hooks, hook_context, outcome)
+                raise outcome
+
+            return cast(FetchT, outcome)
+
+        if key is None:
+            return await self._execute_query(
+                started_hooks,
+                hook_context,
+                query,
+                query_params,
+                fetch,
+                timeout=timeout,
+                idempotent=True,
+            )
+
+        flight = loop.create_future()
+        self._flights[key] = flight
+
+        try:
+            result = await self._execute_query(
+                started_hooks,
+                hook_context,
+                query,
+                query_params,
+                fetch,
+                timeout=_get_remaining_timeout(timeout, loop.time() - started_at),
+                idempotent=True,
+            )
+        except asyncio.CancelledError:
+            flight.cancel()
+            raise
+        except Exception as e:
+            if _is_shared_error(e):
+                # Set as the result so it isn't reported as never retrieved
+                # when no other read was waiting
+                flight.set_result(e)
+            else:
+                # Timeouts and deadlines belong to this read, the waiting
+                # reads run it again with their own
+                flight.cancel()
+
+            raise
+        else:
+            flight.set_result(result)
+        finally:
+            del self._flights[key]
+
+        return result
+
+    def _get_flight_key(
+        self,
+        hook_context: HookContext,
+        operation: str,
+    ) -> Optional[tuple[Any, ...]]:
+        """Identifies reads that can share a result, None when the read has
+        to run on its own"""
+        if not self.single_flight or isinstance(self.cursor, TransactionCursor):
+            return None
+
+        return (
+            operation,
+            hook_context.query,
+            repr(hook_context.query_params),
+            self.user_set_schema,
+            # Reads after a write must not use a result from before it
+            replicas_module.last_write_lsn() if self.read_your_writes else None,
+        )
+
+    async def _wait_for_flight(
+        self,
+        hook_context: HookContext,
+        flight: asyncio.Future[Any],
+        timeout: Optional[float],
+    ) -> Any:
+        deadline_timeout = deadlines.remaining_time()
+
+        if deadline_timeout is not None and deadline_timeout <= 0:
+            raise DeadlineExceededException(
+                f"Deadline passed before running query: {hook_context.query}"
+            )
+
+        try:
+            async with asyncio.timeout(_get_query_timeout(timeout, deadline_timeout)):
+                # Readers that stop waiting don't cancel the shared read
+                return await asyncio.shield(flight)
+        except TimeoutError as e:
+            if deadline_timeout is None:
+                raise
+
+            remaining = deadlines.remaining_time()
+
+            if remaining is not None and remaining > 0:
+                raise
+
+            raise DeadlineExceededException(
+                f"Deadline passed while running query: {hook_context.query}"
+            ) from e
+
+    async def _execute_query(
+        self,
+        started_hooks: StartedHooks,
+        hook_context: HookContext,
+        query: Query,
+        query_params: Optional[dict[str, Any] | Sequence[dict[str, Any]]],
+        fetch: Callable[[AsyncCursor[DictRow]], Awaitable[FetchT]],
+        *,
+        timeout: Optional[float],
+        idempotent: bool = False,
+    ) -> FetchT:
+        attempt = 0
+
+        while True:
+            attempt += 1
+
+            try:
+                if attempt > 1:
+                    await self._reconnect()
+
+                if idempotent and self._should_hedge():
+                    return await self._run_hedged_query(
+                        started_hooks,
+                        hook_context,
+                        query,
+                        query_params,
+                        fetch,
+                        timeout=timeout,
+                    )
+
+                return await self._run_query(
+                    started_hooks,
+                    hook_context,
+                    query,
+                    query_params,
+                    fetch,
+                    timeout=timeout,
+                    use_replica=idempotent,
+                )
+            except (Exception, asyncio.CancelledError) as e:
+                delay = None
+
+                # Only queries that are safe to run twice are retried
+                if idempotent:
+                    delay = self._get_read_retry_delay(e, attempt)
+
+                if delay is None:
+                    _apply_exception_hooks(started_hooks, hook_context, e)
+                    raise
+
+                apply_retry_hooks(
+                    [hook for hook, _ in started_hooks],
+                    hook_context,
+                    "query",
+                    attempt,
+                    e,
+                    delay,
+                )
+                await asyncio.sleep(delay)
+
+    async def _run_query(
+        self,
+        started_hooks: StartedHooks,
+        hook_context: HookContext,
+        query: Query,
+        query_params: Optional[dict[str, Any] | Sequence[dict[str, Any]]],
+        fetch: Callable[[AsyncCursor[DictRow]], Awaitable[FetchT]],
+        *,
+        timeout: Optional[float],
+        use_replica: bool,
+        replica: Optional[Replica] = None,
+    ) -> FetchT:
+        deadline_timeout = deadlines.remaining_time()
+
+        try:
+            if deadline_timeout is not None and deadline_timeout <= 0:
+                raise DeadlineExceededException(
+                    f"Deadline passed before running query: {hook_context.query}"
+                )
+
+            async with self._acquire_connection(use_replica, replica) as connection:
+                _apply_phase_hooks(started_hooks, hook_context, "connection_acquired")
+
+                try:
+                    async with self.cursor(connection) as cursor:
+                        # Waiting for the connection used up part of the budget
+                        deadline_timeout = deadlines.remaining_time()
+
+                        async with asyncio.timeout(
+                            _get_query_timeout(timeout, deadline_timeout)
+                        ):
+                            _apply_phase_hooks(
+                                started_hooks,
+                                hook_context,
+                                "execute_sent",
+                            )
+
+                            await _send_query(
+                                connection,
+                                cursor,
+                                query,
+                                query_params,
+                                deadline_timeout,
+                                restore_statement_timeout=isinstance(
+                                    self.cursor, TransactionCursor
+                                ),
+                            )
+
+                            # Client side cursors receive the whole result
+                            # before execute returns, so fetching only reads
+                            # rows that are already here
+                            _apply_phase_hooks(
+                                started_hooks,
+                                hook_context,
+                                "result_received",
+                            )
+                            query_result = await fetch(cursor)
+                            _apply_phase_hooks(
+                                started_hooks,
+                                hook_context,
+                                "fetch_complete",
+                            )
+                except (asyncio.TimeoutError, asyncio.CancelledError):
+                    # Shielded so the query is still stopped on the server if
+                    # this task is cancelled again while waiting
+                    await asyncio.shield(self._abort_query(connection))
+                    raise
+        except (TimeoutError, psycopg.errors.QueryCanceled) as e:
+            if deadline_timeout is None or isinstance(e, DeadlineExceededException):
+                raise
+
+            remaining = deadlines.remaining_time()
+
+            # Stopped by the user's timeout, or canceled for another reason
+            if remaining is not None and remaining > 0:
+                raise
+
+            raise DeadlineExceededException(
+                f"Deadline passed while running query: {hook_context.query}"
+            ) from e
+
+        return query_result
+
+    def _should_hedge(self) -> bool:
+        if self.hedge_policy is None or self.replicas is None:
+            return False
+
+        if isinstance(self.cursor, TransactionCursor):
+            return False
+
+        # Both reads must run on a replica, never on the primary's connection
+        return not (self.read_your_writes and replicas_module.last_write_lsn())
+
+    async def _run_hedged_query(
+        self,
+        started_hooks: StartedHooks,
+        hook_context: HookContext,
+        query: Query,
+        query_params: Optional[dict[str, Any] | Sequence[dict[str, Any]]],
+        fetch: Callable[[AsyncCursor[DictRow]], Awaitable[FetchT]],
+        *,
+        timeout: Optional[float],
+    ) -> FetchT:
+        """Run a read on a replica, and on a second replica if the first is
+        slow to answer. The first result is returned and the other query is
+        cancelled"""
+        replicas = cast(ReplicaSet, self.replicas)
+        hedge_policy = cast(HedgePolicy, self.hedge_policy)
+        # A session reads from its own replica connection first, so its reads
+        # stay on one replica and no connection is opened for them
+        first_replica = None if self.connection is not None else replicas.choose()
+        first = asyncio.create_task(
+            self._run_query(
+                started_hooks,
+                hook_context,
+                query,
+                query_params,
+                fetch,
+                timeout=timeout,
+                use_replica=True,
+                replica=first_replica,
+            )
+        )
+        attempts = [first]
+
+        try:
+            delay = replicas.hedge_delay(hedge_policy)
+            await asyncio.wait(attempts, timeout=delay)
+
+            if first.done():
+                return first.result()
+
+            # Phases are only reported for the first query, the hedge records
+            # its own so the first query's timestamps are kept
+            hedge = asyncio.create_task(
+                self._run_query(
+                    [],
+                    dataclasses.replace(hook_context),
+                    query,
+                    query_params,
+                    fetch,
+                    timeout=timeout,
+                    use_replica=True,
+                    replica=replicas.choose(
+                        exclude=first_replica or self.session_replica
+                    ),
+                )
+            )
+            attempts.append(hedge)
+            pending = set(attempts)
+
+            while len(pending) > 0:
+                done, pending = await asyncio.wait(
+                    pending,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+
+                for attempt in attempts:
+                    if attempt in done and attempt.exception() is None:
+                        _apply_hedge_hooks(
+                            started_hooks,
+                            hook_context,
+                            delay,
+                            won=attempt is hedge,
+                        )
+                        return attempt.result()
+
+            # Both failed
+            _apply_hedge_hooks(started_hooks, hook_context, delay, won=False)
+            return first.result()
+        finally:
+            for attempt in attempts:
+                if not attempt.done():
+                    attempt.cancel()
+
+                    if attempt is not first or first_replica is not None:
+                        # The loser closes its own connection once cancelled
+                        self._background_tasks.add(attempt)
+                        attempt.add_done_callback(self._background_tasks.discard)
+                        continue
+
+                    # The session's replica connection is only free again
+                    # once the query on it is stopped
+                    await asyncio.wait([attempt])
+
+                if not attempt.cancelled():
+                    # Mark a failed loser's exception as retrieved
+                    attempt.exception()
+
+    def _get_read_retry_delay(
+        self,
+        exception: BaseException,
+        attempt: int,
+    ) -> Optional[float]:
+        if self.retry_policy is None or not _is_connection_error(exception):
+            return None
+
+        # Part of the transaction may have been lost with the connection
+        if isinstance(self.cursor, TransactionCursor):
+            return None
+
+        return get_retry_delay(
+            attempt,
+            self.retry_policy.retries,
+            self.retry_policy.backoff,
+            self.retry_policy.max_backoff,
+        )
+
+    def _new_client(self) -> AsyncPostgresClient:
+        """Client with the same settings, replicas and hooks but without a
+        connection"""
+        client = AsyncPostgresClient(
+            self.credentials,
+            hooks=self.default_hooks,
+            telemetry_options=self.telemetry_options,
+            retry_policy=self.retry_policy,
+            read_your_writes=self.read_your_writes,
+            max_replica_wait=self.max_replica_wait,
+            single_flight=self.single_flight,
+        )
+        # Shared so load and latency are tracked across both clients
+        client.replicas = self.replicas
+        client.hedge_policy = self.hedge_policy
+        client._flights = self._flights
+        return client
+
+    async def _reconnect(self) -> None:
+        """Replace the session's connection if it was lost"""
+        if self.connection is not None:
+            if not self.connection.closed:
+                return
+
+            await self._end_connection()
+        elif self.auto_create_connection:
+            # Connected again for the query by _handle_auto_connection
+            return
+
+        await self._create_connection()
+
+        if self.user_set_schema is not None:
+            await self.set_schema(schema=self.user_set_schema)
+
+    async def _abort_query(self, connection: AsyncConnection[DictRow]) -> None:
+        """Stop a query that timed out or whose task was cancelled
+
+        The query is cancelled on the server without blocking the event loop.
+        Outside of a transaction the connection is rolled back so it can be
+        reused, a transaction is left for start_transaction to roll back. If
+        the connection can't be brought back to a known state it is closed,
+        a session connects again on its next query outside of a transaction
+        while the rest of a transaction fails.
+        """
+        if connection.closed:
+            return
+
+        try:
+            status = connection.info.transaction_status
+
+            if status == TransactionStatus.ACTIVE:
+                await connection.cancel_safe(timeout=_CANCEL_TIMEOUT)
+
+                # The rest of the cancelled query's results can't be consumed
+                # here, so the connection can't be reused
+                await connection.close()
+            elif status == TransactionStatus.UNKNOWN:
+                await connection.close()
+            elif isinstance(self.cursor, SingleCommitCursor):
+                await connection.rollback()
+        except psycopg.Error:
+            await connection.close()
+
+    async def _create_connection(self) -> None:
+        if self.connection is not None:
+            raise ConnectionAlreadyEstablishedException()
+
+        self.connection = cast(
+            AsyncConnection[DictRow],
+            await _connect(self.credentials, row_factory=dict_row),
+        )
+
+    async def _create_listen_connection(
+        self,
+        channels: tuple[str, ...],
+    ) -> AsyncConnection[Any]:
+        # LISTEN only takes effect once committed so use autocommit
+        connection = await _connect(self.credentials, autocommit=True)
+
+        try:
+            for channel in channels:
+                await connection.execute(
+                    sql.SQL("listen {}").format(sql.Identifier(channel))
+                )
+        except:
+            await connection.close()
+            raise
+
+        return connection
+
+    async def _end_connection(self) -> None:
+        if self.connection is None:
+            connection_not_created()
+
+        self.cursor.close()
+        await self.connection.close()
+        self.connection = None
+        await self._end_replica_connection()
+
+    async def _rollback(self) -> None:
+        if self.connection is None:
+            connection_not_created()
+
+        # Already closed after a query could not be aborted cleanly
+        if self.connection.closed:
+            return
+
+        await self.connection.rollback()
+
+    def _create_transaction(self) -> None:
+        self.cursor = TransactionCursor(self)
+
+    async def _set_transaction_options(
+        self,
+        statement: Optional[sql.Composed],
+    ) -> None:
+        if statement is None:
+            return
+
+        if self.connection is None:
+            connection_not_created()
+
+        # Has to be the first statement of the transaction
+        await self.connection.execute(statement)
+
+    async def _end_transaction(self) -> None:
+        await self.cursor.commit()
+        self.cursor = SingleCommitCursor(self)
+
+    @asynccontextmanager
+    async def _acquire_connection(
+        self,
+        use_replica: bool,
+        replica: Optional[Replica] = None,
+    ) -> AsyncGenerator[AsyncConnection[DictRow], None]:
+        """Connection to run a query on
+
+        Reads outside of a transaction use a replica when there are any,
+        everything else the primary. With `replica` a new connection to that
+        replica is used, even inside a session.
+        """
+        in_transaction = isinstance(self.cursor, TransactionCursor)
+
+        if use_replica and self.replicas is not None and not in_transaction:
+            async with self._acquire_replica_connection(
+                self.replicas,
+                replica,
+            ) as connection:
+                # None when the replica hasn't replayed this context's writes
+                if connection is not None:
+                    yield connection
+                    return
+
+        if not in_transaction and self.connection is not None:
+            # The session's connection is closed when a query couldn't be
+            # stopped cleanly, a transaction fails with it instead
+            await self._reconnect()
+
+        async with self._handle_auto_connection():
+            connection = cast(AsyncConnection[DictRow], self.connection)
+            yield connection
+
+            if self.read_your_writes and not use_replica and not in_transaction:
+                await _record_write_lsn(connection)
+
+    @asynccontextmanager
+    async def _acquire_replica_connection(
+        self,
+        replicas: ReplicaSet,
+        replica: Optional[Replica],
+    ) -> AsyncGenerator[Optional[AsyncConnection[DictRow]], None]:
+        if self.connection is None or replica is not None:
+            # Outside of a session, connect for this query only
+            if replica is None:
+                replica = replicas.choose()
+
+            # Counted from the choice so concurrent reads are spread out
+            with replicas.track(replica):
+                connection = await self._create_replica_connection(replica)
+
+                try:
+                    yield await self._replica_if_caught_up(connection)
+                finally:
+                    await connection.close()
+
+            return
+
+        if self.replica_connection is None or self.replica_connection.closed:
+            await self._end_replica_connection()
+            self.session_replica = replicas.choose()
+            self.replica_connection = await self._create_replica_connection(
+                self.session_replica
+            )
+
+        with replicas.track(cast(Replica, self.session_replica)):
+            yield await self._replica_if_caught_up(self.replica_connection)
+
+    async def _replica_if_caught_up(
+        self,
+        connection: AsyncConnection[DictRow],
+    ) -> Optional[AsyncConnection[DictRow]]:
+        """The replica's connection, or None when it hasn't replayed the
+        writes made in this context"""
+        lsn = replicas_module.last_write_lsn() if self.read_your_writes else None
+
+        if lsn is None:
+            return connection
+
+        if await replicas_module.wait_for_lsn(connection, lsn, self.max_replica_wait):
+            return connection
+
+        return None
+
+    async def _create_replica_connection(
+        self,
+        replica: Replica,
+    ) -> AsyncConnection[DictRow]:
+        connection = cast(
+            AsyncConnection[DictRow],
+            await _connect(replica.credentials, row_factory=dict_row),
+        )
+
+        if self.user_set_schema is not None:
+            async with connection.transaction():
+                await connection.execute(
+                    "select set_config('search_path', %(schema)s, false)",
+                    {"schema": self.user_set_schema},
+                )
+
+        return connection
+
+    async def _end_replica_connection(self) -> None:
+        if self.replica_connection is not None:
+            await self.replica_connection.close()
+
+        self.replica_connection = None
+        self.session_replica = None
+
+    @asynccontextmanager
+    async def _handle_auto_connection(self) -> AsyncGenerator[None, None]:
+        close_connection_after_use = False
+
+        if self.auto_create_connection:
+            if self.connection is None:
+                await self._create_connection()
+                close_connection_after_use = True
+        elif self.connection is None:
+            connection_not_created()
+
+        try:
+            yield
+        finally:
+            if close_connection_after_use:
+                await self._end_connection()
+
+    async def _query_as_string(self, query: Query) -> str:
+        if isinstance(query, str):
+            return query
+
+        if isinstance(query, bytes):
+            return query.decode("utf-8")
+
+        async with self._handle_auto_connection():
+            async with self.cursor(self.connection) as cursor:
+                return query.as_string(cursor)
+
+    def _get_hooks(self, hooks: Optional[list[BaseHook]]) -> list[BaseHook]:
+        return merge_hooks(self.default_hooks, hooks)
+
+
+def _limit_query(query: Query, query_as_string: str, limit: int) -> Query:
+    """Query that only returns its first `limit` rows
+
+    Client side cursors receive every row of the result, even if only the
+    first one is fetched. Wrapping the query lets the server stop after
+    `limit` rows and plan for it. Queries that can't be wrapped, such as
+    writes with a returning clause, are returned unchanged.
+    """
+    query_as_string = query_as_string.strip()
+    body = _LEADING_COMMENTS.sub("", query_as_string, count=1)
+
+    if (
+        not isinstance(query, str | sql.Composable)
+        or _LIMITABLE_QUERY.match(body) is None
+        or _UNLIMITABLE_QUERY.search(body) is not None
+        # Several statements, or a trailing semicolon
+        or ";" in body
+    ):
+        return query
+
+    # New lines so a comment at the end of the query doesn't comment out the
+    # rest of the wrapper
+    return sql.SQL("select * from (\n{}\n) as pnorm_limited limit {}").format(
+        sql.SQL(query) if isinstance(query, str) else query,
+        sql.Literal(limit),
+    )
+
+
+def _keyset_query(
+    query: Query,
+    key_columns: Sequence[str],
+    after: bool,
+    descending: bool,
+) -> sql.Composed:
+    """Query for one page of `query`'s rows, after the keys in the
+    pnorm_after_<i> parameters when `after` is set
+
+    The query is wrapped in a subquery so Postgres can push the keyset
+    predicate down into it and use an index on the key columns.
+    """
+    keys = sql.SQL(", ").join(sql.Identifier(column) for column in key_columns)
+    direction = sql.SQL("desc" if descending else "asc")
+    predicate: sql.Composable = sql.SQL("")
+
+    if after:
+        predicate = sql.SQL(" where ({}) {} ({})").format(
+            keys,
+            sql.SQL("<" if descending else ">"),
+            sql.SQL(", ").join(
+                sql.Placeholder(f"pnorm_after_{i}") for i in range(len(key_columns))
+            ),
+        )
+
+    # New lines so a comment at the end of the query doesn't comment out the
+    # rest of the wrapper
+    return sql.SQL(
+        "select * from (\n{}\n) as pnorm_page{} order by {} limit {}"
+    ).format(
+        _as_composable(query),
+        predicate,
+        sql.SQL(", ").join(
+            sql.SQL("{} {}").format(sql.Identifier(column), direction)
+            for column in key_columns
+        ),
+        sql.Placeholder("pnorm_page_size"),
+    )
+
+
+def _partition_bounds_query(query: Query, partition_column: str) -> sql.Composed:
+    return sql.SQL(
+        "select min({column}) as lower, max({column}) as upper "
+        "from (\n{query}\n) as pnorm_scan"
+    ).format(column=sql.Identifier(partition_column), query=_as_composable(query))
+
+
+def _partition_query(
+    query: Query,
+    partition_column: str,
+    bounded: bool,
+) -> sql.Composed:
+    """Query for the rows of `query` in the range given by the
+    pnorm_scan_lower and pnorm_scan_upper parameters when `bounded` is set,
+    otherwise the rows where the partition column is null
+    """
+    predicate = (
+        sql.SQL("{column} >= {lower} and {column} < {upper}")
+        if bounded
+        else sql.SQL("{column} is null")
+    )
+
+    return sql.SQL("select * from (\n{}\n) as pnorm_scan where {}").format(
+        _as_composable(query),
+        predicate.format(
+            column=sql.Identifier(partition_column),
+            lower=sql.Placeholder("pnorm_scan_lower"),
+            upper=sql.Placeholder("pnorm_scan_upper"),
+        ),
+    )
+
+
+def _as_composable(query: Query) -> sql.Composable:
+    """`query` to wrap in a larger query"""
+    if isinstance(query, bytes):
+        query = query.decode()
+
+    if not isinstance(query, str | sql.Composable):
+        raise ValueError("Only str, bytes and sql.Composable queries can be wrapped")
+
+    return sql.SQL(query) if isinstance(query, str) else query
+
+
+def _is_integer(value: Any) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+async def _chunk_params(
+    params: Iterable[ParamType] | AsyncIterable[ParamType],
+    chunk_size: int,
+) -> AsyncGenerator[list[ParamType], None]:
+    chunk: list[ParamType] = []
+
+    if isinstance(params, AsyncIterable):
+        async for chunk_params in params:
+            chunk.append(chunk_params)
+
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+    else:
+        for chunk_params in params:
+            chunk.append(chunk_params)
+
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+
+    if len(chunk) > 0:
+        yield chunk
+
+
+def _get_remaining_timeout(
+    timeout: Optional[float],
+    elapsed: float,
+) -> Optional[float]:
+    if timeout is None:
+        return None
+
+    return max(timeout - elapsed, 0)
+
+
+def _is_shared_error(exception: Exception) -> bool:
+    """Whether a failed read's exception is passed on to the identical reads
+    waiting for it, only errors from the database itself are"""
+    return isinstance(exception, psycopg.Error) and not isinstance(
+        exception, psycopg.errors.QueryCanceled
+    )
+
+
+async def _connect(
+    credentials: PostgresCredentials,
+    **kwargs: Any,
+) -> AsyncConnection[Any]:
+    """Connect to the first host that accepts the connection
+
+    Each host gets `connect_timeout` seconds. With prefer-standby every host
+    is tried as a standby before any is used as a primary.
+    """
+    params: dict[str, Any] = {**credentials.as_dict()}
+    # Enforced here for each host instead of by libpq in whole seconds
+    params.pop("connect_timeout", None)
+    errors: list[str] = []
+
+    for target_session_attrs in _TARGET_SESSION_ATTRS_PASSES.get(
+        credentials.target_session_attrs,
+        (credentials.target_session_attrs,),
+    ):
+        if target_session_attrs is not None:
+            params["target_session_attrs"] = target_session_attrs
+
+        for host, port in credentials.addresses():
+            try:
+                async with asyncio.timeout(credentials.connect_timeout):
+                    return await psycopg.AsyncConnection.connect(
+                        **{**params, "host": host, "port": port},
+                        **kwargs,
+                    )
+            except TimeoutError:
+                errors.append(f"{host}:{port}: connection timeout expired")
+            except psycopg.OperationalError as e:
+                errors.append(f"{host}:{port}: {e}")
+
+    raise psycopg.OperationalError(
+        "Could not connect to any host:\n" + "\n".join(errors)
+    )
+
+
+async def _record_write_lsn(connection: AsyncConnection[DictRow]) -> None:
+    """Remember the primary's WAL position after a write for read your writes"""
+    async with connection.transaction():
+        cursor = await connection.execute("select pg_current_wal_lsn()::text as lsn")
+        row = await cursor.fetchone()
+
+    if row is not None:
+        replicas_module.record_write(row["lsn"])
+
+
+def _is_connection_error(exception: BaseException) -> bool:
+    if not isinstance(exception, psycopg.OperationalError):
+        return False
+
+    # Errors without a SQLSTATE come from the connection, not the server
+    if exception.sqlstate is None:
+        return True
+
+    return (
+        exception.sqlstate.startswith("08")
+        or exception.sqlstate in _CONNECTION_ERROR_SQLSTATES
+    )
+
+
+def _get_query_timeout(
+    timeout: Optional[float],
+    deadline_timeout: Optional[float],
+) -> Optional[float]:
+    if deadline_timeout is None:
+        return timeout
+
+    # The server enforces the deadline through statement_timeout, the client
+    # side timeout is only a fallback for when the server can't be reached
+    deadline_timeout += _DEADLINE_GRACE
+
+    if timeout is None:
+        return deadline_timeout
+
+    return min(timeout, deadline_timeout)
+
+
+async def _send_query(
+    connection: AsyncConnection[DictRow],
+    cursor: AsyncCursor[DictRow],
+    query: Query,
+    query_params: Optional[dict[str, Any] | Sequence[dict[str, Any]]],
+    deadline_timeout: Optional[float],
+    *,
+    restore_statement_timeout: bool,
 ) -> None:
-    if hooks is None:
+    """Execute the query, with the deadline's remaining time as its
+    statement_timeout
+
+    The statement_timeout is sent in a pipeline with the query, so it doesn't
+    cost another round trip.
+    """
+    if deadline_timeout is None:
+        await _execute(cursor, query, query_params)
         return
 
-    for hook in hooks:
-        hook.post_query(result_type, rows_returned, batch_size)
+    # A statement_timeout of 0 disables the timeout
+    milliseconds = max(1, int(deadline_timeout * 1000))
 
+    async with connection.pipeline():
+        await connection.execute(
+            _SET_STATEMENT_TIMEOUT,
+            {"timeout": f"{milliseconds}ms"},
+        )
+        await _execute(cursor, query, query_params)
 
-def _apply_exception_hooks(
-    hooks: Optional[list[BaseHook]],
-    exception: Exception,
+        # Local settings last until the end of the transaction rather than
+        # the deadline, later queries of the transaction get the previous one
+        if restore_statement_timeout:
+            await connection.execute(_RESTORE_STATEMENT_TIMEOUT)
+
+    # Leaving the pipeline received every result
+
+
+async def _execute(
+    cursor: AsyncCursor[DictRow],
+    query: Query,
+    query_params: Optional[dict[str, Any] | Sequence[dict[str, Any]]],
 ) -> None:
-    if hooks is None:
+    if isinstance(query_params, Sequence):
+        await cursor.executemany(query, query_params)
+    else:
+        await cursor.execute(query, query_params)
+
+
+async def _fetch_nothing(_: AsyncCursor[DictRow]) -> None:
+    return None
+
+
+async def _fetch_rowcount(cursor: AsyncCursor[DictRow]) -> int:
+    return max(cursor.rowcount, 0)
+
+
+async def _ping(connection: AsyncConnection[Any], timeout: float) -> None:
+    """Check that the server still answers on the connection, closing it if
+    it doesn't within `timeout` seconds"""
+    ping = asyncio.create_task(connection.execute("select 1"))
+
+    try:
+        done, _ = await asyncio.wait([ping], timeout=timeout)
+    except BaseException:
+        ping.cancel()
+        raise
+
+    if ping in done:
+        ping.result()
         return
 
+    # Closed first so psycopg doesn't wait for the server to cancel the ping
+    await connection.close()
+    ping.cancel()
+    await asyncio.gather(ping, return_exceptions=True)
+    raise psycopg.OperationalError(f"No answer to a ping within {timeout} seconds")
+
+
+def _parse_notification(
+    notify: psycopg.Notify,
+    payload_model: Optional[type[BaseModelT]],
+) -> Notification[str] | Notification[BaseModelT]:
+    if payload_model is None:
+        return Notification(notify.channel, notify.payload, notify.pid)
+
+    try:
+        payload = payload_model.model_validate_json(notify.payload)
+    except Exception as e:
+        model_name = getattr(payload_model, "__name__")
+        msg = f"Could not marshall payload {notify.payload} into model {model_name}"
+        raise MarshallRecordException(msg) from e
+
+    return Notification(notify.channel, payload, notify.pid)
+
+
+def _apply_pre_hooks(
+    hooks: Optional[list[BaseHook]],
+    hook_context: HookContext,
+) -> StartedHooks:
+    if hooks is None:
+        return []
+
+    return [(hook, hook.pre_query(hook_context)) for hook in hooks]
+
+
+def _apply_phase_hooks(
+    started_hooks: StartedHooks,
+    hook_context: HookContext,
+    phase: QueryPhase,
+) -> None:
+    timestamp = hook_context.record_phase(phase)
+
+    for hook, state in started_hooks:
+        hook.on_phase(hook_context, state, phase, timestamp)
+
+
+def _apply_post_hooks(
+    started_hooks: StartedHooks,
+    hook_context: HookContext,
+    result_type: Literal["success", "error"],
+    rows_returned: int,
+    batch_size: int = 1,
+) -> None:
+    for hook, state in started_hooks:
+        hook.post_query(hook_context, state, result_type, rows_returned, batch_size)
+
+
+def _apply_hedge_hooks(
+    started_hooks: StartedHooks,
+    hook_context: HookContext,
+    delay: float,
+    won: bool,
+) -> None:
+    for hook, _ in started_hooks:
+        hook.on_hedge(hook_context, delay, won)
+
+
+def _apply_batch_hooks(
+    hooks: list[BaseHook],
+    hook_context: HookContext,
+    operation: BatchOperation,
+    batch: int,
+    rows: int,
+) -> None:
     for hook in hooks:
-        hook.on_exception(exception)
+        hook.on_batch(hook_context, operation, batch, rows)
+
+
+def _apply_exception_hooks(
+    started_hooks: StartedHooks,
+    hook_context: HookContext,
+    exception: BaseException,
+) -> None:
+    for hook, state in started_hooks:
+        hook.on_exception(hook_context, state, exception)
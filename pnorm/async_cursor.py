@@ -3,7 +3,9 @@ from __future__ import annotations
 from contextlib import asynccontextmanager
 from typing import TYPE_CHECKING, AsyncGenerator, cast
 
+import psycopg
 from psycopg import AsyncConnection, AsyncCursor
+from psycopg.pq import TransactionStatus
 from psycopg.rows import DictRow
 
 from pnorm.exceptions import connection_not_created
@@ -57,8 +59,15 @@ class SingleCommitCursor:
         if connection is None:
             connection_not_created()
 
-        async with connection.cursor() as cursor:
-            yield cursor
+        try:
+            async with connection.cursor() as cursor:
+                yield cursor
+        except psycopg.Error:
+            # Leave the session usable for the next query after a failed one
+            if connection.info.transaction_status == TransactionStatus.INERROR:
+                await connection.rollback()
+
+            raise
 
         await connection.commit()
 
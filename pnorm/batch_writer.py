@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Iterable
+from typing import TYPE_CHECKING, Optional
+
+from .hooks.base import BaseHook
+from .pnorm_types import ParamType, Query, QueryContext
+
+if TYPE_CHECKING:
+    from .async_client import AsyncPostgresClient
+
+
+class BatchWriter:
+    """Buffers rows written by concurrent producers and writes them in
+    batches on a background task
+
+    A batch is written once `max_rows` rows are buffered, `max_delay`
+    seconds after its first row was buffered, or when `flush` is called.
+    Writers wait while `max_buffered_rows` rows are buffered. Create with
+    AsyncPostgresClient.batch_writer
+    """
+
+    def __init__(
+        self,
+        client: AsyncPostgresClient,
+        query: Query,
+        max_rows: int,
+        max_delay: float,
+        max_buffered_rows: int,
+        timeout: Optional[float],
+        query_context: Optional[QueryContext],
+        hooks: Optional[list[BaseHook]],
+    ) -> None:
+        if max_rows < 1:
+            raise ValueError("max_rows must be at least 1")
+
+        if max_buffered_rows < max_rows:
+            raise ValueError("max_buffered_rows must be at least max_rows")
+
+        self.client = client
+        self.query = query
+        self.max_rows = max_rows
+        self.max_delay = max_delay
+        self.max_buffered_rows = max_buffered_rows
+        self.timeout = timeout
+        self.query_context = query_context
+        self.hooks = hooks
+        self._rows: list[ParamType] = []
+        # When the oldest buffered row was written, from the event loop's clock
+        self._first_row_at = 0.0
+        # Running totals of rows written by producers, taken into a batch
+        # and stored in the database, and rows to write without waiting
+        self._buffered_total = 0
+        self._taken_total = 0
+        self._stored_total = 0
+        self._flush_until = 0
+        self._closing = False
+        self._error: Optional[BaseException] = None
+        self._changed = asyncio.Condition()
+        self._task: Optional[asyncio.Task[None]] = None
+
+    async def write(self, params: ParamType) -> None:
+        """Add a row to the buffer, waiting while it is full
+
+        Parameters
+        ----------
+        params : Mapping[str, Any] | BaseModel
+            Named parameters for the writer's SQL query
+
+        Raises
+        ------
+        RuntimeError
+            When the writer is closed
+        """
+        await self.write_many([params])
+
+    async def write_many(self, params: Iterable[ParamType]) -> None:
+        """Add rows to the buffer in order, waiting while it is full"""
+        async with self._changed:
+            for row_params in params:
+                await self._changed.wait_for(
+                    lambda: (
+                        len(self._rows) < self.max_buffered_rows
+                        or self._error is not None
+                        or self._closing
+                    )
+                )
+                self._raise_if_unusable()
+
+                if len(self._rows) == 0:
+                    self._first_row_at = asyncio.get_running_loop().time()
+
+                self._rows.append(row_params)
+                self._buffered_total += 1
+                self._changed.notify_all()
+
+    async def flush(self) -> None:
+        """Write every buffered row now and wait until they are stored"""
+        async with self._changed:
+            self._raise_if_unusable()
+            target = self._buffered_total
+            self._flush_until = max(self._flush_until, target)
+            self._changed.notify_all()
+            await self._changed.wait_for(
+                lambda: self._stored_total >= target or self._error is not None
+            )
+
+            if self._error is not None:
+                raise self._error
+
+    async def close(self) -> None:
+        """Write every buffered row and stop the background task"""
+        async with self._changed:
+            self._closing = True
+            self._changed.notify_all()
+
+        if self._task is not None:
+            await self._task
+
+        if self._error is not None:
+            raise self._error
+
+    def _start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def _cancel(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    def _raise_if_unusable(self) -> None:
+        if self._error is not None:
+            raise self._error
+
+        if self._closing:
+            raise RuntimeError("BatchWriter is closed")
+
+    async def _run(self) -> None:
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(
+                    lambda: len(self._rows) > 0 or self._closing
+                )
+
+                if len(self._rows) == 0:
+                    return
+
+                await self._wait_for_batch()
+                batch = self._rows[: self.max_rows]
+                del self._rows[: self.max_rows]
+                self._taken_total += len(batch)
+                # Rows left over were waiting for room, they are written soon
+                self._first_row_at = asyncio.get_running_loop().time()
+                self._changed.notify_all()
+
+            try:
+                await self.client.execute_many(
+                    self.query,
+                    batch,
+                    chunk_size=len(batch),
+                    timeout=self.timeout,
+                    query_context=self.query_context,
+                    hooks=self.hooks,
+                )
+            except Exception as e:
+                async with self._changed:
+                    self._error = e
+                    self._changed.notify_all()
+
+                return
+
+            async with self._changed:
+                self._stored_total += len(batch)
+                self._changed.notify_all()
+
+    async def _wait_for_batch(self) -> None:
+        """Wait with the condition's lock held until the buffered rows should
+        be written"""
+        loop = asyncio.get_running_loop()
+
+        while (
+            len(self._rows) < self.max_rows
+            and self._taken_total >= self._flush_until
+            and not self._closing
+        ):
+            remaining = self._first_row_at + self.max_delay - loop.time()
+
+            if remaining <= 0:
+                return
+
+            try:
+                async with asyncio.timeout(remaining):
+                    await self._changed.wait()
+            except TimeoutError:
+                return
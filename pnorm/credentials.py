@@ -1,6 +1,25 @@
-from typing import Protocol, TypedDict
+import math
+from typing import Literal, Optional, Protocol, TypedDict
 
-from pydantic import AliasChoices, BaseModel, ConfigDict, Field, SecretStr
+from pydantic import (
+    AliasChoices,
+    BaseModel,
+    ConfigDict,
+    Field,
+    SecretStr,
+    field_validator,
+    model_validator,
+)
+from typing_extensions import NotRequired, Self
+
+TargetSessionAttrs = Literal[
+    "any",
+    "read-write",
+    "read-only",
+    "primary",
+    "standby",
+    "prefer-standby",
+]
 
 
 class CredentialsDict(TypedDict):
@@ -8,7 +27,9 @@ class CredentialsDict(TypedDict):
     user: str
     password: str
     host: str
-    port: int
+    port: int | str
+    target_session_attrs: NotRequired[str]
+    connect_timeout: NotRequired[int]
 
 
 class CredentialsProtocol(Protocol):
@@ -28,16 +49,62 @@ class PostgresCredentials(BaseModel):
     )
     user: str
     password: SecretStr
-    host: str
-    port: int = 5432
+    # Hosts are tried in order, "host1,host2" is the same as ["host1", "host2"]
+    host: str | list[str]
+    # One port for every host, or one per host
+    port: int | list[int] = 5432
+    # Kind of server to connect to, see libpq's target_session_attrs
+    target_session_attrs: Optional[TargetSessionAttrs] = None
+    # Seconds to wait for each host before trying the next one
+    connect_timeout: Optional[float] = None
 
     model_config = ConfigDict(extra="forbid")
 
+    @field_validator("port", mode="before")
+    @classmethod
+    def _split_ports(cls, port: object) -> object:
+        if isinstance(port, str) and "," in port:
+            return [int(p) for p in port.split(",")]
+
+        return port
+
+    @model_validator(mode="after")
+    def _check_ports(self) -> Self:
+        if isinstance(self.port, list) and len(self.port) != len(self.hosts()):
+            raise ValueError("Give one port, or one port for each host")
+
+        return self
+
+    def hosts(self) -> list[str]:
+        if isinstance(self.host, list):
+            return self.host
+
+        return self.host.split(",")
+
+    def addresses(self) -> list[tuple[str, int]]:
+        """(host, port) pairs in the order they are tried"""
+        hosts = self.hosts()
+        ports = self.port if isinstance(self.port, list) else [self.port] * len(hosts)
+        return list(zip(hosts, ports))
+
     def as_dict(self) -> CredentialsDict:
-        return {
+        credentials: CredentialsDict = {
             "dbname": self.dbname,
             "user": self.user,
             "password": self.password.get_secret_value(),
-            "host": self.host,
-            "port": self.port,
+            "host": ",".join(self.hosts()),
+            "port": (
+                ",".join(str(port) for port in self.port)
+                if isinstance(self.port, list)
+                else self.port
+            ),
         }
+
+        if self.target_session_attrs is not None:
+            credentials["target_session_attrs"] = self.target_session_attrs
+
+        if self.connect_timeout is not None:
+            # libpq only takes whole seconds, pnorm enforces the exact timeout
+            credentials["connect_timeout"] = math.ceil(self.connect_timeout)
+
+        return credentials
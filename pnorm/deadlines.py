@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Generator, Optional
+
+# time.monotonic() by which the queries in the current context must finish
+_deadline: ContextVar[Optional[float]] = ContextVar("pnorm_deadline", default=None)
+
+
+@contextmanager
+def deadline(seconds: float) -> Generator[None, None, None]:
+    """Set a time budget for every query run inside the block
+
+    The remaining budget is used as the timeout for each query and is sent to
+    Postgres as the statement_timeout, so the server stops the query itself
+    once the budget is spent. Nested deadlines can only shorten the budget.
+
+    Parameters
+    ----------
+    seconds : float
+        Time from now that every query in the block must finish by
+
+    Examples
+    --------
+    with deadline(2.5):
+        user = await db.get(User, ...)
+        orders = await db.select(Order, ...)
+    """
+    new_deadline = time.monotonic() + seconds
+    current_deadline = _deadline.get()
+
+    if current_deadline is not None:
+        new_deadline = min(new_deadline, current_deadline)
+
+    token = _deadline.set(new_deadline)
+
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining_time() -> Optional[float]:
+    """Seconds left before the current deadline, or None without a deadline"""
+    current_deadline = _deadline.get()
+
+    if current_deadline is None:
+        return None
+
+    return current_deadline - time.monotonic()
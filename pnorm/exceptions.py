@@ -24,3 +24,7 @@ def connection_not_created() -> Never:
 
 class MarshallRecordException(Exception):
     """The returned record does not match the model you are trying to marshall it into"""
+
+
+class DeadlineExceededException(TimeoutError):
+    """The deadline set with pnorm.deadline or start_session(deadline=...) passed before the query completed"""
@@ -0,0 +1,195 @@
+import hashlib
+import random
+import re
+from collections.abc import Collection, Mapping, Sequence
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Optional
+
+from pnorm.pnorm_types import QueryContext
+
+
+@dataclass(frozen=True)
+class TelemetryOptions:
+    """Limits on the telemetry recorded for each query
+
+    Parameters
+    ----------
+    max_param_rows : Optional[int] = 10
+        Number of rows of a multi-row execute to record parameters for
+    max_params : Optional[int] = 128
+        Total number of parameter attributes to record for a query
+    max_value_length : Optional[int] = 1024
+        Longer string and bytes parameter values are truncated to this length
+    redact : Collection[str] = ()
+        Names of parameters whose values are never recorded
+    sample_rate : float = 1.0
+        Fraction of queries to trace, between 0 and 1
+    sample_rates : Mapping[str, float] = {}
+        Sample rate by QueryContext.operation_name, overriding sample_rate
+    """
+
+    max_param_rows: Optional[int] = 10
+    max_params: Optional[int] = 128
+    max_value_length: Optional[int] = 1024
+    redact: Collection[str] = ()
+    sample_rate: float = 1.0
+    sample_rates: Mapping[str, float] = field(default_factory=dict)
+
+    def should_sample(self, query_context: Optional[QueryContext]) -> bool:
+        sample_rate = self.sample_rate
+
+        if query_context is not None and query_context.operation_name is not None:
+            sample_rate = self.sample_rates.get(
+                query_context.operation_name,
+                sample_rate,
+            )
+
+        if sample_rate >= 1:
+            return True
+
+        return random.random() < sample_rate
+
+
+REDACTED = "[REDACTED]"
+
+
+def get_query_attributes(
+    query: str,
+    query_params: Optional[dict[str, Any] | Sequence[dict[str, Any]]] = None,
+    query_context: Optional[QueryContext] = None,
+    options: Optional[TelemetryOptions] = None,
+    include_params: bool = True,
+) -> dict[str, Any]:
+    #
+    # TODO: ADD REQUEST TIME ??
+    #
+
+    attributes: dict[str, Any] = {
+        "db.system.name": "postgresql",
+        "db.query.text": query,
+        # "server.address": "",
+        # "server.port": "",
+        # "network.peer.address": "",
+        # "network.peer.port": "",
+    }
+
+    # TODO: schema
+
+    if query_context is not None:
+        if query_context.primary_table_name is not None:
+            attributes["db.collection.name"] = query_context.primary_table_name
+
+        if query_context.operation_name is not None:
+            attributes["db.operation.name"] = query_context.operation_name
+
+        if query_context.query_summary is not None:
+            attributes["db.query.summary"] = query_context.query_summary
+
+    if query_params is None or not include_params:
+        return attributes
+
+    if options is None:
+        options = TelemetryOptions()
+
+    # Only the parameters that will be recorded are formatted, so large
+    # executemany batches don't cost more to record than to run
+    if isinstance(query_params, Mapping):
+        rows: Sequence[tuple[str, Mapping[str, Any]]] = [("", query_params)]
+    else:
+        rows = [
+            (f"{i}.", params)
+            for i, params in enumerate(query_params[: options.max_param_rows])
+        ]
+
+    remaining = options.max_params
+
+    for prefix, params in rows:
+        for key, value in params.items():
+            if remaining is not None:
+                if remaining <= 0:
+                    return attributes
+
+                remaining -= 1
+
+            attributes[f"db.operation.parameter.{prefix}{key}"] = _format_value(
+                key,
+                value,
+                options,
+            )
+
+    return attributes
+
+
+def _format_value(key: str, value: Any, options: TelemetryOptions) -> Any:
+    if key in options.redact:
+        return REDACTED
+
+    if not isinstance(value, str | bytes | int | float | bool):
+        value = str(value)
+
+    if (
+        options.max_value_length is not None
+        and isinstance(value, str | bytes)
+        and len(value) > options.max_value_length
+    ):
+        return value[: options.max_value_length]
+
+    return value
+
+
+def get_metric_attributes(
+    query: str,
+    query_context: Optional[QueryContext] = None,
+) -> dict[str, Any]:
+    """Low cardinality attributes that are safe to use as metric dimensions"""
+    attributes: dict[str, Any] = {
+        "db.system.name": "postgresql",
+        "db.query.fingerprint": fingerprint_query(query),
+    }
+
+    if query_context is not None:
+        if query_context.primary_table_name is not None:
+            attributes["db.collection.name"] = query_context.primary_table_name
+
+        if query_context.operation_name is not None:
+            attributes["db.operation.name"] = query_context.operation_name
+
+        if query_context.query_summary is not None:
+            attributes["db.query.summary"] = query_context.query_summary
+
+    return attributes
+
+
+_COMMENTS = re.compile(r"--[^\n]*|/\*.*?\*/", re.DOTALL)
+_LITERALS = re.compile(
+    r"'(?:[^']|'')*'"  # strings
+    r"|%\(\w+\)s|%s|\$\d+"  # placeholders
+    r"|\b\d+(?:\.\d+)?\b"  # numbers
+)
+_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=1024)
+def fingerprint_query(query: str) -> str:
+    """Hash of the query with comments, literals and placeholders removed
+
+    Queries that only differ in their values share a fingerprint.
+    """
+    normalized = _COMMENTS.sub(" ", query)
+    normalized = _LITERALS.sub("?", normalized)
+    normalized = _LISTS.sub("(?)", normalized)
+    normalized = _WHITESPACE.sub(" ", normalized).strip().lower()
+
+    return hashlib.blake2b(normalized.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def get_result_attributes(
+    rows_returned: int,
+    batch_size: int = 1,
+) -> dict[str, Any]:
+    return {
+        "db.response.returned_rows": rows_returned,
+        "db.operation.batch.size": batch_size,
+    }
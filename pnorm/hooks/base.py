@@ -1,22 +1,204 @@
+import time
 from collections.abc import Sequence
-from typing import Any, Literal, Optional
+from dataclasses import dataclass, field
+from functools import cached_property
+from typing import Any, Generic, Literal, Optional, TypeVar
 
 from pnorm.pnorm_types import QueryContext
 
+from .attributes import (
+    TelemetryOptions,
+    get_metric_attributes,
+    get_query_attributes,
+)
 
-class BaseHook:
-    def pre_query(
+HookStateT = TypeVar("HookStateT")
+
+# Lifecycle events of a query, in the order they happen. Queries use client
+# side cursors, so the whole result has been received once execute returns
+# and the time the server spent running the query can't be told apart from
+# the time spent transferring its rows
+QueryPhase = Literal[
+    "connection_acquired",
+    "execute_sent",
+    "result_received",
+    "fetch_complete",
+    "marshal_complete",
+]
+
+# What is being retried, a whole transaction or a single query
+RetryOperation = Literal["transaction", "query"]
+
+# Operations that send their work to the database in several batches
+BatchOperation = Literal["execute_many", "execute_in_batches"]
+
+
+@dataclass
+class HookContext:
+    """A single query as seen by the hooks
+
+    Created once per query by the client and shared by every hook, so work
+    such as building the telemetry attributes is only done once.
+    """
+
+    query: str
+    query_params: Optional[dict[str, Any] | Sequence[dict[str, Any]]] = None
+    query_context: Optional[QueryContext] = None
+    options: TelemetryOptions = field(default_factory=TelemetryOptions)
+    # Whether the query was picked by head sampling to be traced
+    sampled: bool = field(init=False)
+    # time.perf_counter() when the query started and when each phase ended
+    started_at: float = field(init=False, default_factory=time.perf_counter)
+    phases: dict[QueryPhase, float] = field(init=False, default_factory=dict)
+
+    def __post_init__(self) -> None:
+        self.sampled = self.options.should_sample(self.query_context)
+
+    def record_phase(self, phase: QueryPhase) -> float:
+        timestamp = time.perf_counter()
+        self.phases[phase] = timestamp
+        return timestamp
+
+    def phase_duration(self, phase: QueryPhase) -> float:
+        """Seconds between the previous phase (or the start) and this phase"""
+        previous = self.started_at
+
+        for recorded_phase, timestamp in self.phases.items():
+            if recorded_phase == phase:
+                return timestamp - previous
+
+            previous = timestamp
+
+        raise ValueError(f"Phase {phase} has not been recorded")
+
+    @cached_property
+    def attributes(self) -> dict[str, Any]:
+        """Telemetry attributes describing the query. Shared, do not modify
+
+        Parameters are only included for sampled queries.
+        """
+        return get_query_attributes(
+            self.query,
+            self.query_params,
+            self.query_context,
+            self.options,
+            include_params=self.sampled,
+        )
+
+    @cached_property
+    def metric_attributes(self) -> dict[str, Any]:
+        """Low cardinality attributes for metrics. Shared, do not modify
+
+        Uses a fingerprint of the query instead of its text and never
+        includes parameters, so each distinct value doesn't become a new
+        time series.
+        """
+        return get_metric_attributes(self.query, self.query_context)
+
+
+class BaseHook(Generic[HookStateT]):
+    """Runs around every query
+
+    Hook instances are shared between queries, which may run concurrently, so
+    anything specific to a single query should not be stored on the hook.
+    Instead return it from `pre_query`, it is then passed back as `state` to
+    `post_query` or `on_exception` for the same query.
+    """
+
+    def pre_query(self, context: HookContext) -> Optional[HookStateT]:
+        return None
+
+    def on_phase(
         self,
-        query: str,
-        query_params: Optional[dict[str, Any] | Sequence[dict[str, Any]]] = None,
-        query_context: Optional[QueryContext] = None,
-    ) -> None: ...
+        context: HookContext,
+        state: HookStateT,
+        phase: QueryPhase,
+        timestamp: float,
+    ) -> None:
+        """Called as the query moves through each QueryPhase
+
+        `timestamp` is from time.perf_counter(). `marshal_complete` happens
+        after `post_query`, and no phase is reported for a query without a
+        result to marshal.
+        """
 
     def post_query(
         self,
+        context: HookContext,
+        state: HookStateT,
         result_type: Literal["success", "error"],
         rows_returned: int,
         batch_size: int = 1,
     ) -> None: ...
 
-    def on_exception(self, exception: Exception) -> None: ...
+    def on_exception(
+        self,
+        context: HookContext,
+        state: HookStateT,
+        exception: BaseException,
+    ) -> None:
+        """Called instead of `post_query` when the query fails
+
+        This includes timeouts and the query's task being cancelled
+        (asyncio.CancelledError).
+        """
+
+    def on_retry(
+        self,
+        context: Optional[HookContext],
+        operation: RetryOperation,
+        attempt: int,
+        exception: BaseException,
+        delay: float,
+    ) -> None:
+        """Called when a failed operation is about to be retried
+
+        `attempt` is the number of the attempt that failed, starting at 1, and
+        `delay` the seconds waited before the next attempt. `context` is the
+        failed query, or None when a whole transaction is retried.
+        """
+
+    def on_hedge(
+        self,
+        context: HookContext,
+        delay: float,
+        won: bool,
+    ) -> None:
+        """Called when a read was sent to a second replica after `delay`
+        seconds, once the first of the two answered
+
+        `won` is whether the second replica answered first.
+        """
+
+    def on_gather_target(
+        self,
+        context: HookContext,
+        target: str,
+        duration: float,
+        rows_returned: int,
+    ) -> None:
+        """Called when a query run on several databases with gather_select
+        finished on one of them
+
+        `target` is the database as "host:port/dbname", and `duration` the
+        seconds the query took on it.
+        """
+
+    def on_batch(
+        self,
+        context: HookContext,
+        operation: BatchOperation,
+        batch: int,
+        rows: int,
+    ) -> None:
+        """Called when one batch of an operation sent in several batches is
+        done, after `post_query` for the batch's query
+
+        `batch` is the number of the batch, starting at 1. For execute_many
+        `rows` is the number of parameter sets in the batch, for
+        execute_in_batches the number of rows the batch affected.
+        """
+
+
+# Hooks that ran pre_query for a query along with the state each returned
+StartedHooks = list[tuple[BaseHook[Any], Any]]
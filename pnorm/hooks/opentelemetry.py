@@ -1,12 +1,17 @@
-from collections.abc import Mapping, Sequence
-from datetime import datetime
+import time
+from dataclasses import dataclass
 from typing import TYPE_CHECKING, Any, Literal, Optional
 
 from typing_extensions import override
 
-from pnorm.pnorm_types import QueryContext
-
-from .base import BaseHook
+from .attributes import get_result_attributes
+from .base import (
+    BaseHook,
+    BatchOperation,
+    HookContext,
+    QueryPhase,
+    RetryOperation,
+)
 
 if TYPE_CHECKING:
     from opentelemetry.trace import Span
@@ -14,78 +19,15 @@ if TYPE_CHECKING:
 # TODO: try to import -> failure message
 
 
-def _get_attributes(
-    query: str,
-    query_params: Optional[dict[str, Any] | Sequence[dict[str, Any]]] = None,
-    query_context: Optional[QueryContext] = None,
-) -> dict[str, Any]:
-    #
-    # TODO: ADD REQUEST TIME ??
-    #
-
-    attributes: dict[str, Any] = {
-        "db.system.name": "postgresql",
-        "db.query.text": query,
-        # "server.address": "",
-        # "server.port": "",
-        # "network.peer.address": "",
-        # "network.peer.port": "",
-    }
-
-    # TODO: schema
-
-    if query_context is not None:
-        if query_context.primary_table_name is not None:
-            attributes["db.collection.name"] = query_context.primary_table_name
-
-        if query_context.operation_name is not None:
-            attributes["db.operation.name"] = query_context.operation_name
-
-        if query_context.query_summary is not None:
-            attributes["db.query.summary"] = query_context.query_summary
-
-    if query_params is None:
-        return attributes
-
-    if isinstance(query_params, Mapping):
-        for key, value in query_params.items():
-            # TODO: secret values?
-            # either have pydantic models with SecretStr
-            # or in context have a list of values to replace with **
-            if isinstance(value, str | bytes | int | float | bool):
-                attributes[f"db.operation.parameter.{key}"] = value
-            else:
-                attributes[f"db.operation.parameter.{key}"] = str(value)
-
-        return attributes
-
-    # TODO: this could be bad for inserting data... maybe have a way to turn off in execute
-    # or have a way to specify only certain parameters are being included
-    for i, params in enumerate(query_params):
-        for key, value in params.items():
-            # TODO: secret values?
-            # either have pydantic models with SecretStr
-            # or in context have a list of values to replace with **
-            if isinstance(value, str | bytes | int | float | bool):
-                attributes[f"db.operation.parameter.{i}.{key}"] = value
-            else:
-                attributes[f"db.operation.parameter.{i}.{key}"] = str(value)
-
-    return attributes
-
-
-def _get_result_attributes(
-    rows_returned: int,
-    batch_size: int = 1,
-) -> dict[str, Any]:
-    return {
-        "db.response.returned_rows": rows_returned,
-        "db.operation.batch.size": batch_size,
-    }
-
-
-class RequestsTimingHook(BaseHook):
-    def __init__(self) -> None:
+class RequestsTimingHook(BaseHook[float]):
+    def __init__(self, full_attributes: bool = False) -> None:
+        """
+        Parameters
+        ----------
+        full_attributes : bool = False
+            Record the query text, parameters and row counts as metric
+            attributes. Each distinct value creates a new time series
+        """
         from opentelemetry.metrics import get_meter_provider
 
         self.meter = get_meter_provider().get_meter("pnorm")
@@ -93,70 +35,140 @@ class RequestsTimingHook(BaseHook):
             name="database_requests_duration",
             description="Duration of database requests",
         )
-        self.start_time: datetime | None = None
-        self.attributes: dict[str, Any] = {}
+        self.full_attributes = full_attributes
 
     @override
-    def pre_query(
-        self,
-        query: str,
-        query_params: Optional[dict[str, Any] | Sequence[dict[str, Any]]] = None,
-        query_context: Optional[QueryContext] = None,
-    ) -> None:
-        self.start_time = datetime.now()
-        self.attributes = _get_attributes(query, query_params, query_context)
+    def pre_query(self, context: HookContext) -> float:
+        return time.perf_counter()
 
     @override
     def post_query(
         self,
+        context: HookContext,
+        state: float,
         result_type: Literal["success", "error"],
         rows_returned: int,
         batch_size: int = 1,
     ) -> None:
-        assert self.start_time is not None, "start_time should not be None"
-
-        self.attributes.update(_get_result_attributes(rows_returned, batch_size))
+        self.counter.record(
+            time.perf_counter() - state,
+            _get_metric_attributes(
+                context,
+                result_type,
+                rows_returned,
+                batch_size,
+                self.full_attributes,
+            ),
+        )
 
+    @override
+    def on_exception(
+        self,
+        context: HookContext,
+        state: float,
+        exception: BaseException,
+    ) -> None:
         self.counter.record(
-            (datetime.now() - self.start_time).total_seconds(),
-            self.attributes,
+            time.perf_counter() - state,
+            _get_exception_attributes(context, exception, self.full_attributes),
         )
 
 
-class RequestsCounterHook(BaseHook):
+class RequestsPhaseTimingHook(BaseHook[None]):
+    """Time spent in each phase of a query
+
+    The duration recorded for a phase is the time since the previous phase, so
+    `connection_acquired` is the time waiting for a connection,
+    `result_received` the time the server took to run the query and send
+    every row, and `marshal_complete` the time spent building the return
+    models. The query's rows are received all at once, so there is no
+    separate time to the first row.
+    """
+
     def __init__(self) -> None:
         from opentelemetry.metrics import get_meter_provider
 
         self.meter = get_meter_provider().get_meter("pnorm")
-        self.counter = self.meter.create_counter(
-            name="database_requests_total",
-            description="Total number of database requests",
+        self.histogram = self.meter.create_histogram(
+            name="database_requests_phase_duration",
+            description="Duration of each phase of database requests",
+            unit="s",
         )
-        self.attributes: dict[str, Any] = {}
 
     @override
-    def pre_query(
+    def on_phase(
         self,
-        query: str,
-        query_params: Optional[dict[str, Any] | Sequence[dict[str, Any]]] = None,
-        query_context: Optional[QueryContext] = None,
+        context: HookContext,
+        state: None,
+        phase: QueryPhase,
+        timestamp: float,
     ) -> None:
-        self.attributes = _get_attributes(query, query_params, query_context)
+        self.histogram.record(
+            context.phase_duration(phase),
+            {**context.metric_attributes, "db.query.phase": phase},
+        )
+
+
+class RequestsCounterHook(BaseHook[None]):
+    def __init__(self, full_attributes: bool = False) -> None:
+        """
+        Parameters
+        ----------
+        full_attributes : bool = False
+            Record the query text, parameters and row counts as metric
+            attributes. Each distinct value creates a new time series
+        """
+        from opentelemetry.metrics import get_meter_provider
+
+        self.meter = get_meter_provider().get_meter("pnorm")
+        self.counter = self.meter.create_counter(
+            name="database_requests_total",
+            description="Total number of database requests",
+        )
+        self.full_attributes = full_attributes
 
     @override
     def post_query(
         self,
+        context: HookContext,
+        state: None,
         result_type: Literal["success", "error"],
         rows_returned: int,
         batch_size: int = 1,
     ) -> None:
-        self.attributes.update(_get_result_attributes(rows_returned, batch_size))
+        self.counter.add(
+            1,
+            _get_metric_attributes(
+                context,
+                result_type,
+                rows_returned,
+                batch_size,
+                self.full_attributes,
+            ),
+        )
 
-        self.counter.add(1, self.attributes)
+    @override
+    def on_exception(
+        self,
+        context: HookContext,
+        state: None,
+        exception: BaseException,
+    ) -> None:
+        self.counter.add(
+            1,
+            _get_exception_attributes(context, exception, self.full_attributes),
+        )
 
 
-class RequestsSuccessHook(BaseHook):
-    def __init__(self) -> None:
+class RequestsSuccessHook(BaseHook[None]):
+    def __init__(self, full_attributes: bool = False) -> None:
+        """
+        Parameters
+        ----------
+        full_attributes : bool = False
+            Record the query text, parameters and row counts as metric
+            attributes. Each distinct value creates a new time series
+        """
         from opentelemetry.metrics import get_meter_provider
 
         self.meter = get_meter_provider().get_meter("pnorm")
@@ -164,117 +176,475 @@ class RequestsSuccessHook(BaseHook):
             name="database_requests_success",
             description="Total number of successful database requests",
         )
-        self.attributes: dict[str, Any] = {}
+        self.full_attributes = full_attributes
 
     @override
-    def pre_query(
+    def post_query(
         self,
-        query: str,
-        query_params: Optional[dict[str, Any] | Sequence[dict[str, Any]]] = None,
-        query_context: Optional[QueryContext] = None,
+        context: HookContext,
+        state: None,
+        result_type: Literal["success", "error"],
+        rows_returned: int,
+        batch_size: int = 1,
     ) -> None:
-        self.attributes = _get_attributes(query, query_params, query_context)
+        if result_type != "success":
+            return
+
+        self.counter.add(
+            1,
+            _get_metric_attributes(
+                context,
+                result_type,
+                rows_returned,
+                batch_size,
+                self.full_attributes,
+            ),
+        )
+
+
+class RequestsFailureHook(BaseHook[None]):
+    def __init__(self, full_attributes: bool = False) -> None:
+        """
+        Parameters
+        ----------
+        full_attributes : bool = False
+            Record the query text, parameters and row counts as metric
+            attributes. Each distinct value creates a new time series
+        """
+        from opentelemetry.metrics import get_meter_provider
+
+        self.meter = get_meter_provider().get_meter("pnorm")
+        self.counter = self.meter.create_counter(
+            name="database_requests_failure",
+            description="Total number of failed database requests",
+        )
+        self.full_attributes = full_attributes
 
     @override
     def post_query(
         self,
+        context: HookContext,
+        state: None,
         result_type: Literal["success", "error"],
         rows_returned: int,
         batch_size: int = 1,
     ) -> None:
-        if result_type != "success":
+        if result_type != "error":
             return
 
-        self.attributes.update(_get_result_attributes(rows_returned, batch_size))
+        self.counter.add(
+            1,
+            _get_metric_attributes(
+                context,
+                result_type,
+                rows_returned,
+                batch_size,
+                self.full_attributes,
+            ),
+        )
+
+    @override
+    def on_exception(
+        self,
+        context: HookContext,
+        state: None,
+        exception: BaseException,
+    ) -> None:
+        self.counter.add(
+            1,
+            _get_exception_attributes(context, exception, self.full_attributes),
+        )
 
-        self.counter.add(1, self.attributes)
 
+class RequestsRetryHook(BaseHook[None]):
+    """Number of retried transactions and queries"""
 
-class RequestsFailureHook(BaseHook):
     def __init__(self) -> None:
         from opentelemetry.metrics import get_meter_provider
 
         self.meter = get_meter_provider().get_meter("pnorm")
         self.counter = self.meter.create_counter(
-            name="database_requests_failure",
-            description="Total number of failed database requests",
+            name="database_requests_retries",
+            description="Total number of retried database transactions and requests",
         )
-        self.attributes: dict[str, Any] = {}
 
     @override
-    def pre_query(
+    def on_retry(
         self,
-        query: str,
-        query_params: Optional[dict[str, Any] | Sequence[dict[str, Any]]] = None,
-        query_context: Optional[QueryContext] = None,
+        context: Optional[HookContext],
+        operation: RetryOperation,
+        attempt: int,
+        exception: BaseException,
+        delay: float,
     ) -> None:
-        self.attributes = _get_attributes(query, query_params, query_context)
+        self.counter.add(1, _get_retry_attributes(context, operation, exception))
+
+
+class RequestsHedgeHook(BaseHook[None]):
+    """Number of hedged reads, and whether the hedge answered first"""
+
+    def __init__(self) -> None:
+        from opentelemetry.metrics import get_meter_provider
+
+        self.meter = get_meter_provider().get_meter("pnorm")
+        self.counter = self.meter.create_counter(
+            name="database_requests_hedges",
+            description="Total number of reads sent to a second replica",
+        )
 
     @override
-    def post_query(
+    def on_hedge(self, context: HookContext, delay: float, won: bool) -> None:
+        self.counter.add(1, _get_hedge_attributes(context, won))
+
+
+class RequestsGatherHook(BaseHook[None]):
+    """Duration and rows of queries run on several databases, per database"""
+
+    def __init__(self) -> None:
+        from opentelemetry.metrics import get_meter_provider
+
+        self.meter = get_meter_provider().get_meter("pnorm")
+        self.duration = self.meter.create_histogram(
+            name="database_requests_gather_duration",
+            description="Duration of gathered database requests on each target",
+            unit="s",
+        )
+        self.rows = self.meter.create_counter(
+            name="database_requests_gather_rows",
+            description="Total number of rows returned by each target of gathered database requests",
+        )
+
+    @override
+    def on_gather_target(
         self,
-        result_type: Literal["success", "error"],
+        context: HookContext,
+        target: str,
+        duration: float,
         rows_returned: int,
-        batch_size: int = 1,
     ) -> None:
-        if result_type != "failure":
-            return
+        attributes = _get_gather_attributes(context, target)
+        self.duration.record(duration, attributes)
+        self.rows.add(rows_returned, attributes)
 
-        self.attributes.update(_get_result_attributes(rows_returned, batch_size))
 
-        self.counter.add(1, self.attributes)
+class RequestsBatchHook(BaseHook[None]):
+    """Rows of operations sent to the database in several batches"""
+
+    def __init__(self) -> None:
+        from opentelemetry.metrics import get_meter_provider
+
+        self.meter = get_meter_provider().get_meter("pnorm")
+        self.counter = self.meter.create_counter(
+            name="database_requests_batch_rows",
+            description="Total number of rows in each batch of batched database requests",
+        )
 
     @override
-    def on_exception(self, exception: Exception):
-        # TODO:
-        ...
+    def on_batch(
+        self,
+        context: HookContext,
+        operation: BatchOperation,
+        batch: int,
+        rows: int,
+    ) -> None:
+        self.counter.add(rows, _get_batch_attributes(context, operation))
 
 
-class SpanHook(BaseHook):
+class SpanHook(BaseHook[Optional["Span"]]):
     def __init__(self) -> None:
         from opentelemetry import trace
 
-        self.span: Span | None = None
         self.tracer = trace.get_tracer("pnorm.async_client")
 
     @override
-    def pre_query(
-        self,
-        query: str,
-        query_params: Optional[dict[str, Any] | Sequence[dict[str, Any]]] = None,
-        query_context: Optional[QueryContext] = None,
-    ) -> None:
-        self.span = self.tracer.start_span(query)
-        attributes = _get_attributes(query, query_params, query_context)
-        self._set_span_attributes(attributes)
+    def pre_query(self, context: HookContext) -> Optional["Span"]:
+        if not context.sampled:
+            return None
+
+        span = self.tracer.start_span(context.query)
+        _set_span_attributes(span, context.attributes)
+        return span
 
     @override
     def post_query(
         self,
+        context: HookContext,
+        state: Optional["Span"],
         result_type: Literal["success", "error"],
         rows_returned: int,
         batch_size: int = 1,
     ) -> None:
-        assert self.span is not None, "span should not be None"
+        if state is None:
+            return
 
-        attributes = _get_result_attributes(rows_returned, batch_size)
-        self._set_span_attributes(attributes)
-        self.span.end()
+        attributes = get_result_attributes(rows_returned, batch_size)
+        _set_span_attributes(state, attributes)
+        state.end()
 
     @override
-    def on_exception(self, exception: Exception):
-        assert self.span is not None, "span should not be None"
+    def on_exception(
+        self,
+        context: HookContext,
+        state: Optional["Span"],
+        exception: BaseException,
+    ) -> None:
+        if state is None:
+            return
 
-        self.span.set_attribute("error.type", "timeout")
+        state.set_attribute("error.type", type(exception).__qualname__)
         # except psycopg.OperationalError as e:
         #     # https://www.psycopg.org/docs/errors.html
         #     span.record_exception(e)
         #     span.set_attribute("db.response.status_code", str(e.pgcode))
-        self.span.record_exception(exception)
-        self.span.end()
+        state.record_exception(exception)
+        state.end()
+
+
+@dataclass
+class OpenTelemetryState:
+    span: Optional["Span"]  # None when the query was not sampled
+    start_time: float
+
+
+class OpenTelemetryHook(BaseHook[OpenTelemetryState]):
+    """Span, request counters and duration histogram in a single hook
+
+    Equivalent to using SpanHook, RequestsCounterHook, RequestsSuccessHook,
+    RequestsFailureHook, RequestsTimingHook, RequestsPhaseTimingHook,
+    RequestsRetryHook, RequestsHedgeHook, RequestsGatherHook and
+    RequestsBatchHook together, but the attributes for the span and every
+    metric are only merged once per query.
+    """
+
+    def __init__(self, full_attributes: bool = False) -> None:
+        """
+        Parameters
+        ----------
+        full_attributes : bool = False
+            Record the query text, parameters and row counts as metric
+            attributes, not only on the span. Each distinct value creates a
+            new time series
+        """
+        from opentelemetry import trace
+        from opentelemetry.metrics import get_meter_provider
+
+        self.full_attributes = full_attributes
+        self.tracer = trace.get_tracer("pnorm.async_client")
+        self.meter = get_meter_provider().get_meter("pnorm")
+        self.duration = self.meter.create_histogram(
+            name="database_requests_duration",
+            description="Duration of database requests",
+        )
+        self.total = self.meter.create_counter(
+            name="database_requests_total",
+            description="Total number of database requests",
+        )
+        self.success = self.meter.create_counter(
+            name="database_requests_success",
+            description="Total number of successful database requests",
+        )
+        self.failure = self.meter.create_counter(
+            name="database_requests_failure",
+            description="Total number of failed database requests",
+        )
+        self.phase_duration = self.meter.create_histogram(
+            name="database_requests_phase_duration",
+            description="Duration of each phase of database requests",
+            unit="s",
+        )
+        self.retries = self.meter.create_counter(
+            name="database_requests_retries",
+            description="Total number of retried database transactions and requests",
+        )
+        self.hedges = self.meter.create_counter(
+            name="database_requests_hedges",
+            description="Total number of reads sent to a second replica",
+        )
+        self.gather_duration = self.meter.create_histogram(
+            name="database_requests_gather_duration",
+            description="Duration of gathered database requests on each target",
+            unit="s",
+        )
+        self.gather_rows = self.meter.create_counter(
+            name="database_requests_gather_rows",
+            description="Total number of rows returned by each target of gathered database requests",
+        )
+        self.batch_rows = self.meter.create_counter(
+            name="database_requests_batch_rows",
+            description="Total number of rows in each batch of batched database requests",
+        )
+
+    @override
+    def pre_query(self, context: HookContext) -> OpenTelemetryState:
+        span = None
+
+        if context.sampled:
+            span = self.tracer.start_span(
+                context.query,
+                attributes=context.attributes,
+            )
+
+        return OpenTelemetryState(span=span, start_time=time.perf_counter())
+
+    @override
+    def post_query(
+        self,
+        context: HookContext,
+        state: OpenTelemetryState,
+        result_type: Literal["success", "error"],
+        rows_returned: int,
+        batch_size: int = 1,
+    ) -> None:
+        result_attributes = get_result_attributes(rows_returned, batch_size)
+
+        if state.span is not None:
+            state.span.set_attributes(result_attributes)
+            state.span.end()
+
+        attributes = _get_metric_attributes(
+            context,
+            result_type,
+            rows_returned,
+            batch_size,
+            self.full_attributes,
+        )
+        self.total.add(1, attributes)
+
+        if result_type == "success":
+            self.success.add(1, attributes)
+        else:
+            self.failure.add(1, attributes)
+
+        self.duration.record(time.perf_counter() - state.start_time, attributes)
+
+    @override
+    def on_phase(
+        self,
+        context: HookContext,
+        state: OpenTelemetryState,
+        phase: QueryPhase,
+        timestamp: float,
+    ) -> None:
+        self.phase_duration.record(
+            context.phase_duration(phase),
+            {**context.metric_attributes, "db.query.phase": phase},
+        )
+
+    @override
+    def on_exception(
+        self,
+        context: HookContext,
+        state: OpenTelemetryState,
+        exception: BaseException,
+    ) -> None:
+        if state.span is not None:
+            state.span.set_attribute("error.type", type(exception).__qualname__)
+            state.span.record_exception(exception)
+            state.span.end()
+
+        attributes = _get_exception_attributes(
+            context,
+            exception,
+            self.full_attributes,
+        )
+        self.total.add(1, attributes)
+        self.failure.add(1, attributes)
+        self.duration.record(time.perf_counter() - state.start_time, attributes)
+
+    @override
+    def on_retry(
+        self,
+        context: Optional[HookContext],
+        operation: RetryOperation,
+        attempt: int,
+        exception: BaseException,
+        delay: float,
+    ) -> None:
+        self.retries.add(1, _get_retry_attributes(context, operation, exception))
+
+    @override
+    def on_hedge(self, context: HookContext, delay: float, won: bool) -> None:
+        self.hedges.add(1, _get_hedge_attributes(context, won))
+
+    @override
+    def on_gather_target(
+        self,
+        context: HookContext,
+        target: str,
+        duration: float,
+        rows_returned: int,
+    ) -> None:
+        attributes = _get_gather_attributes(context, target)
+        self.gather_duration.record(duration, attributes)
+        self.gather_rows.add(rows_returned, attributes)
+
+    @override
+    def on_batch(
+        self,
+        context: HookContext,
+        operation: BatchOperation,
+        batch: int,
+        rows: int,
+    ) -> None:
+        self.batch_rows.add(rows, _get_batch_attributes(context, operation))
+
+
+def _get_batch_attributes(
+    context: HookContext,
+    operation: BatchOperation,
+) -> dict[str, Any]:
+    return {**context.metric_attributes, "db.operation.batch.kind": operation}
+
+
+def _get_gather_attributes(context: HookContext, target: str) -> dict[str, Any]:
+    return {**context.metric_attributes, "db.query.target": target}
+
+
+def _get_hedge_attributes(context: HookContext, won: bool) -> dict[str, Any]:
+    return {**context.metric_attributes, "db.query.hedge.won": won}
+
+
+def _get_retry_attributes(
+    context: Optional[HookContext],
+    operation: RetryOperation,
+    exception: BaseException,
+) -> dict[str, Any]:
+    return {
+        **(context.metric_attributes if context is not None else {}),
+        "db.operation.retry.kind": operation,
+        "error.type": type(exception).__qualname__,
+    }
+
+
+def _get_exception_attributes(
+    context: HookContext,
+    exception: BaseException,
+    full_attributes: bool,
+) -> dict[str, Any]:
+    return {
+        **(context.attributes if full_attributes else context.metric_attributes),
+        "db.response.result_type": "error",
+        "error.type": type(exception).__qualname__,
+    }
+
+
+def _get_metric_attributes(
+    context: HookContext,
+    result_type: Literal["success", "error"],
+    rows_returned: int,
+    batch_size: int,
+    full_attributes: bool,
+) -> dict[str, Any]:
+    if full_attributes:
+        return {
+            **context.attributes,
+            **get_result_attributes(rows_returned, batch_size),
+            "db.response.result_type": result_type,
+        }
+
+    return {**context.metric_attributes, "db.response.result_type": result_type}
 
-    def _set_span_attributes(self, attributes: dict[str, Any]) -> None:
-        assert self.span is not None, "span should not be None"
 
-        for key, value in attributes.items():
-            self.span.set_attribute(key, value)
+def _set_span_attributes(span: "Span", attributes: dict[str, Any]) -> None:
+    for key, value in attributes.items():
+        span.set_attribute(key, value)
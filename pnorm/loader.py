@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Hashable, Iterable, MutableMapping
+from typing import TYPE_CHECKING, Any, Generic, Optional
+
+from .exceptions import MultipleRecordsReturnedException, NoRecordsReturnedException
+from .hooks.base import BaseHook
+from .mapping_utilities import combine_into_return
+from .pnorm_types import BaseModelMappingT, Query, QueryContext
+
+if TYPE_CHECKING:
+    from .async_client import AsyncPostgresClient
+
+
+class Loader(Generic[BaseModelMappingT]):
+    """Batches concurrent loads of single records into one query
+
+    Keys loaded while the event loop runs the current callbacks are queried
+    together once they are done, so resolvers awaiting `load` at the same
+    time share a single query. Create with AsyncPostgresClient.loader
+    """
+
+    def __init__(
+        self,
+        client: AsyncPostgresClient,
+        return_model: type[BaseModelMappingT],
+        query: Query,
+        key_column: str,
+        param_name: str,
+        max_batch_size: int,
+        timeout: Optional[float],
+        query_context: Optional[QueryContext],
+        hooks: Optional[list[BaseHook]],
+    ) -> None:
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+
+        self.client = client
+        self.return_model: type[BaseModelMappingT] = return_model
+        self.query = query
+        self.key_column = key_column
+        self.param_name = param_name
+        self.max_batch_size = max_batch_size
+        self.timeout = timeout
+        self.query_context = query_context
+        self.hooks = hooks
+        # Keys waiting for the next batch, with the rows found for them
+        self._pending: dict[Hashable, asyncio.Future[list[dict[str, Any]]]] = {}
+        self._batches: set[asyncio.Task[None]] = set()
+        # The client runs one query at a time, batches wait for each other
+        self._client_lock = asyncio.Lock()
+
+    async def load(
+        self,
+        key: Hashable,
+        default: Optional[BaseModelMappingT] = None,
+    ) -> BaseModelMappingT:
+        """Always returns exactly one record for `key` or raises an exception
+
+        Parameters
+        ----------
+        key : Hashable
+            Value of the key column to load. Must compare equal to the value
+            returned by the database, e.g. an int for an integer column
+        default : Optional[T of BaseModel] = None
+            The default value to return if there is no record for the key
+
+        Raises
+        ------
+        NoRecordsReturnedException
+            When there is no record for the key and no default was given
+        MultipleRecordsReturnedException
+            When there are at least two records for the key
+        """
+        rows = await asyncio.shield(self._schedule(key))
+
+        if len(rows) >= 2:
+            msg = f"Received two or more records for {self.key_column} {key!r}"
+            raise MultipleRecordsReturnedException(msg)
+
+        if len(rows) == 0:
+            if default is None:
+                msg = f"Did not receive any records for {self.key_column} {key!r}"
+                raise NoRecordsReturnedException(msg)
+
+            return combine_into_return(self.return_model, default)
+
+        return combine_into_return(self.return_model, rows[0])
+
+    async def load_many(
+        self,
+        keys: Iterable[Hashable],
+    ) -> list[BaseModelMappingT]:
+        """Records for each of `keys`, in the same order. See `load`"""
+        return list(await asyncio.gather(*[self.load(key) for key in keys]))
+
+    def _schedule(self, key: Hashable) -> asyncio.Future[list[dict[str, Any]]]:
+        future = self._pending.get(key)
+
+        if future is not None:
+            return future
+
+        loop = asyncio.get_running_loop()
+
+        if len(self._pending) == 0:
+            loop.call_soon(self._dispatch)
+
+        future = loop.create_future()
+        self._pending[key] = future
+        return future
+
+    def _dispatch(self) -> None:
+        pending = self._pending
+        self._pending = {}
+        keys = list(pending)
+
+        for start in range(0, len(keys), self.max_batch_size):
+            batch = {
+                key: pending[key] for key in keys[start : start + self.max_batch_size]
+            }
+            task = asyncio.create_task(self._run_batch(batch))
+            # Keep a reference until the batch is done
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+    async def _run_batch(
+        self,
+        batch: dict[Hashable, asyncio.Future[list[dict[str, Any]]]],
+    ) -> None:
+        try:
+            async with self._client_lock:
+                rows = await self.client.select(
+                    dict,
+                    self.query,
+                    {self.param_name: list(batch)},
+                    timeout=self.timeout,
+                    query_context=self.query_context,
+                    hooks=self.hooks,
+                )
+
+            rows_by_key = _group_by_key(rows, self.key_column, batch)
+        except asyncio.CancelledError:
+            for future in batch.values():
+                future.cancel()
+
+            raise
+        except Exception as e:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+
+            return
+
+        for key, future in batch.items():
+            if not future.done():
+                future.set_result(rows_by_key[key])
+
+
+def _group_by_key(
+    rows: Iterable[MutableMapping[str, Any]],
+    key_column: str,
+    keys: Iterable[Hashable],
+) -> dict[Hashable, list[dict[str, Any]]]:
+    rows_by_key: dict[Hashable, list[dict[str, Any]]] = {key: [] for key in keys}
+
+    for row in rows:
+        if key_column not in row:
+            msg = f"The loader's query must return the key column {key_column}"
+            raise KeyError(msg)
+
+        key_rows = rows_by_key.get(row[key_column])
+
+        # Rows for keys that weren't asked for are ignored
+        if key_rows is not None:
+            key_rows.append(dict(row))
+
+    return rows_by_key
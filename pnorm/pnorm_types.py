@@ -2,7 +2,16 @@ from __future__ import annotations
 
 import json
 from dataclasses import dataclass
-from typing import Annotated, Any, Mapping, MutableMapping, Optional, TypeVar
+from typing import (
+    Annotated,
+    Any,
+    Generic,
+    Literal,
+    Mapping,
+    MutableMapping,
+    Optional,
+    TypeVar,
+)
 
 from psycopg.abc import Query as PsycopgQuery
 from pydantic import BaseModel, PlainSerializer
@@ -14,6 +23,16 @@ ParamType = QueryParams | BaseModel
 
 MappingT = TypeVar("MappingT", bound=MutableMapping[str, Any])
 BaseModelMappingT = TypeVar("BaseModelMappingT", BaseModel, MutableMapping[str, Any])
+PayloadT = TypeVar("PayloadT")
+
+IsolationLevel = Literal[
+    "read uncommitted",
+    "read committed",
+    "repeatable read",
+    "serializable",
+]
+SynchronousCommit = Literal["on", "off", "local", "remote_write", "remote_apply"]
+ReplicaSelection = Literal["round_robin", "least_loaded"]
 
 
 U = TypeVar("U", dict[Any, Any] | None, list[Any] | None)
@@ -33,4 +52,41 @@ class QueryContext:
     )
 
 
+@dataclass(frozen=True)
+class Notification(Generic[PayloadT]):
+    channel: str
+    payload: PayloadT
+    pid: int  # Process id of the backend that sent the notification
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """How reads outside of a transaction are retried after a connection error
+
+    get, find and select are reconnected and run again when the connection is
+    lost (failover, network errors, the server restarting). Queries that fail
+    because of the SQL itself, timeouts and writes are never retried.
+    """
+
+    retries: int = 2  # Maximum number of retries after the first attempt
+    backoff: float = 0.05  # Seconds before the first retry, doubled each retry
+    max_backoff: float = 1.0  # Maximum seconds to wait between retries
+
+
+@dataclass(frozen=True)
+class HedgePolicy:
+    """When a read on a replica is also sent to a second replica
+
+    If the first replica hasn't answered after the hedge delay the same read
+    is sent to another replica, the first result is used and the other query
+    is cancelled. Without a fixed `delay` it is the `percentile` of recent
+    read durations, so only the slowest reads are hedged.
+    """
+
+    delay: Optional[float] = None  # Fixed seconds to wait before hedging
+    percentile: float = 0.95  # Percentile of read durations used as the delay
+    min_samples: int = 20  # Reads to measure before using the percentile
+    max_delay: float = 1.0  # Delay until measured, and the largest delay used
+
+
 Query = PsycopgQuery
@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Generator, Optional
+
+from psycopg import AsyncConnection
+from psycopg.rows import DictRow
+
+from .credentials import PostgresCredentials
+from .pnorm_types import HedgePolicy, ReplicaSelection
+
+# LSN of the last write committed on the primary in the current context
+_last_write_lsn: ContextVar[Optional[str]] = ContextVar(
+    "pnorm_last_write_lsn",
+    default=None,
+)
+
+# Weight of the newest query duration in a replica's average latency
+_LATENCY_SMOOTHING = 0.2
+
+# Number of recent read durations kept to derive the hedge delay
+_LATENCY_WINDOW = 1000
+
+# Seconds between checks of whether a replica replayed a write
+_MIN_LSN_POLL_INTERVAL = 0.005
+_MAX_LSN_POLL_INTERVAL = 0.1
+
+
+@dataclass
+class Replica:
+    credentials: PostgresCredentials
+    in_flight: int = 0  # Queries currently running on the replica
+    latency: float = 0.0  # Moving average of query durations in seconds
+
+
+class ReplicaSet:
+    """Read replicas that queries are spread across"""
+
+    def __init__(
+        self,
+        replicas: list[PostgresCredentials],
+        selection: ReplicaSelection,
+    ) -> None:
+        if len(replicas) == 0:
+            raise ValueError("At least one replica is required")
+
+        if selection not in ("round_robin", "least_loaded"):
+            raise ValueError(f"Invalid replica selection: {selection}")
+
+        self.replicas = [Replica(credentials) for credentials in replicas]
+        self.selection = selection
+        self.latencies: deque[float] = deque(maxlen=_LATENCY_WINDOW)
+        self._next = 0
+
+    def choose(self, exclude: Optional[Replica] = None) -> Replica:
+        """Replica to run the next read on, other than `exclude` if possible"""
+        candidates = [replica for replica in self.replicas if replica is not exclude]
+
+        if len(candidates) == 0:
+            candidates = self.replicas
+
+        if self.selection == "least_loaded":
+            return min(
+                candidates,
+                key=lambda replica: (replica.in_flight, replica.latency),
+            )
+
+        while True:
+            replica = self.replicas[self._next % len(self.replicas)]
+            self._next += 1
+
+            if replica in candidates:
+                return replica
+
+    def hedge_delay(self, policy: HedgePolicy) -> float:
+        """Seconds to wait for a read before hedging it"""
+        if policy.delay is not None:
+            return policy.delay
+
+        if len(self.latencies) < policy.min_samples:
+            return policy.max_delay
+
+        latencies = sorted(self.latencies)
+        rank = math.ceil(policy.percentile * len(latencies))
+        rank = min(max(rank, 1), len(latencies))
+        return min(latencies[rank - 1], policy.max_delay)
+
+    @contextmanager
+    def track(self, replica: Replica) -> Generator[None, None, None]:
+        """Count a query as running on the replica and record its duration"""
+        replica.in_flight += 1
+        start = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+            replica.in_flight -= 1
+            replica.latency += _LATENCY_SMOOTHING * (duration - replica.latency)
+            self.latencies.append(duration)
+
+
+def record_write(lsn: str) -> None:
+    _last_write_lsn.set(lsn)
+
+
+def last_write_lsn() -> Optional[str]:
+    return _last_write_lsn.get()
+
+
+async def wait_for_lsn(
+    connection: AsyncConnection[DictRow],
+    lsn: str,
+    timeout: float,
+) -> bool:
+    """Wait for the replica to replay the primary's WAL up to `lsn`
+
+    Returns whether it did within `timeout` seconds. A server that isn't a
+    standby has no replay position and is considered up to date.
+    """
+    give_up_at = time.monotonic() + timeout
+    interval = _MIN_LSN_POLL_INTERVAL
+
+    while True:
+        # Read only, leave the connection outside of a transaction
+        async with connection.transaction():
+            cursor = await connection.execute(
+                """
+                select coalesce(
+                    pg_last_wal_replay_lsn() >= %(lsn)s::pg_lsn,
+                    true
+                ) as caught_up
+                """,
+                {"lsn": lsn},
+            )
+            row = await cursor.fetchone()
+
+        if row is not None and row["caught_up"]:
+            return True
+
+        if time.monotonic() + interval > give_up_at:
+            return False
+
+        await asyncio.sleep(interval)
+        interval = min(interval * 2, _MAX_LSN_POLL_INTERVAL)
@@ -0,0 +1,600 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+from collections.abc import Sequence
+from contextlib import asynccontextmanager
+from functools import partial
+from typing import (
+    Any,
+    AsyncGenerator,
+    Awaitable,
+    Callable,
+    Optional,
+    overload,
+)
+
+from psycopg.pq import TransactionStatus
+
+from ._util import (
+    describe_target,
+    gather_targets,
+    get_credentials,
+    merge_hooks,
+    merge_results,
+    query_as_string,
+)
+from .async_client import AsyncPostgresClient, ResultT
+from .credentials import CredentialsDict, CredentialsProtocol, PostgresCredentials
+from .hooks.attributes import TelemetryOptions
+from .hooks.base import BaseHook, HookContext
+from .mapping_utilities import get_params
+from .pnorm_types import (
+    BaseModelMappingT,
+    BaseModelT,
+    IsolationLevel,
+    MappingT,
+    ParamType,
+    Query,
+    QueryContext,
+    RetryPolicy,
+    SynchronousCommit,
+)
+
+
+def hash_shard_key(shard_key: Any) -> int:
+    """Hash of a shard key that is the same in every process
+
+    Python's hash() of str and bytes changes between processes so can't be
+    used to place rows.
+    """
+    if isinstance(shard_key, bytes):
+        data = shard_key
+    else:
+        data = str(shard_key).encode("utf-8")
+
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "big")
+
+
+class ShardedPostgresClient:
+    def __init__(
+        self,
+        shards: Sequence[CredentialsProtocol | CredentialsDict | PostgresCredentials],
+        hash_function: Callable[[Any], int] = hash_shard_key,
+        pool_size: int = 5,
+        hooks: Optional[list[BaseHook]] = None,
+        telemetry_options: Optional[TelemetryOptions] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+    ) -> None:
+        """Async Postgres Client that spreads data across several databases
+
+        Every call takes a `shard_key`, such as a tenant id, and runs on the
+        shard at `hash_function(shard_key) % len(shards)`. Connections to each
+        shard are kept open and reused between calls.
+
+        Parameters
+        ----------
+        shards : Sequence[CredentialsProtocol | CredentialsDict | PostgresCredentials]
+            Credentials of each shard. The order decides where keys are
+            placed, so it must not change once data is written
+        hash_function : Callable[[Any], int] = hash_shard_key
+            Maps a shard key to an integer
+        pool_size : int = 5
+            Maximum number of connections open to each shard. Calls wait for
+            a connection when they are all in use
+        hooks: Optional[list[BaseHook]] = None
+            List of hooks to run before and after the query. See pnorm.hooks.opentelemetry for examples
+        telemetry_options: Optional[TelemetryOptions] = None
+            Limits and sampling for the parameters recorded by hooks
+        retry_policy: Optional[RetryPolicy] = None
+            Retry reads outside of transactions after a connection error.
+            Defaults to no retries
+        """
+        if len(shards) == 0:
+            raise ValueError("At least one shard is required")
+
+        if pool_size < 1:
+            raise ValueError("pool_size must be at least 1")
+
+        self.hash_function = hash_function
+        self.default_hooks = hooks
+        self.telemetry_options = telemetry_options or TelemetryOptions()
+        self.shards = [
+            _ShardPool(
+                get_credentials(credentials),
+                pool_size,
+                hooks,
+                telemetry_options,
+                retry_policy,
+            )
+            for credentials in shards
+        ]
+
+    def shard_for(self, shard_key: Any) -> int:
+        """Index of the shard that `shard_key` is placed on"""
+        return self.hash_function(shard_key) % len(self.shards)
+
+    @overload
+    async def get(
+        self,
+        return_model: type[MappingT],
+        query: Query,
+        params: Optional[ParamType] = None,
+        default: Optional[MappingT] = None,
+        combine_into_return_model: bool = False,
+        *,
+        shard_key: Any,
+        timeout: Optional[float] = None,
+        query_context: Optional[QueryContext] = None,
+        hooks: Optional[list[BaseHook]] = None,
+    ) -> MappingT: ...
+
+    @overload
+    async def get(
+        self,
+        return_model: type[BaseModelT],
+        query: Query,
+        params: Optional[ParamType] = None,
+        default: Optional[BaseModelT] = None,
+        combine_into_return_model: bool = False,
+        *,
+        shard_key: Any,
+        timeout: Optional[float] = None,
+        query_context: Optional[QueryContext] = None,
+        hooks: Optional[list[BaseHook]] = None,
+    ) -> BaseModelT: ...
+
+    async def get(
+        self,
+        return_model: type[BaseModelMappingT],
+        query: Query,
+        params: Optional[ParamType] = None,
+        default: Optional[BaseModelMappingT] = None,
+        combine_into_return_model: bool = False,
+        *,
+        shard_key: Any,
+        timeout: Optional[float] = None,
+        query_context: Optional[QueryContext] = None,
+        hooks: Optional[list[BaseHook]] = None,
+    ) -> BaseModelMappingT:
+        """Always returns exactly one record from the shard of `shard_key` or
+        raises an exception
+
+        See AsyncPostgresClient.get
+        """
+        async with self._acquire(shard_key) as client:
+            return await client.get(
+                return_model,
+                query,
+                params,
+                default,
+                combine_into_return_model,
+                timeout=timeout,
+                query_context=query_context,
+                hooks=hooks,
+            )
+
+    @overload
+    async def find(
+        self,
+        return_model: type[MappingT],
+        query: Query,
+        params: Optional[ParamType] = None,
+        *,
+        shard_key: Any,
+        default: MappingT,
+        combine_into_return_model: bool = False,
+        timeout: Optional[float] = None,
+        query_context: Optional[QueryContext] = None,
+        hooks: Optional[list[BaseHook]] = None,
+    ) -> MappingT: ...
+
+    @overload
+    async def find(
+        self,
+        return_model: type[BaseModelT],
+        query: Query,
+        params: Optional[ParamType] = None,
+        *,
+        shard_key: Any,
+        default: BaseModelT,
+        combine_into_return_model: bool = False,
+        timeout: Optional[float] = None,
+        query_context: Optional[QueryContext] = None,
+        hooks: Optional[list[BaseHook]] = None,
+    ) -> BaseModelT: ...
+
+    @overload
+    async def find(
+        self,
+        return_model: type[MappingT],
+        query: Query,
+        params: Optional[ParamType] = None,
+        *,
+        shard_key: Any,
+        default: Optional[MappingT] = None,
+        combine_into_return_model: bool = False,
+        timeout: Optional[float] = None,
+        query_context: Optional[QueryContext] = None,
+        hooks: Optional[list[BaseHook]] = None,
+    ) -> MappingT | None: ...
+
+    @overload
+    async def find(
+        self,
+        return_model: type[BaseModelT],
+        query: Query,
+        params: Optional[ParamType] = None,
+        *,
+        shard_key: Any,
+        default: Optional[BaseModelT] = None,
+        combine_into_return_model: bool = False,
+        timeout: Optional[float] = None,
+        query_context: Optional[QueryContext] = None,
+        hooks: Optional[list[BaseHook]] = None,
+    ) -> BaseModelT | None: ...
+
+    async def find(
+        self,
+        return_model: type[BaseModelT] | type[MappingT],
+        query: Query,
+        params: Optional[ParamType] = None,
+        *,
+        shard_key: Any,
+        default: Optional[BaseModelT | MappingT] = None,
+        combine_into_return_model: bool = False,
+        timeout: Optional[float] = None,
+        query_context: Optional[QueryContext] = None,
+        hooks: Optional[list[BaseHook]] = None,
+    ) -> BaseModelT | MappingT | None:
+        """Return the first result from the shard of `shard_key` if it exists
+
+        See AsyncPostgresClient.find
+        """
+        async with self._acquire(shard_key) as client:
+            return await client.find(
+                return_model,  # type: ignore
+                query,
+                params,
+                default=default,  # type: ignore
+                combine_into_return_model=combine_into_return_model,
+                timeout=timeout,
+                query_context=query_context,
+                hooks=hooks,
+            )
+
+    @overload
+    async def select(
+        self,
+        return_model: type[BaseModelT],
+        query: Query,
+        params: Optional[ParamType] = None,
+        *,
+        shard_key: Any,
+        timeout: Optional[float] = None,
+        query_context: Optional[QueryContext] = None,
+        hooks: Optional[list[BaseHook]] = None,
+    ) -> tuple[BaseModelT, ...]: ...
+
+    @overload
+    async def select(
+        self,
+        return_model: type[MappingT],
+        query: Query,
+        params: Optional[ParamType] = None,
+        *,
+        shard_key: Any,
+        timeout: Optional[float] = None,
+        query_context: Optional[QueryContext] = None,
+        hooks: Optional[list[BaseHook]] = None,
+    ) -> tuple[MappingT, ...]: ...
+
+    async def select(
+        self,
+        return_model: type[BaseModelT] | type[MappingT],
+        query: Query,
+        params: Optional[ParamType] = None,
+        *,
+        shard_key: Any,
+        timeout: Optional[float] = None,
+        query_context: Optional[QueryContext] = None,
+        hooks: Optional[list[BaseHook]] = None,
+    ) -> tuple[BaseModelT, ...] | tuple[MappingT, ...]:
+        """Return all rows from the shard of `shard_key`
+
+        See AsyncPostgresClient.select
+        """
+        async with self._acquire(shard_key) as client:
+            return await client.select(
+                return_model,  # type: ignore
+                query,
+                params,
+                timeout=timeout,
+                query_context=query_context,
+                hooks=hooks,
+            )
+
+    async def execute(
+        self,
+        query: Query,
+        params: Optional[ParamType | Sequence[ParamType]] = None,
+        *,
+        shard_key: Any,
+        timeout: Optional[float] = None,
+        query_context: Optional[QueryContext] = None,
+        hooks: Optional[list[BaseHook]] = None,
+    ) -> None:
+        """Execute a SQL query on the shard of `shard_key`
+
+        See AsyncPostgresClient.execute
+        """
+        async with self._acquire(shard_key) as client:
+            await client.execute(
+                query,
+                params,
+                timeout=timeout,
+                query_context=query_context,
+                hooks=hooks,
+            )
+
+    @overload
+    async def gather_select(
+        self,
+        return_model: type[BaseModelT],
+        query: Query,
+        params: Optional[ParamType] = None,
+        *,
+        order_by: Optional[str | Sequence[str]] = None,
+        descending: bool = False,
+        max_concurrency: int = 10,
+        timeout: Optional[float] = None,
+        query_context: Optional[QueryContext] = None,
+        hooks: Optional[list[BaseHook]] = None,
+    ) -> tuple[BaseModelT, ...]: ...
+
+    @overload
+    async def gather_select(
+        self,
+        return_model: type[MappingT],
+        query: Query,
+        params: Optional[ParamType] = None,
+        *,
+        order_by: Optional[str | Sequence[str]] = None,
+        descending: bool = False,
+        max_concurrency: int = 10,
+        timeout: Optional[float] = None,
+        query_context: Optional[QueryContext] = None,
+        hooks: Optional[list[BaseHook]] = None,
+    ) -> tuple[MappingT, ...]: ...
+
+    async def gather_select(
+        self,
+        return_model: type[BaseModelT] | type[MappingT],
+        query: Query,
+        params: Optional[ParamType] = None,
+        *,
+        order_by: Optional[str | Sequence[str]] = None,
+        descending: bool = False,
+        max_concurrency: int = 10,
+        timeout: Optional[float] = None,
+        query_context: Optional[QueryContext] = None,
+        hooks: Optional[list[BaseHook]] = None,
+    ) -> tuple[BaseModelT, ...] | tuple[MappingT, ...]:
+        """Run the same query on every shard at once and return all of their
+        rows
+
+        See AsyncPostgresClient.gather_select
+        """
+        hook_context = HookContext(
+            query_as_string(query),
+            get_params("Query Params", params),
+            query_context,
+            self.telemetry_options,
+        )
+
+        async def select_on_shard(
+            index: int,
+        ) -> tuple[BaseModelT, ...] | tuple[MappingT, ...]:
+            async with self._acquire_shard(index) as client:
+                return await client.select(
+                    return_model,  # type: ignore
+                    query,
+                    params,
+                    timeout=timeout,
+                    query_context=query_context,
+                    hooks=hooks,
+                )
+
+        results = await gather_targets(
+            [
+                (describe_target(shard.credentials), partial(select_on_shard, index))
+                for index, shard in enumerate(self.shards)
+            ],
+            max_concurrency,
+            merge_hooks(self.default_hooks, hooks),
+            hook_context,
+        )
+
+        return merge_results(results, order_by, descending)
+
+    @asynccontextmanager
+    async def start_session(
+        self,
+        *,
+        shard_key: Any,
+        schema: Optional[str] = None,
+        deadline: Optional[float] = None,
+    ) -> AsyncGenerator[AsyncPostgresClient, None]:
+        """Start a session on the shard of `shard_key`
+
+        The session holds one of the shard's connections until it ends. See
+        AsyncPostgresClient.start_session
+
+        Examples
+        --------
+        async with db.start_session(shard_key=tenant_id) as session:
+            await session.get(...)
+        """
+        async with self._acquire(shard_key, schema, deadline) as session:
+            yield session
+
+    @asynccontextmanager
+    async def start_transaction(
+        self,
+        *,
+        shard_key: Any,
+        isolation: Optional[IsolationLevel] = None,
+        read_only: bool = False,
+        deferrable: bool = False,
+        synchronous_commit: Optional[SynchronousCommit] = None,
+    ) -> AsyncGenerator[AsyncPostgresClient, None]:
+        """Start a transaction on the shard of `shard_key`
+
+        Transactions can't span shards. See
+        AsyncPostgresClient.start_transaction
+
+        Examples
+        --------
+        async with db.start_transaction(shard_key=tenant_id) as tx:
+            await tx.execute(...)
+        """
+        async with self._acquire(shard_key) as session:
+            async with session.start_transaction(
+                isolation=isolation,
+                read_only=read_only,
+                deferrable=deferrable,
+                synchronous_commit=synchronous_commit,
+            ) as tx:
+                yield tx
+
+    async def run_transaction(
+        self,
+        fn: Callable[[AsyncPostgresClient], Awaitable[ResultT]],
+        *,
+        shard_key: Any,
+        retries: int = 3,
+        backoff: float = 0.05,
+        max_backoff: float = 2.0,
+        isolation: Optional[IsolationLevel] = None,
+        read_only: bool = False,
+        deferrable: bool = False,
+        synchronous_commit: Optional[SynchronousCommit] = None,
+        hooks: Optional[list[BaseHook]] = None,
+    ) -> ResultT:
+        """Run `fn` in a transaction on the shard of `shard_key`, retrying it
+        on serialization failures and deadlocks
+
+        See AsyncPostgresClient.run_transaction
+        """
+        async with self._acquire(shard_key) as session:
+            return await session.run_transaction(
+                fn,
+                retries=retries,
+                backoff=backoff,
+                max_backoff=max_backoff,
+                isolation=isolation,
+                read_only=read_only,
+                deferrable=deferrable,
+                synchronous_commit=synchronous_commit,
+                hooks=hooks,
+            )
+
+    async def close(self) -> None:
+        """Close the idle connections to every shard"""
+        for shard in self.shards:
+            await shard.close()
+
+    @asynccontextmanager
+    async def _acquire(
+        self,
+        shard_key: Any,
+        schema: Optional[str] = None,
+        deadline: Optional[float] = None,
+    ) -> AsyncGenerator[AsyncPostgresClient, None]:
+        async with self._acquire_shard(
+            self.shard_for(shard_key),
+            schema,
+            deadline,
+        ) as session:
+            yield session
+
+    @asynccontextmanager
+    async def _acquire_shard(
+        self,
+        index: int,
+        schema: Optional[str] = None,
+        deadline: Optional[float] = None,
+    ) -> AsyncGenerator[AsyncPostgresClient, None]:
+        async with self.shards[index].acquire() as client:
+            async with client.start_session(
+                schema=schema,
+                deadline=deadline,
+            ) as session:
+                yield session
+
+
+class _ShardPool:
+    """Connections to one shard, each held by its own client"""
+
+    def __init__(
+        self,
+        credentials: PostgresCredentials,
+        size: int,
+        hooks: Optional[list[BaseHook]],
+        telemetry_options: Optional[TelemetryOptions],
+        retry_policy: Optional[RetryPolicy],
+    ) -> None:
+        self.credentials = credentials
+        self.hooks = hooks
+        self.telemetry_options = telemetry_options
+        self.retry_policy = retry_policy
+        self.idle: list[AsyncPostgresClient] = []
+        self._slots = asyncio.Semaphore(size)
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncGenerator[AsyncPostgresClient, None]:
+        async with self._slots:
+            client = await self._take()
+
+            try:
+                yield client
+            finally:
+                if _is_reusable(client):
+                    self.idle.append(client)
+                elif client.connection is not None:
+                    await client._end_connection()
+
+    async def close(self) -> None:
+        while len(self.idle) > 0:
+            await self.idle.pop()._end_connection()
+
+    async def _take(self) -> AsyncPostgresClient:
+        while len(self.idle) > 0:
+            client = self.idle.pop()
+
+            if client.connection is not None and not client.connection.closed:
+                return client
+
+            if client.connection is not None:
+                await client._end_connection()
+
+        client = AsyncPostgresClient(
+            self.credentials,
+            auto_create_connection=False,
+            hooks=self.hooks,
+            telemetry_options=self.telemetry_options,
+            retry_policy=self.retry_policy,
+        )
+        await client._create_connection()
+        return client
+
+
+def _is_reusable(client: AsyncPostgresClient) -> bool:
+    # A schema set by a session would leak into the next user of the
+    # connection
+    return (
+        client.connection is not None
+        and not client.connection.closed
+        and client.connection.info.transaction_status == TransactionStatus.IDLE
+        and client.user_set_schema is None
+    )
@@ -1,24 +1,38 @@
 from __future__ import annotations
 
 import asyncio
-from collections.abc import Sequence
-from contextlib import contextmanager
-from typing import Generator, Optional, cast, overload
+import time
+from collections.abc import Iterable, Sequence
+from contextlib import contextmanager, nullcontext
+from typing import Callable, Generator, Optional, cast, overload
 
 from psycopg import AsyncConnection
 from psycopg.rows import DictRow
 
-from .async_client import AsyncPostgresClient
+from . import deadlines
+from ._util import (
+    RETRYABLE_TRANSACTION_ERRORS,
+    apply_retry_hooks,
+    get_retry_delay,
+    get_transaction_options_statement,
+)
+from .async_client import AsyncPostgresClient, ResultT
 from .async_cursor import SingleCommitCursor, TransactionCursor
 from .credentials import CredentialsDict, CredentialsProtocol, PostgresCredentials
+from .hooks.attributes import TelemetryOptions
 from .hooks.base import BaseHook
 from .pnorm_types import (
     BaseModelMappingT,
     BaseModelT,
+    HedgePolicy,
+    IsolationLevel,
     MappingT,
     ParamType,
     Query,
     QueryContext,
+    ReplicaSelection,
+    RetryPolicy,
+    SynchronousCommit,
 )
 
 
@@ -29,6 +43,13 @@ class PostgresClient:
         credentials: CredentialsProtocol | CredentialsDict | PostgresCredentials,
         auto_create_connection: bool = True,
         hooks: Optional[list[BaseHook]] = None,
+        telemetry_options: Optional[TelemetryOptions] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        replicas: Optional[
+            Sequence[CredentialsProtocol | CredentialsDict | PostgresCredentials]
+        ] = None,
+        replica_selection: ReplicaSelection = "round_robin",
+        hedge_policy: Optional[HedgePolicy] = None,
     ) -> None:
         """Sync Postgres Client
 
@@ -40,11 +61,29 @@ class PostgresClient:
             Whether to automatically create a connection when executing a query
         hooks: Optional[list[BaseHook]] = None
             List of hooks to run before and after the query. See pnorm.hooks.opentelemetry for examples
+        telemetry_options: Optional[TelemetryOptions] = None
+            Limits and sampling for the parameters recorded by hooks
+        retry_policy: Optional[RetryPolicy] = None
+            Retry reads outside of transactions after a connection error.
+            Defaults to no retries
+        replicas: Optional[Sequence[CredentialsProtocol | CredentialsDict | PostgresCredentials]] = None
+            Read replicas of the database in `credentials`. get, find and
+            select outside of a transaction are run on a replica
+        replica_selection: ReplicaSelection = "round_robin"
+            How a replica is chosen for a read
+        hedge_policy: Optional[HedgePolicy] = None
+            Send reads that are slow to answer to a second replica as well.
+            Needs at least two replicas
         """
         self._async_client = AsyncPostgresClient(
             credentials,
             auto_create_connection,
             hooks,
+            telemetry_options,
+            retry_policy,
+            replicas,
+            replica_selection,
+            hedge_policy=hedge_policy,
         )
         self.connection: AsyncConnection[DictRow] | None = None
         self.cursor: SingleCommitCursor | TransactionCursor = SingleCommitCursor(
@@ -338,6 +377,74 @@ class PostgresClient:
 
         return cast(tuple[BaseModelT, ...] | tuple[MappingT, ...], res)
 
+    @overload
+    def gather_select(
+        self,
+        return_model: type[BaseModelT],
+        query: Query,
+        params: Optional[ParamType] = None,
+        *,
+        targets: Sequence[CredentialsProtocol | CredentialsDict | PostgresCredentials],
+        order_by: Optional[str | Sequence[str]] = None,
+        descending: bool = False,
+        max_concurrency: int = 10,
+        timeout: Optional[float] = None,
+        query_context: Optional[QueryContext] = None,
+        hooks: Optional[list[BaseHook]] = None,
+    ) -> tuple[BaseModelT, ...]: ...
+
+    @overload
+    def gather_select(
+        self,
+        return_model: type[MappingT],
+        query: Query,
+        params: Optional[ParamType] = None,
+        *,
+        targets: Sequence[CredentialsProtocol | CredentialsDict | PostgresCredentials],
+        order_by: Optional[str | Sequence[str]] = None,
+        descending: bool = False,
+        max_concurrency: int = 10,
+        timeout: Optional[float] = None,
+        query_context: Optional[QueryContext] = None,
+        hooks: Optional[list[BaseHook]] = None,
+    ) -> tuple[MappingT, ...]: ...
+
+    def gather_select(
+        self,
+        return_model: type[BaseModelT] | type[MappingT],
+        query: Query,
+        params: Optional[ParamType] = None,
+        *,
+        targets: Sequence[CredentialsProtocol | CredentialsDict | PostgresCredentials],
+        order_by: Optional[str | Sequence[str]] = None,
+        descending: bool = False,
+        max_concurrency: int = 10,
+        timeout: Optional[float] = None,
+        query_context: Optional[QueryContext] = None,
+        hooks: Optional[list[BaseHook]] = None,
+    ) -> tuple[BaseModelT, ...] | tuple[MappingT, ...]:
+        """Run the same query on several databases at once and return all of
+        their rows
+
+        See AsyncPostgresClient.gather_select
+        """
+        res = asyncio.run(
+            self._async_client.gather_select(
+                return_model,  # type: ignore
+                query,
+                params,
+                targets=targets,
+                order_by=order_by,
+                descending=descending,
+                max_concurrency=max_concurrency,
+                timeout=timeout,
+                query_context=query_context,
+                hooks=hooks,
+            )
+        )
+
+        return cast(tuple[BaseModelT, ...] | tuple[MappingT, ...], res)
+
     def execute(
         self,
         query: Query,
@@ -372,11 +479,104 @@ class PostgresClient:
             )
         )
 
+    def execute_many(
+        self,
+        query: Query,
+        params: Iterable[ParamType],
+        *,
+        chunk_size: int = 1000,
+        timeout: Optional[float] = None,
+        query_context: Optional[QueryContext] = None,
+        hooks: Optional[list[BaseHook]] = None,
+    ) -> int:
+        """Execute a SQL query once for each set of parameters, sending them
+        in chunks
+
+        Parameters
+        ----------
+        query : str
+            SQL query to execute
+        params : Iterable[Mapping[str, Any] | BaseModel]
+            Named parameters for each execution of the SQL query
+        chunk_size : int = 1000
+            Maximum number of parameter sets sent at once
+        timeout : Optional[float] = None
+            Amount of time in seconds to wait for each chunk to complete. Default to no timeout
+        query_context : Optional[QueryContext] = None
+            Query metadata for telemetry purposes
+        hooks: Optional[list[BaseHook]] = None
+            List of hooks to run before and after each chunk
+
+        Returns
+        -------
+        int
+            Number of parameter sets executed
+        """
+        return asyncio.run(
+            self._async_client.execute_many(
+                query,
+                params,
+                chunk_size=chunk_size,
+                timeout=timeout,
+                query_context=query_context,
+                hooks=hooks,
+            )
+        )
+
+    def execute_in_batches(
+        self,
+        query: Query,
+        params: Optional[ParamType] = None,
+        *,
+        batch_size: int = 1000,
+        pause: float = 0.0,
+        timeout: Optional[float] = None,
+        query_context: Optional[QueryContext] = None,
+        hooks: Optional[list[BaseHook]] = None,
+    ) -> int:
+        """Run an update or delete that affects at most `batch_size` rows
+        again and again until it no longer affects any
+
+        Parameters
+        ----------
+        query : str
+            SQL query to execute, using the %(batch_size)s parameter
+        params : Optional[Mapping[str, Any] | BaseModel] = None
+            Named parameters for the SQL query
+        batch_size : int = 1000
+            Maximum number of rows the query should affect each time
+        pause : float = 0.0
+            Seconds to wait between batches, to leave room for other queries
+        timeout : Optional[float] = None
+            Amount of time in seconds to wait for each batch to complete. Default to no timeout
+        query_context : Optional[QueryContext] = None
+            Query metadata for telemetry purposes
+        hooks: Optional[list[BaseHook]] = None
+            List of hooks to run before and after each batch
+
+        Returns
+        -------
+        int
+            Number of rows affected by all batches
+        """
+        return asyncio.run(
+            self._async_client.execute_in_batches(
+                query,
+                params,
+                batch_size=batch_size,
+                pause=pause,
+                timeout=timeout,
+                query_context=query_context,
+                hooks=hooks,
+            )
+        )
+
     @contextmanager
     def start_session(
         self,
         *,
         schema: Optional[str] = None,
+        deadline: Optional[float] = None,
     ) -> Generator[PostgresClient, None, None]:
         """Start database session
 
@@ -384,45 +584,155 @@ class PostgresClient:
         ----------
         schema : Optional[str] = None
             Schema to set for the session
+        deadline : Optional[float] = None
+            Seconds from now that every query in the session must finish by.
+            See pnorm.deadline
 
         Examples
         --------
         with db.start_session() as session:
             session.get(...)
         """
-        close_connection_after_use = False
+        deadline_scope = (
+            deadlines.deadline(deadline) if deadline is not None else nullcontext()
+        )
 
-        if self.connection is None:
-            asyncio.run(self._async_client._create_connection())
-            close_connection_after_use = True
+        with deadline_scope:
+            close_connection_after_use = False
 
-        if schema is not None:
-            self.set_schema(schema=schema)
+            if self.connection is None:
+                asyncio.run(self._async_client._create_connection())
+                close_connection_after_use = True
 
-        try:
-            yield self
-        except:
-            asyncio.run(self._async_client._rollback())
-            raise
-        finally:
-            if self.connection is not None and close_connection_after_use:
-                asyncio.run(self._async_client._end_connection())
+            if schema is not None:
+                self.set_schema(schema=schema)
+
+            try:
+                yield self
+            except:
+                asyncio.run(self._async_client._rollback())
+                raise
+            finally:
+                if self.connection is not None and close_connection_after_use:
+                    asyncio.run(self._async_client._end_connection())
 
     @contextmanager
-    def start_transaction(self) -> Generator[PostgresClient, None, None]:
+    def start_transaction(
+        self,
+        *,
+        isolation: Optional[IsolationLevel] = None,
+        read_only: bool = False,
+        deferrable: bool = False,
+        synchronous_commit: Optional[SynchronousCommit] = None,
+    ) -> Generator[PostgresClient, None, None]:
         """Start a transaction
 
+        Parameters
+        ----------
+        isolation : Optional[IsolationLevel] = None
+            Isolation level of the transaction, defaults to the server's
+            default_transaction_isolation
+        read_only : bool = False
+            Reject writes inside the transaction
+        deferrable : bool = False
+            With a serializable read only transaction, wait for a snapshot
+            that can't cause serialization failures instead of tracking them
+        synchronous_commit : Optional[SynchronousCommit] = None
+            Override synchronous_commit for the transaction
+
         Examples
         --------
         with session.start_transaction() as tx:
             tx.get(...)
         """
+        transaction_options = get_transaction_options_statement(
+            isolation,
+            read_only,
+            deferrable,
+            synchronous_commit,
+        )
         self._async_client._create_transaction()
 
         try:
+            asyncio.run(self._async_client._set_transaction_options(transaction_options))
             yield self
         except:
             asyncio.run(self._async_client._rollback())
             raise
+        else:
+            asyncio.run(self._async_client.cursor.commit())
         finally:
-            asyncio.run(self._async_client._end_transaction())
+            self._async_client.cursor = SingleCommitCursor(self._async_client)
+
+    def run_transaction(
+        self,
+        fn: Callable[[PostgresClient], ResultT],
+        *,
+        retries: int = 3,
+        backoff: float = 0.05,
+        max_backoff: float = 2.0,
+        isolation: Optional[IsolationLevel] = None,
+        read_only: bool = False,
+        deferrable: bool = False,
+        synchronous_commit: Optional[SynchronousCommit] = None,
+        hooks: Optional[list[BaseHook]] = None,
+    ) -> ResultT:
+        """Run `fn` in a transaction, retrying it on serialization failures
+        and deadlocks
+
+        Parameters
+        ----------
+        fn : Callable[[PostgresClient], ResultT]
+            Body of the transaction, receives the transaction's client
+        retries : int = 3
+            Maximum number of times to retry the transaction
+        backoff : float = 0.05
+            Seconds to wait before the first retry, doubled for each retry
+        max_backoff : float = 2.0
+            Maximum seconds to wait between retries
+        isolation, read_only, deferrable, synchronous_commit
+            Options for the transaction, see start_transaction
+        hooks : Optional[list[BaseHook]] = None
+            Hooks notified with BaseHook.on_retry before each retry
+
+        Raises
+        ------
+        RuntimeError
+            When called in a transaction, retrying would roll back or commit
+            the outer transaction
+
+        Examples
+        --------
+        def transfer(tx: PostgresClient) -> None:
+            tx.execute(...)
+            tx.execute(...)
+
+        client.run_transaction(transfer, isolation="serializable")
+        """
+        if isinstance(self._async_client.cursor, TransactionCursor):
+            msg = "run_transaction can't run in a transaction"
+            raise RuntimeError(msg)
+
+        hooks = self._async_client._get_hooks(hooks)
+        attempt = 0
+
+        with self.start_session() as session:
+            while True:
+                attempt += 1
+
+                try:
+                    with session.start_transaction(
+                        isolation=isolation,
+                        read_only=read_only,
+                        deferrable=deferrable,
+                        synchronous_commit=synchronous_commit,
+                    ) as tx:
+                        return fn(tx)
+                except RETRYABLE_TRANSACTION_ERRORS as e:
+                    delay = get_retry_delay(attempt, retries, backoff, max_backoff)
+
+                    if delay is None:
+                        raise
+
+                    apply_retry_hooks(hooks, None, "transaction", attempt, e, delay)
+                    time.sleep(delay)
@@ -0,0 +1,140 @@
+import asyncio
+import time
+
+import psycopg
+import pytest
+import pytest_asyncio
+
+from pnorm import BatchWriter
+from tests.fixutres.client_counter import (
+    PostgresClientCounter,
+    client,  # noqa: F401
+    get_client,
+)
+from tests.utils.hooks import BatchRecorderHook
+
+pytest_plugins = ("pytest_asyncio",)
+
+INSERT_QUERY = "insert into pnorm__batch_writer__tests (id) values (%(id)s)"
+
+
+async def get_ids() -> list[int]:
+    rows = await get_client().select(
+        dict,
+        "select id from pnorm__batch_writer__tests order by id",
+    )
+    return [row["id"] for row in rows]
+
+
+class TestBatchWriter:
+    @pytest_asyncio.fixture(autouse=True)
+    async def setup_tests(self, client: PostgresClientCounter) -> None:  # noqa: F811
+        async with client.start_session() as session:
+            await session.execute(
+                "create table if not exists pnorm__batch_writer__tests (id int unique)"
+            )
+            await session.execute("truncate pnorm__batch_writer__tests")
+
+    @pytest.mark.asyncio
+    async def test_batches_concurrent_writes(self) -> None:
+        client = get_client()  # noqa: F811
+        hook = BatchRecorderHook()
+
+        async def produce(writer: BatchWriter, first_id: int) -> None:
+            for i in range(first_id, first_id + 5):
+                await writer.write({"id": i})
+
+        async with client.batch_writer(
+            INSERT_QUERY,
+            max_rows=4,
+            max_delay=10,
+            hooks=[hook],
+        ) as writer:
+            await asyncio.gather(produce(writer, 0), produce(writer, 5))
+
+        assert await get_ids() == list(range(10))
+        # Full batches right away, the rest when the writer closed
+        assert hook.batch_sizes == [4, 4, 2]
+        # The writer has its own connection
+        assert client.check_connections() == 0
+
+    @pytest.mark.asyncio
+    async def test_max_delay(self) -> None:
+        client = get_client()  # noqa: F811
+
+        async with client.batch_writer(
+            INSERT_QUERY,
+            max_rows=100,
+            max_delay=0.1,
+        ) as writer:
+            await writer.write({"id": 1})
+            assert await get_ids() == []
+
+            await asyncio.sleep(0.3)
+            assert await get_ids() == [1]
+
+    @pytest.mark.asyncio
+    async def test_flush(self) -> None:
+        client = get_client()  # noqa: F811
+
+        async with client.batch_writer(INSERT_QUERY, max_delay=10) as writer:
+            await writer.write_many([{"id": 1}, {"id": 2}])
+            await writer.flush()
+
+            assert await get_ids() == [1, 2]
+
+    @pytest.mark.asyncio
+    async def test_backpressure(self) -> None:
+        client = get_client()  # noqa: F811
+        slow_query = (
+            "insert into pnorm__batch_writer__tests (id) "
+            "select %(id)s from pg_sleep(0.1)"
+        )
+
+        async with client.batch_writer(
+            slow_query,
+            max_rows=1,
+            max_buffered_rows=1,
+        ) as writer:
+            start = time.perf_counter()
+            await writer.write_many([{"id": i} for i in range(3)])
+
+            # The last write waited for the first batch to be stored
+            assert time.perf_counter() - start >= 0.1
+
+        assert await get_ids() == [0, 1, 2]
+
+    @pytest.mark.asyncio
+    async def test_failed_batch(self) -> None:
+        client = get_client()  # noqa: F811
+
+        with pytest.raises(psycopg.errors.UniqueViolation):
+            async with client.batch_writer(INSERT_QUERY, max_delay=10) as writer:
+                await writer.write_many([{"id": 1}, {"id": 1}])
+
+                with pytest.raises(psycopg.errors.UniqueViolation):
+                    await writer.flush()
+
+                with pytest.raises(psycopg.errors.UniqueViolation):
+                    await writer.write({"id": 2})
+
+    @pytest.mark.asyncio
+    async def test_closed(self) -> None:
+        client = get_client()  # noqa: F811
+
+        async with client.batch_writer(INSERT_QUERY) as writer:
+            ...
+
+        with pytest.raises(RuntimeError):
+            await writer.write({"id": 1})
+
+    @pytest.mark.asyncio
+    async def test_flush_on_error_in_block(self) -> None:
+        client = get_client()  # noqa: F811
+
+        with pytest.raises(ValueError):
+            async with client.batch_writer(INSERT_QUERY, max_delay=10) as writer:
+                await writer.write({"id": 1})
+                raise ValueError("Failed")
+
+        assert await get_ids() == [1]
@@ -0,0 +1,114 @@
+import asyncio
+import time
+
+import psycopg
+import pytest
+
+from pnorm import AsyncPostgresClient
+from tests.fixutres.client_counter import get_client
+from tests.utils.hooks import ExceptionRecorderHook
+from tests.utils.queries import running_queries, wait_for_running
+
+pytest_plugins = ("pytest_asyncio",)
+
+
+class TestCancel:
+    @pytest.mark.asyncio
+    async def test_timeout_cancels_server_query(self) -> None:
+        client = get_client()
+
+        async with client.start_session() as session:
+            start = time.perf_counter()
+
+            with pytest.raises(TimeoutError):
+                await session.select(
+                    dict,
+                    "select pg_sleep(10) -- pnorm__cancel__timeout",
+                    timeout=0.2,
+                )
+
+            assert time.perf_counter() - start < 2
+            assert await running_queries("pnorm__cancel__timeout") == 0
+
+            # The session's connection is still usable
+            result = await session.get(dict, "select 1 as one")
+            assert result == {"one": 1}
+
+        assert client.check_connections() == 1
+
+    @pytest.mark.asyncio
+    async def test_task_cancel_cancels_server_query(self) -> None:
+        client = get_client()
+        task = asyncio.create_task(
+            client.select(dict, "select pg_sleep(10) -- pnorm__cancel__task")
+        )
+
+        await wait_for_running("pnorm__cancel__task", 1)
+        task.cancel()
+
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        await wait_for_running("pnorm__cancel__task", 0)
+        assert client.check_connections() == 1
+
+    @pytest.mark.asyncio
+    async def test_task_cancel_in_session(self) -> None:
+        client = get_client()
+
+        async with client.start_session() as session:
+            task = asyncio.create_task(
+                session.select(dict, "select pg_sleep(10) -- pnorm__cancel__session")
+            )
+
+            await wait_for_running("pnorm__cancel__session", 1)
+            task.cancel()
+
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+            assert await running_queries("pnorm__cancel__session") == 0
+
+            result = await session.get(dict, "select 1 as one")
+            assert result == {"one": 1}
+
+    @pytest.mark.asyncio
+    async def test_session_reconnects_after_abort(self) -> None:
+        client = get_client()
+
+        async with client.start_session() as session:
+            # Closed when a cancelled query can't be stopped cleanly
+            assert session.connection is not None
+            await session.connection.close()
+
+            result = await session.get(dict, "select 1 as one")
+            assert result == {"one": 1}
+
+            with pytest.raises(psycopg.OperationalError):
+                async with session.start_transaction() as tx:
+                    assert tx.connection is not None
+                    await tx.connection.close()
+                    await tx.execute("select 1")
+
+        assert client.check_connections() == 2
+
+    @pytest.mark.asyncio
+    async def test_cancel_reported_to_hooks(self) -> None:
+        hook = ExceptionRecorderHook()
+        client: AsyncPostgresClient = get_client()
+        task = asyncio.create_task(
+            client.select(
+                dict,
+                "select pg_sleep(10) -- pnorm__cancel__hooks",
+                hooks=[hook],
+            )
+        )
+
+        await wait_for_running("pnorm__cancel__hooks", 1)
+        task.cancel()
+
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        assert len(hook.exceptions) == 1
+        assert isinstance(hook.exceptions[0], asyncio.CancelledError)
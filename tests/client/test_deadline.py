@@ -0,0 +1,111 @@
+import time
+
+import psycopg
+import pytest
+
+from pnorm import DeadlineExceededException, deadline
+from tests.fixutres.client_counter import (
+    PostgresClientCounter,
+    client,  # noqa: F401
+    get_client,
+)
+from tests.utils.hooks import ExceptionRecorderHook
+
+pytest_plugins = ("pytest_asyncio",)
+
+
+async def statement_timeout(client: PostgresClientCounter) -> str:  # noqa: F811
+    result = await client.get(
+        dict,
+        "select current_setting('statement_timeout') as statement_timeout",
+    )
+
+    return result["statement_timeout"]
+
+
+class TestDeadline:
+    @pytest.mark.asyncio
+    async def test_deadline_stops_query(self, client: PostgresClientCounter) -> None:  # noqa: F811
+        hook = ExceptionRecorderHook()
+        start = time.perf_counter()
+
+        with deadline(0.3):
+            with pytest.raises(DeadlineExceededException) as e:
+                await client.execute("select pg_sleep(5)", hooks=[hook])
+
+        assert time.perf_counter() - start < 2
+        # Stopped by the server, not the client side timeout
+        assert isinstance(e.value.__cause__, psycopg.errors.QueryCanceled)
+        assert hook.exceptions == [e.value]
+
+    @pytest.mark.asyncio
+    async def test_deadline_sets_statement_timeout(
+        self,
+        client: PostgresClientCounter,  # noqa: F811
+    ) -> None:
+        with deadline(10):
+            timeout = await statement_timeout(client)
+
+        assert timeout.endswith("ms")
+        assert 9000 < int(timeout.removesuffix("ms")) <= 10000
+
+    @pytest.mark.asyncio
+    async def test_no_deadline(self, client: PostgresClientCounter) -> None:  # noqa: F811
+        assert await statement_timeout(client) == "0"
+
+    @pytest.mark.asyncio
+    async def test_expired_deadline_skips_query(self) -> None:
+        client = get_client()  # noqa: F811
+
+        with deadline(0):
+            with pytest.raises(DeadlineExceededException):
+                await client.execute("select 1")
+
+        # The query never connected to the database
+        assert client.check_connections() == 0
+
+    @pytest.mark.asyncio
+    async def test_nested_deadline(self, client: PostgresClientCounter) -> None:  # noqa: F811
+        with deadline(1):
+            with deadline(100):
+                timeout = await statement_timeout(client)
+
+        assert int(timeout.removesuffix("ms")) <= 1000
+
+    @pytest.mark.asyncio
+    async def test_session_deadline(self, client: PostgresClientCounter) -> None:  # noqa: F811
+        async with client.start_session(deadline=0.3) as session:
+            with pytest.raises(DeadlineExceededException):
+                await session.execute("select pg_sleep(5)")
+
+            # The session can still be used after the deadline passed inside it
+            with pytest.raises(DeadlineExceededException):
+                await session.execute("select 1")
+
+        await client.execute("select pg_sleep(0.5)")
+
+    @pytest.mark.asyncio
+    async def test_session_usable_after_error(
+        self,
+        client: PostgresClientCounter,  # noqa: F811
+    ) -> None:
+        async with client.start_session() as session:
+            with pytest.raises(psycopg.errors.UndefinedTable):
+                await session.execute("select * from pnorm__deadline__missing")
+
+            assert await session.get(dict, "select 1 as value") == {"value": 1}
+
+    @pytest.mark.asyncio
+    async def test_transaction_after_deadline(
+        self,
+        client: PostgresClientCounter,  # noqa: F811
+    ) -> None:
+        async with client.start_session() as session:
+            async with session.start_transaction() as tx:
+                with deadline(0.3):
+                    await tx.execute("select 1")
+
+                # The deadline's statement_timeout ended with its block, not
+                # with the transaction
+                assert await statement_timeout(tx) == "0"
+                await tx.execute("select pg_sleep(0.5)")
@@ -0,0 +1,124 @@
+import time
+
+import pytest
+import pytest_asyncio
+
+from pnorm.hooks.base import BaseHook, HookContext
+from pnorm.hooks.opentelemetry import OpenTelemetryHook
+from tests.fixutres.client_counter import (
+    PostgresClientCounter,
+    client,  # noqa: F401
+    get_client,
+)
+from tests.utils.hooks import BatchRecorderHook
+from tests.utils.telemetry import get_metric_points
+
+pytest_plugins = ("pytest_asyncio",)
+
+DELETE_QUERY = """
+delete from pnorm__in_batches__tests
+where ctid = any(array(
+    select ctid
+    from pnorm__in_batches__tests
+    where id <= %(max_id)s
+    limit %(batch_size)s
+))
+"""
+
+
+class TestExecuteInBatches:
+    @pytest_asyncio.fixture(autouse=True)
+    async def setup_tests(self, client: PostgresClientCounter) -> None:  # noqa: F811
+        async with client.start_session() as session:
+            await session.execute(
+                "create table if not exists pnorm__in_batches__tests (id int)"
+            )
+            await session.execute("truncate pnorm__in_batches__tests")
+            await session.execute(
+                """
+                insert into pnorm__in_batches__tests (id)
+                select generate_series(1, 10)
+                """
+            )
+
+    async def get_ids(self) -> list[int]:
+        rows = await get_client().select(
+            dict,
+            "select id from pnorm__in_batches__tests order by id",
+        )
+        return [row["id"] for row in rows]
+
+    @pytest.mark.asyncio
+    async def test_runs_until_no_rows(self) -> None:
+        client = get_client()  # noqa: F811
+        hook = BatchRecorderHook()
+
+        rows = await client.execute_in_batches(
+            DELETE_QUERY,
+            {"max_id": 7},
+            batch_size=3,
+            hooks=[hook, OpenTelemetryHook()],
+        )
+
+        assert rows == 7
+        assert await self.get_ids() == [8, 9, 10]
+        assert hook.batches == [
+            ("execute_in_batches", 1, 3),
+            ("execute_in_batches", 2, 3),
+            ("execute_in_batches", 3, 1),
+            ("execute_in_batches", 4, 0),
+        ]
+        # Every batch ran on the same connection
+        assert client.check_connections() == 1
+
+        points = get_metric_points("database_requests_batch_rows")
+        assert any(
+            point.attributes["db.operation.batch.kind"] == "execute_in_batches"
+            for point in points
+        )
+
+    @pytest.mark.asyncio
+    async def test_batches_are_committed(self) -> None:
+        client = get_client()  # noqa: F811
+        hook = BatchRecorderHook()
+
+        class FailSecondBatchHook(BaseHook[None]):
+            def pre_query(self, context: HookContext) -> None:
+                if len(hook.batches) == 1:
+                    raise RuntimeError("Stop")
+
+        with pytest.raises(RuntimeError):
+            await client.execute_in_batches(
+                DELETE_QUERY,
+                {"max_id": 10},
+                batch_size=4,
+                hooks=[hook, FailSecondBatchHook()],
+            )
+
+        assert await self.get_ids() == [5, 6, 7, 8, 9, 10]
+
+    @pytest.mark.asyncio
+    async def test_pause(self) -> None:
+        client = get_client()  # noqa: F811
+
+        start = time.perf_counter()
+        await client.execute_in_batches(
+            DELETE_QUERY,
+            {"max_id": 10},
+            batch_size=5,
+            pause=0.1,
+        )
+
+        # Three batches, two pauses between them
+        assert time.perf_counter() - start >= 0.2
+
+    @pytest.mark.asyncio
+    async def test_in_transaction(self) -> None:
+        client = get_client()  # noqa: F811
+
+        async with client.start_session() as session:
+            async with session.start_transaction() as tx:
+                with pytest.raises(RuntimeError):
+                    await tx.execute_in_batches(DELETE_QUERY, {"max_id": 10})
+
+        assert len(await self.get_ids()) == 10
@@ -0,0 +1,143 @@
+from collections.abc import AsyncGenerator, Generator
+
+import psycopg
+import pytest
+import pytest_asyncio
+from pydantic import BaseModel
+
+from pnorm.hooks.opentelemetry import OpenTelemetryHook
+from tests.fixutres.client_counter import (
+    PostgresClientCounter,
+    client,  # noqa: F401
+    get_client,
+)
+from tests.utils.hooks import BatchRecorderHook
+from tests.utils.telemetry import get_metric_points
+
+pytest_plugins = ("pytest_asyncio",)
+
+INSERT_QUERY = (
+    "insert into pnorm__execute_many__tests (user_id, name) "
+    "values (%(user_id)s, %(name)s)"
+)
+
+
+class Params(BaseModel):
+    user_id: int
+    name: str
+
+
+def generate_params(count: int) -> Generator[dict[str, object], None, None]:
+    for user_id in range(1, count + 1):
+        yield {"user_id": user_id, "name": f"test-{user_id}"}
+
+
+async def agenerate_params(count: int) -> AsyncGenerator[Params, None]:
+    for user_id in range(1, count + 1):
+        yield Params(user_id=user_id, name=f"test-{user_id}")
+
+
+class TestExecuteMany:
+    @pytest_asyncio.fixture(autouse=True)
+    async def setup_tests(self, client: PostgresClientCounter) -> None:  # noqa: F811
+        async with client.start_session() as session:
+            await session.execute(
+                """
+                create table if not exists pnorm__execute_many__tests (
+                    user_id int unique, name text
+                )
+                """
+            )
+            await session.execute("truncate pnorm__execute_many__tests")
+
+    async def get_user_ids(self) -> list[int]:
+        rows = await get_client().select(
+            dict,
+            "select user_id from pnorm__execute_many__tests order by user_id",
+        )
+        return [row["user_id"] for row in rows]
+
+    @pytest.mark.asyncio
+    async def test_generator_in_chunks(self) -> None:
+        client = get_client()  # noqa: F811
+        hook = BatchRecorderHook()
+
+        executed = await client.execute_many(
+            INSERT_QUERY,
+            generate_params(5),
+            chunk_size=2,
+            hooks=[hook, OpenTelemetryHook()],
+        )
+
+        assert executed == 5
+        assert await self.get_user_ids() == [1, 2, 3, 4, 5]
+        assert hook.batch_sizes == [2, 2, 1]
+        assert hook.batches == [
+            ("execute_many", 1, 2),
+            ("execute_many", 2, 2),
+            ("execute_many", 3, 1),
+        ]
+        # Every chunk ran on the same connection
+        assert client.check_connections() == 1
+
+        points = get_metric_points("database_requests_batch_rows")
+        assert any(
+            point.attributes["db.operation.batch.kind"] == "execute_many"
+            for point in points
+        )
+
+    @pytest.mark.asyncio
+    async def test_async_generator(self) -> None:
+        client = get_client()  # noqa: F811
+
+        executed = await client.execute_many(
+            INSERT_QUERY,
+            agenerate_params(3),
+            chunk_size=10,
+        )
+
+        assert executed == 3
+        assert await self.get_user_ids() == [1, 2, 3]
+
+    @pytest.mark.asyncio
+    async def test_no_params(self) -> None:
+        client = get_client()  # noqa: F811
+        hook = BatchRecorderHook()
+
+        executed = await client.execute_many(INSERT_QUERY, [], hooks=[hook])
+
+        assert executed == 0
+        assert hook.batches == []
+
+    @pytest.mark.asyncio
+    async def test_failed_chunk(self) -> None:
+        client = get_client()  # noqa: F811
+        params = [*generate_params(3), {"user_id": 1, "name": "duplicate"}]
+
+        with pytest.raises(psycopg.errors.UniqueViolation):
+            await client.execute_many(INSERT_QUERY, params, chunk_size=3)
+
+        # Chunks before the failure were committed
+        assert await self.get_user_ids() == [1, 2, 3]
+
+    @pytest.mark.asyncio
+    async def test_in_transaction(self) -> None:
+        client = get_client()  # noqa: F811
+        params = [*generate_params(3), {"user_id": 1, "name": "duplicate"}]
+
+        with pytest.raises(psycopg.errors.UniqueViolation):
+            async with client.start_session() as session:
+                async with session.start_transaction() as tx:
+                    await tx.execute_many(INSERT_QUERY, params, chunk_size=3)
+
+        assert await self.get_user_ids() == []
+
+    @pytest.mark.asyncio
+    async def test_invalid_arguments(self) -> None:
+        client = get_client()  # noqa: F811
+
+        with pytest.raises(ValueError):
+            await client.execute_many(INSERT_QUERY, generate_params(1), chunk_size=0)
+
+        with pytest.raises(ValueError):
+            await client.execute_many(INSERT_QUERY, {"user_id": 1, "name": "test"})
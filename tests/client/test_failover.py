@@ -0,0 +1,163 @@
+import time
+
+import psycopg
+import pytest
+from pydantic import ValidationError
+
+from pnorm import PostgresCredentials, RetryPolicy
+from tests.fixutres.client_counter import PostgresClientCounter, get_creds
+
+pytest_plugins = ("pytest_asyncio",)
+
+# Nothing listens on port 1, so connecting is refused straight away
+UNREACHABLE_PORT = 1
+
+# Non routable address, connecting hangs until the timeout
+BLACKHOLE_HOST = "10.255.255.1"
+
+
+def get_failover_credentials(**kwargs) -> PostgresCredentials:
+    credentials = get_creds()
+
+    return PostgresCredentials.model_validate(
+        {
+            **credentials.as_dict(),
+            "host": [credentials.host, credentials.host],
+            "port": [UNREACHABLE_PORT, credentials.port],
+            **kwargs,
+        }
+    )
+
+
+class TestCredentials:
+    def test_single_host(self) -> None:
+        credentials = get_creds()
+
+        assert credentials.addresses() == [(credentials.host, credentials.port)]
+        assert credentials.as_dict()["host"] == credentials.host
+
+    def test_host_list(self) -> None:
+        credentials = PostgresCredentials(
+            user="postgres",
+            password="postgres",
+            host=["db-1", "db-2"],
+            port=[5432, 5433],
+            target_session_attrs="read-write",
+            connect_timeout=0.5,
+        )
+
+        assert credentials.addresses() == [("db-1", 5432), ("db-2", 5433)]
+        assert credentials.as_dict() == {
+            "dbname": "postgres",
+            "user": "postgres",
+            "password": "postgres",
+            "host": "db-1,db-2",
+            "port": "5432,5433",
+            "target_session_attrs": "read-write",
+            "connect_timeout": 1,
+        }
+
+        # Round trips through the connection string format
+        assert PostgresCredentials.model_validate(
+            credentials.as_dict()
+        ).addresses() == [
+            ("db-1", 5432),
+            ("db-2", 5433),
+        ]
+
+    def test_shared_port(self) -> None:
+        credentials = PostgresCredentials(
+            user="postgres",
+            password="postgres",
+            host="db-1,db-2",
+        )
+
+        assert credentials.addresses() == [("db-1", 5432), ("db-2", 5432)]
+
+    def test_port_per_host(self) -> None:
+        with pytest.raises(ValidationError):
+            PostgresCredentials(
+                user="postgres",
+                password="postgres",
+                host=["db-1", "db-2", "db-3"],
+                port=[5432, 5433],
+            )
+
+    def test_invalid_target_session_attrs(self) -> None:
+        with pytest.raises(ValidationError):
+            PostgresCredentials(
+                user="postgres",
+                password="postgres",
+                host="db-1",
+                target_session_attrs="fastest",  # type: ignore
+            )
+
+
+class TestFailover:
+    @pytest.mark.asyncio
+    async def test_connects_to_next_host(self) -> None:
+        client = PostgresClientCounter(get_failover_credentials())
+
+        assert await client.get(dict, "select 1 as value") == {"value": 1}
+
+    @pytest.mark.asyncio
+    async def test_connect_timeout_per_host(self) -> None:
+        credentials = get_creds()
+        client = PostgresClientCounter(
+            get_failover_credentials(
+                host=[BLACKHOLE_HOST, credentials.host],
+                connect_timeout=0.2,
+            )
+        )
+
+        start = time.perf_counter()
+        assert await client.get(dict, "select 1 as value") == {"value": 1}
+        assert time.perf_counter() - start < 1.5
+
+    @pytest.mark.asyncio
+    async def test_no_host_available(self) -> None:
+        client = PostgresClientCounter(get_failover_credentials(port=UNREACHABLE_PORT))
+
+        with pytest.raises(psycopg.OperationalError) as e:
+            await client.get(dict, "select 1 as value")
+
+        # Every host is listed in the error
+        assert str(e.value).count(f":{UNREACHABLE_PORT}:") == 2
+
+    @pytest.mark.asyncio
+    async def test_target_session_attrs(self) -> None:
+        # The test server is a primary
+        primary = PostgresClientCounter(
+            get_failover_credentials(target_session_attrs="read-write")
+        )
+        assert await primary.get(dict, "select 1 as value") == {"value": 1}
+
+        standby = PostgresClientCounter(
+            get_failover_credentials(target_session_attrs="standby")
+        )
+        with pytest.raises(psycopg.OperationalError):
+            await standby.get(dict, "select 1 as value")
+
+        # Uses the primary when there is no standby
+        prefer_standby = PostgresClientCounter(
+            get_failover_credentials(target_session_attrs="prefer-standby")
+        )
+        assert await prefer_standby.get(dict, "select 1 as value") == {"value": 1}
+
+    @pytest.mark.asyncio
+    async def test_retry_reconnects_through_hosts(self) -> None:
+        client = PostgresClientCounter(
+            get_failover_credentials(),
+            retry_policy=RetryPolicy(backoff=0.01),
+        )
+
+        async with client.start_session() as session:
+            assert session.connection is not None
+            await PostgresClientCounter(get_creds()).execute(
+                "select pg_terminate_backend(%(pid)s)",
+                {"pid": session.connection.info.backend_pid},
+            )
+
+            assert await session.get(dict, "select 1 as value") == {"value": 1}
+
+        assert client.check_connections() == 2
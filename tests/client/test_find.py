@@ -272,3 +272,20 @@ class TestAsyncFind:
         )
 
         assert response == {"user_id": 1, "name": "test"}
+
+    @pytest.mark.asyncio
+    async def test_limits_rows_produced(self, client: PostgresClientCounter) -> None: # noqa: F811
+        await client.execute("create sequence if not exists pnorm__async_find__counter")
+
+        first = await client.find(
+            dict,
+            "select nextval('pnorm__async_find__counter') as value from generate_series(1, 1000)",
+        )
+        second = await client.find(
+            dict,
+            "select nextval('pnorm__async_find__counter') as value",
+        )
+
+        # Only the row returned was produced
+        assert first is not None and second is not None
+        assert second["value"] - first["value"] == 1
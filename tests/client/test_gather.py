@@ -0,0 +1,316 @@
+import time
+
+import psycopg
+import pytest
+import pytest_asyncio
+from psycopg import sql
+from pydantic import BaseModel
+
+from pnorm import AsyncPostgresClient, PostgresCredentials
+from pnorm.hooks.base import BaseHook, HookContext
+from pnorm.hooks.opentelemetry import OpenTelemetryHook
+from tests.fixutres.client_counter import get_client, get_creds
+from tests.utils.queries import wait_for_running
+from tests.utils.telemetry import get_metric_points
+
+pytest_plugins = ("pytest_asyncio",)
+
+# Databases on the test server with the odd and even ids
+GATHER_DATABASES = ("pnorm__gather_1", "pnorm__gather_2")
+
+
+class Row(BaseModel):
+    id: int
+    dbname: str
+
+
+class GatherRecorderHook(BaseHook[None]):
+    def __init__(self) -> None:
+        self.targets: list[tuple[str, int]] = []
+
+    def on_gather_target(
+        self,
+        context: HookContext,
+        target: str,
+        duration: float,
+        rows_returned: int,
+    ) -> None:
+        self.targets.append((target, rows_returned))
+
+
+def get_targets() -> list[PostgresCredentials]:
+    targets = []
+
+    for dbname in GATHER_DATABASES:
+        credentials = get_creds()
+        credentials.dbname = dbname
+        targets.append(credentials)
+
+    return targets
+
+
+@pytest_asyncio.fixture(autouse=True, scope="module")
+async def setup_databases() -> None:
+    connection = await psycopg.AsyncConnection.connect(
+        **get_creds().as_dict(),
+        autocommit=True,
+    )
+
+    async with connection:
+        for dbname in GATHER_DATABASES:
+            cursor = await connection.execute(
+                "select 1 from pg_database where datname = %(dbname)s",
+                {"dbname": dbname},
+            )
+
+            if await cursor.fetchone() is None:
+                await connection.execute(f"create database {dbname}")
+
+    for first_id, credentials in enumerate(get_targets(), start=1):
+        connection = await psycopg.AsyncConnection.connect(
+            **credentials.as_dict(),
+            autocommit=True,
+        )
+
+        async with connection:
+            await connection.execute(
+                "create table if not exists pnorm__gather__tests (id int unique)"
+            )
+            await connection.execute(
+                """
+                insert into pnorm__gather__tests (id)
+                select generate_series(%(first_id)s, 6, 2)
+                on conflict do nothing
+                """,
+                {"first_id": first_id},
+            )
+
+
+class TestGatherSelect:
+    @pytest.mark.asyncio
+    async def test_concatenates_in_target_order(self) -> None:
+        client = get_client()
+
+        res = await client.gather_select(
+            dict,
+            "select id from pnorm__gather__tests order by id",
+            targets=get_targets(),
+        )
+
+        assert [row["id"] for row in res] == [1, 3, 5, 2, 4, 6]
+        assert client.check_connections() == 0
+
+    @pytest.mark.asyncio
+    async def test_composed_query(self) -> None:
+        client = get_client()
+
+        res = await client.gather_select(
+            dict,
+            sql.SQL("select id from {} order by id").format(
+                sql.Identifier("pnorm__gather__tests")
+            ),
+            targets=get_targets(),
+        )
+
+        assert [row["id"] for row in res] == [1, 3, 5, 2, 4, 6]
+        # Only the targets were connected to
+        assert client.create_connections == []
+
+    @pytest.mark.asyncio
+    async def test_merges_ordered_rows(self) -> None:
+        client = get_client()
+
+        res = await client.gather_select(
+            Row,
+            """
+            select id, current_database() as dbname
+            from pnorm__gather__tests
+            where id > %(min_id)s
+            order by id
+            """,
+            {"min_id": 1},
+            targets=get_targets(),
+            order_by="id",
+        )
+
+        assert [row.id for row in res] == [2, 3, 4, 5, 6]
+        assert res[0] == Row(id=2, dbname="pnorm__gather_2")
+
+    @pytest.mark.asyncio
+    async def test_merges_descending_rows(self) -> None:
+        client = get_client()
+
+        res = await client.gather_select(
+            dict,
+            """
+            select current_database() as dbname, id
+            from pnorm__gather__tests
+            order by current_database() desc, id desc
+            """,
+            targets=get_targets(),
+            order_by=["dbname", "id"],
+            descending=True,
+        )
+
+        assert [row["id"] for row in res] == [6, 4, 2, 5, 3, 1]
+
+    @pytest.mark.asyncio
+    async def test_merges_null_sort_values(self) -> None:
+        client = get_client()
+        query = """
+            select id from pnorm__gather__tests
+            union all
+            select null
+            order by id {}
+        """
+
+        res = await client.gather_select(
+            dict,
+            query.format("asc"),
+            targets=get_targets(),
+            order_by="id",
+        )
+
+        # Nulls sort last, like in Postgres
+        assert [row["id"] for row in res] == [1, 2, 3, 4, 5, 6, None, None]
+
+        res = await client.gather_select(
+            dict,
+            query.format("desc"),
+            targets=get_targets(),
+            order_by="id",
+            descending=True,
+        )
+
+        assert [row["id"] for row in res] == [None, None, 6, 5, 4, 3, 2, 1]
+
+    @pytest.mark.asyncio
+    async def test_runs_concurrently(self) -> None:
+        client = get_client()
+        query = "select 1 as value from pg_sleep(0.2)"
+
+        start = time.perf_counter()
+        await client.gather_select(dict, query, targets=get_targets())
+        assert time.perf_counter() - start < 0.35
+
+        start = time.perf_counter()
+        await client.gather_select(
+            dict,
+            query,
+            targets=get_targets(),
+            max_concurrency=1,
+        )
+        assert time.perf_counter() - start >= 0.4
+
+    @pytest.mark.asyncio
+    async def test_reports_each_target(self) -> None:
+        client = get_client()
+        hook = GatherRecorderHook()
+        credentials = get_creds()
+
+        await client.gather_select(
+            dict,
+            "select id from pnorm__gather__tests where id <= 3",
+            targets=get_targets(),
+            hooks=[hook, OpenTelemetryHook()],
+        )
+
+        assert sorted(hook.targets) == [
+            (f"{credentials.host}:{credentials.port}/pnorm__gather_1", 2),
+            (f"{credentials.host}:{credentials.port}/pnorm__gather_2", 1),
+        ]
+
+        points = get_metric_points("database_requests_gather_rows")
+        assert {point.attributes["db.query.target"] for point in points} >= {
+            target for target, _ in hook.targets
+        }
+
+    @pytest.mark.asyncio
+    async def test_target_failure(self) -> None:
+        client = get_client()
+        missing = get_creds()
+        missing.dbname = "pnorm__gather_missing"
+
+        with pytest.raises(psycopg.OperationalError):
+            await client.gather_select(
+                dict,
+                "select 1 as value from pg_sleep(0.2)",
+                targets=[*get_targets(), missing],
+            )
+
+
+class TestGather:
+    @pytest.mark.asyncio
+    async def test_returns_results_in_order(self) -> None:
+        client = get_client()
+
+        row, rows, missing = await client.gather(
+            lambda db: db.get(Row, "select 1 as id, current_database() as dbname"),
+            lambda db: db.select(dict, "select generate_series(1, 3) as value"),
+            lambda db: db.find(dict, "select 1 where false"),
+        )
+
+        assert row == Row(id=1, dbname="postgres")
+        assert rows == ({"value": 1}, {"value": 2}, {"value": 3})
+        assert missing is None
+        assert client.check_connections() == 0
+
+    @pytest.mark.asyncio
+    async def test_runs_concurrently(self) -> None:
+        client = get_client()
+        query = "select pg_backend_pid() as pid from pg_sleep(0.2)"
+
+        start = time.perf_counter()
+        results = await client.gather(
+            *[lambda db: db.get(dict, query) for _ in range(3)],
+        )
+
+        assert time.perf_counter() - start < 0.4
+        # Each query had its own connection
+        assert len({result["pid"] for result in results}) == 3
+
+        start = time.perf_counter()
+        await client.gather(
+            *[lambda db: db.get(dict, query) for _ in range(3)],
+            max_concurrency=1,
+        )
+        assert time.perf_counter() - start >= 0.6
+
+    @pytest.mark.asyncio
+    async def test_in_session(self) -> None:
+        client = get_client()
+
+        async with client.start_session(schema="public") as session:
+            assert session.connection is not None
+            pid = session.connection.info.backend_pid
+
+            (res,) = await session.gather(
+                lambda db: db.get(
+                    dict,
+                    "select pg_backend_pid() as pid, current_schema() as schema",
+                ),
+            )
+
+            assert res["pid"] != pid
+            assert res["schema"] == "public"
+
+        assert client.check_connections() == 1
+
+    @pytest.mark.asyncio
+    async def test_failure_cancels_other_queries(self) -> None:
+        client = get_client()
+        marker = "pnorm__gather__tests_cancelled"
+
+        async def fail(db: AsyncPostgresClient) -> None:
+            await wait_for_running(marker, 1)
+            await db.get(dict, "select * from pnorm__gather__missing")
+
+        start = time.perf_counter()
+        with pytest.raises(psycopg.errors.UndefinedTable):
+            await client.gather(
+                lambda db: db.execute(f"select pg_sleep(2) -- {marker}"),
+                fail,
+            )
+
+        assert time.perf_counter() - start < 1
+        await wait_for_running(marker, 0)
@@ -287,3 +287,40 @@ class TestAsyncGet:
         )
 
         assert response == {"user_id": 1, "name": "test"}
+
+    @pytest.mark.asyncio
+    async def test_limits_rows_produced(self, client: PostgresClientCounter) -> None:  # noqa: F811
+        await client.execute("create sequence if not exists pnorm__async_get__counter")
+        before = await client.get(
+            dict, "select nextval('pnorm__async_get__counter') as value"
+        )
+
+        # Only the two rows needed to know there are several are produced
+        with pytest.raises(MultipleRecordsReturnedException):
+            await client.get(
+                dict,
+                """
+                -- every row produced advances the sequence
+                select nextval('pnorm__async_get__counter') as value
+                from generate_series(1, 1000) -- trailing comment
+                """,
+            )
+
+        after = await client.get(
+            dict, "select nextval('pnorm__async_get__counter') as value"
+        )
+        assert after["value"] - before["value"] == 3
+
+    @pytest.mark.asyncio
+    async def test_write_returning(self, client: PostgresClientCounter) -> None:  # noqa: F811
+        async with client.start_session() as session:
+            async with session.start_transaction() as tx:
+                response = await tx.get(
+                    dict,
+                    "insert into pnorm__async_get__tests (user_id, name) values (100, 'returned') returning *",
+                )
+
+                assert response == {"user_id": 100, "name": "returned"}
+                await tx.execute(
+                    "delete from pnorm__async_get__tests where user_id = 100"
+                )
@@ -0,0 +1,222 @@
+import asyncio
+from typing import AsyncGenerator, TypeVar
+
+import pytest
+from pydantic import BaseModel
+
+from pnorm import AsyncPostgresClient, MarshallRecordException, Notification
+from tests.fixutres.client_counter import (
+    PostgresClientCounter,
+    client,  # noqa: F401
+    get_client,
+    get_creds,
+)
+
+pytest_plugins = ("pytest_asyncio",)
+
+T = TypeVar("T")
+
+
+class Job(BaseModel):
+    job_id: int
+    name: str
+
+
+async def wait_for_listeners(client: AsyncPostgresClient, channel: str) -> None:  # noqa: F811
+    for _ in range(100):
+        listeners = await client.select(
+            dict,
+            "select pid from pg_stat_activity where query = %(query)s",
+            {"query": f'listen "{channel}"'},
+        )
+
+        if len(listeners) > 0:
+            return
+
+        await asyncio.sleep(0.05)
+
+    raise AssertionError(f"Listener on {channel} never connected")
+
+
+class FreezingProxy:
+    """TCP proxy to the test database that can stop forwarding on the open
+    connections without closing them, like a server that vanished"""
+
+    def __init__(self) -> None:
+        self.frozen: list[asyncio.Event] = []
+        self.writers: list[asyncio.StreamWriter] = []
+
+    async def start(self) -> int:
+        self.server = await asyncio.start_server(self.forward, "127.0.0.1", 0)
+        return self.server.sockets[0].getsockname()[1]
+
+    def freeze(self) -> None:
+        for frozen in self.frozen:
+            frozen.set()
+
+    async def close(self) -> None:
+        for writer in self.writers:
+            writer.close()
+
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def forward(
+        self,
+        client_reader: asyncio.StreamReader,
+        client_writer: asyncio.StreamWriter,
+    ) -> None:
+        credentials = get_creds()
+        server_reader, server_writer = await asyncio.open_connection(
+            credentials.host, credentials.port
+        )
+        frozen = asyncio.Event()
+        self.frozen.append(frozen)
+        self.writers.extend([client_writer, server_writer])
+
+        async def pipe(
+            reader: asyncio.StreamReader,
+            writer: asyncio.StreamWriter,
+        ) -> None:
+            while data := await reader.read(65536):
+                if not frozen.is_set():
+                    writer.write(data)
+                    await writer.drain()
+
+        await asyncio.gather(
+            pipe(client_reader, server_writer),
+            pipe(server_reader, client_writer),
+            return_exceptions=True,
+        )
+
+
+async def next_notification(
+    notifications: AsyncGenerator[Notification[T], None],
+) -> Notification[T]:
+    return await asyncio.wait_for(anext(notifications), timeout=5)
+
+
+class TestListen:
+    @pytest.mark.asyncio
+    async def test_listen(self, client: PostgresClientCounter) -> None:  # noqa: F811
+        notifications = client.listen("pnorm__listen__tests")
+        pending = asyncio.create_task(next_notification(notifications))
+
+        await wait_for_listeners(client, "pnorm__listen__tests")
+        await client.execute("notify pnorm__listen__tests, 'hello'")
+
+        notification = await pending
+        await notifications.aclose()
+
+        assert notification.channel == "pnorm__listen__tests"
+        assert notification.payload == "hello"
+
+    @pytest.mark.asyncio
+    async def test_listen_does_not_use_query_connection(self) -> None:
+        client = get_client()  # noqa: F811
+
+        notifications = client.listen("pnorm__listen__tests_connection")
+        pending = asyncio.create_task(next_notification(notifications))
+
+        await wait_for_listeners(client, "pnorm__listen__tests_connection")
+        assert client.connection is None
+
+        await client.execute("select pg_notify('pnorm__listen__tests_connection', '1')")
+
+        await pending
+        await notifications.aclose()
+
+        # Every connection created for queries was closed again
+        client.check_connections()
+
+    @pytest.mark.asyncio
+    async def test_listen_payload_model(self, client: PostgresClientCounter) -> None:  # noqa: F811
+        notifications = client.listen("pnorm__listen__tests_model", payload_model=Job)
+        pending = asyncio.create_task(next_notification(notifications))
+
+        await wait_for_listeners(client, "pnorm__listen__tests_model")
+        await client.execute(
+            "select pg_notify('pnorm__listen__tests_model', %(payload)s)",
+            {"payload": Job(job_id=1, name="test").model_dump_json()},
+        )
+
+        notification = await pending
+        await notifications.aclose()
+
+        assert notification.payload == Job(job_id=1, name="test")
+
+    @pytest.mark.asyncio
+    async def test_listen_invalid_payload(self, client: PostgresClientCounter) -> None:  # noqa: F811
+        notifications = client.listen("pnorm__listen__tests_invalid", payload_model=Job)
+        pending = asyncio.create_task(next_notification(notifications))
+
+        await wait_for_listeners(client, "pnorm__listen__tests_invalid")
+        await client.execute("notify pnorm__listen__tests_invalid, 'not json'")
+
+        with pytest.raises(MarshallRecordException):
+            await pending
+
+    @pytest.mark.asyncio
+    async def test_listen_reconnects(self, client: PostgresClientCounter) -> None:  # noqa: F811
+        notifications = client.listen(
+            "pnorm__listen__tests_reconnect",
+            reconnect_delay=0.05,
+        )
+        pending = asyncio.create_task(next_notification(notifications))
+
+        await wait_for_listeners(client, "pnorm__listen__tests_reconnect")
+        await client.execute(
+            "select pg_terminate_backend(pid) from pg_stat_activity where query = %(query)s",
+            {"query": 'listen "pnorm__listen__tests_reconnect"'},
+        )
+
+        # Wait for the listener to reconnect and listen again
+        await asyncio.sleep(0.1)
+        await wait_for_listeners(client, "pnorm__listen__tests_reconnect")
+        await client.execute("notify pnorm__listen__tests_reconnect, 'after'")
+
+        notification = await pending
+        await notifications.aclose()
+
+        assert notification.payload == "after"
+
+    @pytest.mark.asyncio
+    async def test_listen_reconnects_after_silent_disconnect(self) -> None:
+        proxy = FreezingProxy()
+        credentials = get_creds()
+        credentials.host = "127.0.0.1"
+        credentials.port = await proxy.start()
+        client = get_client()  # noqa: F811
+
+        notifications = AsyncPostgresClient(credentials).listen(
+            "pnorm__listen__tests_silent",
+            reconnect_delay=0.05,
+            ping_interval=0.2,
+        )
+        pending = asyncio.create_task(next_notification(notifications))
+
+        try:
+            await wait_for_listeners(client, "pnorm__listen__tests_silent")
+            # The old connection stays open but nothing gets through anymore
+            proxy.freeze()
+
+            # The failed ping closes the frozen connection and a new one
+            # listens again
+            for _ in range(50):
+                await client.execute("notify pnorm__listen__tests_silent, 'after'")
+
+                if pending.done():
+                    break
+
+                await asyncio.sleep(0.1)
+
+            notification = await pending
+            assert notification.payload == "after"
+        finally:
+            await notifications.aclose()
+            await proxy.close()
+
+    @pytest.mark.asyncio
+    async def test_listen_requires_channel(self, client: PostgresClientCounter) -> None:  # noqa: F811
+        with pytest.raises(ValueError):
+            await anext(client.listen())
@@ -0,0 +1,137 @@
+import asyncio
+
+import psycopg
+import pytest
+import pytest_asyncio
+from pydantic import BaseModel
+
+from pnorm import MultipleRecordsReturnedException, NoRecordsReturnedException
+from tests.fixutres.client_counter import (
+    PostgresClientCounter,
+    client,  # noqa: F401
+    get_client,
+)
+from tests.utils.hooks import QueryRecorderHook
+
+pytest_plugins = ("pytest_asyncio",)
+
+LOADER_QUERY = "select * from pnorm__loader__tests where id = any(%(ids)s)"
+
+
+class User(BaseModel):
+    id: int
+    name: str
+
+
+class TestLoader:
+    @pytest_asyncio.fixture(autouse=True)
+    async def setup_tests(self, client: PostgresClientCounter) -> None:  # noqa: F811
+        async with client.start_session() as session:
+            await session.execute(
+                "create table if not exists pnorm__loader__tests (id int, name text)"
+            )
+            await session.execute("truncate pnorm__loader__tests")
+            await session.execute(
+                """
+                insert into pnorm__loader__tests (id, name)
+                values (1, 'alice'), (2, 'bob'), (3, 'carol'), (4, 'dan'), (4, 'dave')
+                """
+            )
+
+    @pytest.mark.asyncio
+    async def test_batches_concurrent_loads(self) -> None:
+        client = get_client()  # noqa: F811
+        hook = QueryRecorderHook()
+        users = client.loader(User, LOADER_QUERY, hooks=[hook])
+
+        res = await asyncio.gather(users.load(2), users.load(1), users.load(2))
+
+        assert res == [
+            User(id=2, name="bob"),
+            User(id=1, name="alice"),
+            User(id=2, name="bob"),
+        ]
+        assert hook.params == [{"ids": [2, 1]}]
+        assert client.check_connections() == 1
+
+    @pytest.mark.asyncio
+    async def test_separate_ticks(self) -> None:
+        client = get_client()  # noqa: F811
+        hook = QueryRecorderHook()
+        users = client.loader(User, LOADER_QUERY, hooks=[hook])
+
+        assert await users.load(1) == User(id=1, name="alice")
+        assert await users.load(2) == User(id=2, name="bob")
+        assert hook.params == [{"ids": [1]}, {"ids": [2]}]
+
+    @pytest.mark.asyncio
+    async def test_exactly_one_per_key(self) -> None:
+        client = get_client()  # noqa: F811
+        users = client.loader(dict, LOADER_QUERY)
+
+        found, missing, duplicate, default = await asyncio.gather(
+            users.load(3),
+            users.load(5),
+            users.load(4),
+            users.load(6, default={"id": 6, "name": "default"}),
+            return_exceptions=True,
+        )
+
+        assert found == {"id": 3, "name": "carol"}
+        assert isinstance(missing, NoRecordsReturnedException)
+        assert isinstance(duplicate, MultipleRecordsReturnedException)
+        assert default == {"id": 6, "name": "default"}
+
+    @pytest.mark.asyncio
+    async def test_max_batch_size(self) -> None:
+        client = get_client()  # noqa: F811
+        hook = QueryRecorderHook()
+        users = client.loader(User, LOADER_QUERY, max_batch_size=2, hooks=[hook])
+
+        res = await users.load_many([1, 2, 3])
+
+        assert [user.name for user in res] == ["alice", "bob", "carol"]
+        assert hook.params == [{"ids": [1, 2]}, {"ids": [3]}]
+
+    @pytest.mark.asyncio
+    async def test_custom_key(self) -> None:
+        client = get_client()  # noqa: F811
+        users = client.loader(
+            User,
+            "select * from pnorm__loader__tests where name = any(%(names)s)",
+            key_column="name",
+            param_name="names",
+        )
+
+        res = await users.load_many(["carol", "alice"])
+
+        assert [user.id for user in res] == [3, 1]
+
+    @pytest.mark.asyncio
+    async def test_query_error(self) -> None:
+        client = get_client()  # noqa: F811
+        users = client.loader(
+            User,
+            "select * from pnorm__loader__missing where id = any(%(ids)s)",
+        )
+
+        res = await asyncio.gather(
+            users.load(1),
+            users.load(2),
+            return_exceptions=True,
+        )
+
+        assert all(isinstance(e, psycopg.errors.UndefinedTable) for e in res)
+
+    @pytest.mark.asyncio
+    async def test_cancelled_load(self) -> None:
+        client = get_client()  # noqa: F811
+        users = client.loader(User, LOADER_QUERY)
+
+        cancelled = asyncio.create_task(users.load(1))
+        loaded = asyncio.create_task(users.load(1))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+
+        # The other caller of the same key still gets its record
+        assert await loaded == User(id=1, name="alice")
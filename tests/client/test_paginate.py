@@ -0,0 +1,199 @@
+import asyncio
+import time
+from contextlib import aclosing
+
+import pytest
+import pytest_asyncio
+from pydantic import BaseModel
+
+from tests.fixutres.client_counter import (
+    PostgresClientCounter,
+    client,  # noqa: F401
+    get_client,
+)
+from tests.utils.hooks import QueryRecorderHook
+
+pytest_plugins = ("pytest_asyncio",)
+
+
+class Row(BaseModel):
+    id: int
+    grp: int
+    name: str
+
+
+class TestPaginate:
+    @pytest_asyncio.fixture(autouse=True)
+    async def setup_tests(self, client: PostgresClientCounter) -> None:  # noqa: F811
+        async with client.start_session() as session:
+            await session.execute(
+                """
+                create table if not exists pnorm__paginate__tests (
+                    id int, grp int, name text
+                )
+                """
+            )
+            await session.execute("truncate pnorm__paginate__tests")
+            await session.execute(
+                """
+                insert into pnorm__paginate__tests (id, grp, name)
+                select i, i % 2, 'row ' || i from generate_series(1, 7) as i
+                """
+            )
+
+    @pytest.mark.asyncio
+    async def test_pages(self) -> None:
+        client = get_client()  # noqa: F811
+        hook = QueryRecorderHook()
+
+        pages = [
+            page
+            async for page in client.paginate(
+                Row,
+                "select * from pnorm__paginate__tests",
+                key_columns="id",
+                page_size=3,
+                hooks=[hook],
+            )
+        ]
+
+        assert [[row.id for row in page] for page in pages] == [
+            [1, 2, 3],
+            [4, 5, 6],
+            [7],
+        ]
+        assert pages[0][0] == Row(id=1, grp=1, name="row 1")
+        assert hook.queries[0].endswith(
+            'pnorm_page order by "id" asc limit %(pnorm_page_size)s'
+        )
+        assert 'pnorm_page where ("id") > (%(pnorm_after_0)s)' in hook.queries[1]
+
+    @pytest.mark.asyncio
+    async def test_exact_pages(self) -> None:
+        client = get_client()  # noqa: F811
+        hook = QueryRecorderHook()
+
+        pages = [
+            page
+            async for page in client.paginate(
+                dict,
+                "select id from pnorm__paginate__tests where id <= %(max_id)s",
+                {"max_id": 6},
+                key_columns="id",
+                page_size=3,
+                hooks=[hook],
+            )
+        ]
+
+        assert [[row["id"] for row in page] for page in pages] == [[1, 2, 3], [4, 5, 6]]
+        # The last full page needs one more query to know it was the last
+        assert len(hook.queries) == 3
+
+    @pytest.mark.asyncio
+    async def test_no_rows(self) -> None:
+        client = get_client()  # noqa: F811
+
+        pages = [
+            page
+            async for page in client.paginate(
+                dict,
+                "select * from pnorm__paginate__tests where false",
+                key_columns="id",
+            )
+        ]
+
+        assert pages == []
+
+    @pytest.mark.asyncio
+    async def test_several_key_columns_descending(self) -> None:
+        client = get_client()  # noqa: F811
+
+        pages = [
+            page
+            async for page in client.paginate(
+                Row,
+                "select * from pnorm__paginate__tests",
+                key_columns=["grp", "id"],
+                page_size=2,
+                descending=True,
+            )
+        ]
+
+        assert [[row.id for row in page] for page in pages] == [
+            [7, 5],
+            [3, 1],
+            [6, 4],
+            [2],
+        ]
+
+    @pytest.mark.asyncio
+    async def test_prefetch(self) -> None:
+        client = get_client()  # noqa: F811
+        query = "select *, pg_backend_pid() as pid from pnorm__paginate__tests"
+        slow_query = f"{query}, pg_sleep(0.1)"
+        pids = set()
+
+        async def consume(prefetch: bool) -> float:
+            start = time.perf_counter()
+
+            async for page in client.paginate(
+                dict,
+                slow_query,
+                key_columns="id",
+                page_size=3,
+                prefetch=prefetch,
+            ):
+                pids.update(row["pid"] for row in page)
+                await asyncio.sleep(0.1)
+
+            return time.perf_counter() - start
+
+        without_prefetch = await consume(False)
+
+        async with client.start_session() as session:
+            assert session.connection is not None
+            own_pid = session.connection.info.backend_pid
+            pids.clear()
+
+            with_prefetch = await consume(True)
+
+        # Pages were queried on their own connection, while the previous
+        # page was processed
+        assert own_pid not in pids
+        assert with_prefetch < without_prefetch - 0.1
+
+    @pytest.mark.asyncio
+    async def test_stop_early_with_prefetch(self) -> None:
+        client = get_client()  # noqa: F811
+
+        async with aclosing(
+            client.paginate(
+                dict,
+                "select * from pnorm__paginate__tests",
+                key_columns="id",
+                page_size=2,
+                prefetch=True,
+            )
+        ) as pages:
+            async for page in pages:
+                assert [row["id"] for row in page] == [1, 2]
+                break
+
+        assert client.check_connections() == 0
+
+    @pytest.mark.asyncio
+    async def test_invalid_arguments(self) -> None:
+        client = get_client()  # noqa: F811
+
+        with pytest.raises(ValueError):
+            async for _ in client.paginate(dict, "select 1", key_columns=[]):
+                ...
+
+        with pytest.raises(ValueError):
+            async for _ in client.paginate(
+                dict,
+                "select 1",
+                key_columns="id",
+                page_size=0,
+            ):
+                ...
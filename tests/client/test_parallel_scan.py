@@ -0,0 +1,188 @@
+import time
+from contextlib import aclosing
+
+import psycopg
+import pytest
+import pytest_asyncio
+from pydantic import BaseModel
+
+from tests.fixutres.client_counter import (
+    PostgresClientCounter,
+    client,  # noqa: F401
+    get_client,
+)
+from tests.utils.hooks import QueryRecorderHook
+
+pytest_plugins = ("pytest_asyncio",)
+
+
+class Row(BaseModel):
+    id: int | None
+    name: str
+
+
+class TestParallelScan:
+    @pytest_asyncio.fixture(autouse=True)
+    async def setup_tests(self, client: PostgresClientCounter) -> None:  # noqa: F811
+        async with client.start_session() as session:
+            await session.execute(
+                "create table if not exists pnorm__scan__tests (id int, name text)"
+            )
+            await session.execute("truncate pnorm__scan__tests")
+            await session.execute(
+                """
+                insert into pnorm__scan__tests (id, name)
+                select i, 'row ' || i from generate_series(1, 10) as i
+                union all
+                select null, 'no id'
+                """
+            )
+
+    @pytest.mark.asyncio
+    async def test_reads_every_row(self) -> None:
+        client = get_client()  # noqa: F811
+        hook = QueryRecorderHook()
+        rows = []
+
+        async for partition in client.parallel_scan(
+            Row,
+            "select * from pnorm__scan__tests",
+            partition_column="id",
+            partitions=3,
+            hooks=[hook],
+        ):
+            rows.extend(partition)
+
+        assert sorted(row.id or 0 for row in rows) == list(range(1, 11))
+        # The bounds query, then one query per partition
+        assert len(hook.params) == 4
+        assert sorted(
+            (params["pnorm_scan_lower"], params["pnorm_scan_upper"])
+            for params in hook.params[1:]
+            if isinstance(params, dict) and "pnorm_scan_lower" in params
+        ) == [(1, 5), (5, 9), (9, 11)]
+
+    @pytest.mark.asyncio
+    async def test_include_nulls(self) -> None:
+        client = get_client()  # noqa: F811
+        hook = QueryRecorderHook()
+        rows = []
+
+        async for partition in client.parallel_scan(
+            Row,
+            "select * from pnorm__scan__tests",
+            partition_column="id",
+            partitions=3,
+            include_nulls=True,
+            hooks=[hook],
+        ):
+            rows.extend(partition)
+
+        assert sorted(row.id or 0 for row in rows) == list(range(11))
+        # One more query for the rows where the column is null
+        assert len(hook.params) == 5
+
+    @pytest.mark.asyncio
+    async def test_with_params(self) -> None:
+        client = get_client()  # noqa: F811
+
+        partitions = [
+            partition
+            async for partition in client.parallel_scan(
+                dict,
+                "select id from pnorm__scan__tests where id <= %(max_id)s",
+                {"max_id": 4},
+                partition_column="id",
+                partitions=8,
+            )
+        ]
+
+        assert sorted(row["id"] for rows in partitions for row in rows) == [1, 2, 3, 4]
+        # Ranges without rows are not yielded
+        assert all(len(rows) > 0 for rows in partitions)
+
+    @pytest.mark.asyncio
+    async def test_no_rows(self) -> None:
+        client = get_client()  # noqa: F811
+
+        partitions = [
+            partition
+            async for partition in client.parallel_scan(
+                dict,
+                "select * from pnorm__scan__tests where false",
+                partition_column="id",
+            )
+        ]
+
+        assert partitions == []
+
+    @pytest.mark.asyncio
+    async def test_runs_concurrently(self) -> None:
+        client = get_client()  # noqa: F811
+        query = "select * from pnorm__scan__tests, pg_sleep(0.2) where id is not null"
+
+        start = time.perf_counter()
+        async for _ in client.parallel_scan(
+            dict, query, partition_column="id", partitions=3
+        ):
+            ...
+        assert time.perf_counter() - start < 0.6
+
+        start = time.perf_counter()
+        async for _ in client.parallel_scan(
+            dict, query, partition_column="id", partitions=3, max_concurrency=1
+        ):
+            ...
+        assert time.perf_counter() - start >= 0.8
+
+    @pytest.mark.asyncio
+    async def test_stop_early(self) -> None:
+        client = get_client()  # noqa: F811
+
+        async with aclosing(
+            client.parallel_scan(
+                dict,
+                "select * from pnorm__scan__tests",
+                partition_column="id",
+                partitions=10,
+                max_concurrency=2,
+            )
+        ) as scan:
+            async for _ in scan:
+                break
+
+        # The partitions still running were cancelled and their connections
+        # closed
+        res = await client.get(
+            dict,
+            """
+            select count(*) as running
+            from pg_stat_activity
+            where query like '%%pnorm_scan where%%' and pid != pg_backend_pid()
+            """,
+        )
+        assert res["running"] == 0
+
+    @pytest.mark.asyncio
+    async def test_partition_failure(self) -> None:
+        client = get_client()  # noqa: F811
+
+        with pytest.raises(psycopg.errors.DivisionByZero):
+            async for _ in client.parallel_scan(
+                dict,
+                "select 1 / (id - 5) as value, id from pnorm__scan__tests",
+                partition_column="id",
+            ):
+                ...
+
+    @pytest.mark.asyncio
+    async def test_not_integer_column(self) -> None:
+        client = get_client()  # noqa: F811
+
+        with pytest.raises(ValueError):
+            async for _ in client.parallel_scan(
+                dict,
+                "select * from pnorm__scan__tests",
+                partition_column="name",
+            ):
+                ...
@@ -0,0 +1,324 @@
+import asyncio
+import time
+from typing import Optional
+
+import psycopg
+import pytest
+import pytest_asyncio
+
+from pnorm import AsyncPostgresClient, HedgePolicy
+from pnorm.hooks.base import BaseHook, HookContext, QueryPhase
+from pnorm.hooks.opentelemetry import OpenTelemetryHook
+from pnorm.pnorm_types import ReplicaSelection
+from pnorm.replicas import ReplicaSet, last_write_lsn
+from tests.fixutres.client_counter import PostgresClientCounter, get_creds
+from tests.utils.queries import wait_for_running
+from tests.utils.telemetry import get_metric_points
+
+pytest_plugins = ("pytest_asyncio",)
+
+# Databases on the test server standing in for replicas, so the database a
+# query ran on shows where it was routed
+REPLICA_DATABASES = ("pnorm__replica_1", "pnorm__replica_2")
+
+
+def get_replica_client(
+    replica_selection: ReplicaSelection = "round_robin",
+    read_your_writes: bool = False,
+    hedge_policy: Optional[HedgePolicy] = None,
+) -> PostgresClientCounter:
+    replicas = []
+
+    for dbname in REPLICA_DATABASES:
+        credentials = get_creds()
+        credentials.dbname = dbname
+        replicas.append(credentials)
+
+    return PostgresClientCounter(
+        get_creds(),
+        replicas=replicas,
+        replica_selection=replica_selection,
+        read_your_writes=read_your_writes,
+        hedge_policy=hedge_policy,
+    )
+
+
+class HedgeRecorderHook(BaseHook[None]):
+    def __init__(self) -> None:
+        self.hedges: list[tuple[float, bool]] = []
+
+    def on_hedge(self, context: HookContext, delay: float, won: bool) -> None:
+        self.hedges.append((delay, won))
+
+
+class PhaseRecorderHook(BaseHook[None]):
+    def __init__(self) -> None:
+        self.phases: list[QueryPhase] = []
+        self.contexts: list[HookContext] = []
+
+    def pre_query(self, context: HookContext) -> None:
+        self.contexts.append(context)
+
+    def on_phase(
+        self,
+        context: HookContext,
+        state: None,
+        phase: QueryPhase,
+        timestamp: float,
+    ) -> None:
+        self.phases.append(phase)
+
+
+async def wait_for_cancelled_hedges(client: AsyncPostgresClient) -> None:
+    await asyncio.gather(*client._background_tasks, return_exceptions=True)
+
+
+async def current_database(client: AsyncPostgresClient) -> str:
+    result = await client.get(dict, "select current_database() as dbname")
+    return result["dbname"]
+
+
+@pytest_asyncio.fixture(autouse=True, scope="module")
+async def setup_databases() -> None:
+    connection = await psycopg.AsyncConnection.connect(
+        **get_creds().as_dict(),
+        autocommit=True,
+    )
+
+    async with connection:
+        for dbname in REPLICA_DATABASES:
+            cursor = await connection.execute(
+                "select 1 from pg_database where datname = %(dbname)s",
+                {"dbname": dbname},
+            )
+
+            if await cursor.fetchone() is None:
+                await connection.execute(f"create database {dbname}")
+
+
+class TestReplicas:
+    @pytest.mark.asyncio
+    async def test_round_robin(self) -> None:
+        client = get_replica_client()
+
+        databases = [await current_database(client) for _ in range(4)]
+
+        assert databases == [*REPLICA_DATABASES, *REPLICA_DATABASES]
+        # Replica connections aren't kept outside of a session
+        assert client.check_connections() == 0
+
+    @pytest.mark.asyncio
+    async def test_session_keeps_replica(self) -> None:
+        client = get_replica_client()
+
+        async with client.start_session() as session:
+            databases = {await current_database(session) for _ in range(3)}
+            assert session.replica_connection is not None
+
+        assert len(databases) == 1
+        assert databases.pop() in REPLICA_DATABASES
+        assert client.replica_connection is None
+        assert client.check_connections() == 1
+
+    @pytest.mark.asyncio
+    async def test_writes_and_transactions_use_primary(self) -> None:
+        client = get_replica_client()
+
+        async with client.start_session() as session:
+            await session.execute(
+                "create temporary table pnorm__replicas__tests (value int)"
+            )
+
+            async with session.start_transaction() as tx:
+                assert await current_database(tx) == "postgres"
+
+                # The temporary table only exists on the primary connection
+                res = await tx.get(
+                    dict,
+                    "select count(*) as count from pnorm__replicas__tests",
+                )
+                assert res == {"count": 0}
+
+    @pytest.mark.asyncio
+    async def test_least_loaded(self) -> None:
+        client = get_replica_client("least_loaded")
+
+        databases = await asyncio.gather(
+            *[
+                client.get(
+                    dict,
+                    "select current_database() as dbname from pg_sleep(0.1)",
+                )
+                for _ in range(2)
+            ]
+        )
+
+        # Both were running at the same time so went to different replicas
+        assert {result["dbname"] for result in databases} == set(REPLICA_DATABASES)
+
+    def test_least_loaded_choice(self) -> None:
+        replicas = ReplicaSet(
+            [get_creds(), get_creds(), get_creds()],
+            "least_loaded",
+        )
+        replicas.replicas[0].in_flight = 1
+        replicas.replicas[1].latency = 0.5
+
+        assert replicas.choose() is replicas.replicas[2]
+
+    def test_invalid_selection(self) -> None:
+        with pytest.raises(ValueError):
+            ReplicaSet([get_creds()], "random")  # type: ignore
+
+    @pytest.mark.asyncio
+    async def test_read_your_writes(self) -> None:
+        client = get_replica_client(read_your_writes=True)
+
+        assert last_write_lsn() is None
+        await client.execute("select 1")
+        lsn = last_write_lsn()
+        assert lsn is not None
+
+        async with client.start_session() as session:
+            async with session.start_transaction() as tx:
+                await tx.execute("select 1")
+
+            # Replica is not a standby so has every write
+            assert await current_database(session) in REPLICA_DATABASES
+
+        assert last_write_lsn() is not None
+
+
+# Slow on the first replica only
+SLOW_ON_FIRST_REPLICA = """
+select current_database() as dbname
+from pg_sleep(case when current_database() = 'pnorm__replica_1' then 2 else 0 end)
+"""
+
+
+class TestHedgedReads:
+    @pytest.mark.asyncio
+    async def test_hedge_wins(self) -> None:
+        client = get_replica_client(hedge_policy=HedgePolicy(delay=0.05))
+        hook = HedgeRecorderHook()
+        marker = "pnorm__hedge__tests_wins"
+
+        start = time.perf_counter()
+        res = await client.get(
+            dict,
+            f"{SLOW_ON_FIRST_REPLICA} -- {marker}",
+            hooks=[hook],
+        )
+
+        assert time.perf_counter() - start < 1
+        assert res == {"dbname": "pnorm__replica_2"}
+        assert hook.hedges == [(0.05, True)]
+
+        # The slow query was cancelled on the server
+        await wait_for_running(marker, 0)
+        await wait_for_cancelled_hedges(client)
+
+    @pytest.mark.asyncio
+    async def test_no_hedge_when_fast(self) -> None:
+        client = get_replica_client(hedge_policy=HedgePolicy(delay=1))
+        hook = HedgeRecorderHook()
+
+        res = await client.select(dict, "select 1 as value", hooks=[hook])
+
+        assert res == ({"value": 1},)
+        assert hook.hedges == []
+
+    @pytest.mark.asyncio
+    async def test_hedge_in_session(self) -> None:
+        client = get_replica_client(hedge_policy=HedgePolicy(delay=0.05))
+
+        async with client.start_session() as session:
+            res = await session.get(dict, SLOW_ON_FIRST_REPLICA)
+            assert res == {"dbname": "pnorm__replica_2"}
+
+            # The session's connection is still usable
+            assert await session.get(dict, "select 1 as value") == {"value": 1}
+
+        await wait_for_cancelled_hedges(client)
+
+        assert client.check_connections() == 1
+
+    @pytest.mark.asyncio
+    async def test_session_reads_use_session_replica(self) -> None:
+        client = get_replica_client(hedge_policy=HedgePolicy(delay=1))
+
+        async with client.start_session() as session:
+            pids = {
+                (await session.get(dict, "select pg_backend_pid() as pid"))["pid"]
+                for _ in range(3)
+            }
+            assert session.replica_connection is not None
+            assert pids == {session.replica_connection.info.backend_pid}
+
+    @pytest.mark.asyncio
+    async def test_records_hedge_metric(self) -> None:
+        client = get_replica_client(hedge_policy=HedgePolicy(delay=0.05))
+        query = f"{SLOW_ON_FIRST_REPLICA} -- hedge metric"
+
+        await client.get(dict, query, hooks=[OpenTelemetryHook()])
+        await wait_for_cancelled_hedges(client)
+
+        points = [
+            point
+            for point in get_metric_points("database_requests_hedges")
+            if point.attributes["db.query.hedge.won"]
+        ]
+        assert sum(point.value for point in points) >= 1
+
+    @pytest.mark.asyncio
+    async def test_hedge_keeps_first_query_phases(self) -> None:
+        client = get_replica_client(hedge_policy=HedgePolicy(delay=0.05))
+        hook = PhaseRecorderHook()
+
+        # The first query answers before the hedge sent after 0.05s
+        res = await client.get(
+            dict,
+            """
+            select current_database() as dbname
+            from pg_sleep(
+                case when current_database() = 'pnorm__replica_1' then 0.3 else 2 end
+            )
+            """,
+            hooks=[hook],
+        )
+        await wait_for_cancelled_hedges(client)
+
+        assert res == {"dbname": "pnorm__replica_1"}
+        assert hook.phases == [
+            "connection_acquired",
+            "execute_sent",
+            "result_received",
+            "fetch_complete",
+            "marshal_complete",
+        ]
+        # Not shortened by the hedge's later timestamps
+        (context,) = hook.contexts
+        assert context.phase_duration("result_received") >= 0.3
+
+    def test_percentile_delay(self) -> None:
+        replicas = ReplicaSet([get_creds(), get_creds()], "round_robin")
+        policy = HedgePolicy(percentile=0.95, min_samples=10, max_delay=0.5)
+
+        # Not enough reads measured yet
+        assert replicas.hedge_delay(policy) == 0.5
+
+        replicas.latencies.extend(i / 100 for i in range(1, 101))
+        # Capped at max_delay
+        assert replicas.hedge_delay(policy) == pytest.approx(0.5)
+
+        replicas.latencies.clear()
+        replicas.latencies.extend(i / 1000 for i in range(1, 101))
+        assert replicas.hedge_delay(policy) == pytest.approx(0.095)
+
+    def test_requires_two_replicas(self) -> None:
+        with pytest.raises(ValueError):
+            PostgresClientCounter(
+                get_creds(),
+                replicas=[get_creds()],
+                hedge_policy=HedgePolicy(),
+            )
@@ -0,0 +1,146 @@
+import asyncio
+
+import psycopg
+import pytest
+
+from pnorm import RetryPolicy
+from tests.fixutres.client_counter import (
+    PostgresClientCounter,
+    get_client,
+    get_creds,
+)
+from tests.utils.hooks import RetryRecorderHook
+from tests.utils.queries import wait_for_running
+
+pytest_plugins = ("pytest_asyncio",)
+
+
+def get_retry_client(
+    retry_policy: RetryPolicy = RetryPolicy(backoff=0.01),
+) -> PostgresClientCounter:
+    return PostgresClientCounter(get_creds(), retry_policy=retry_policy)
+
+
+async def terminate_backend(pid: int) -> None:
+    await get_client().execute(
+        "select pg_terminate_backend(%(pid)s)",
+        {"pid": pid},
+    )
+
+
+async def terminate_query(marker: str) -> None:
+    await wait_for_running(marker, 1)
+    await get_client().execute(
+        """
+        select pg_terminate_backend(pid) from pg_stat_activity
+        where query like %(marker)s and pid != pg_backend_pid()
+        """,
+        {"marker": f"%{marker}%"},
+    )
+
+
+class TestReadRetries:
+    @pytest.mark.asyncio
+    async def test_session_reconnects(self) -> None:
+        client = get_retry_client()
+        hook = RetryRecorderHook()
+
+        async with client.start_session(schema="public") as session:
+            assert session.connection is not None
+            await terminate_backend(session.connection.info.backend_pid)
+
+            res = await session.get(dict, "select 1 as value", hooks=[hook])
+
+            assert res == {"value": 1}
+            assert [
+                (operation, attempt) for _, operation, attempt, _, _ in hook.retries
+            ] == [("query", 1)]
+            assert hook.retries[0][0] is not None
+            assert hook.retries[0][0].query == "select 1 as value"
+            assert hook.exceptions == []
+
+            # The schema is set again on the new connection
+            res = await session.get(dict, "select current_schema() as schema")
+            assert res == {"schema": "public"}
+
+        assert client.check_connections() == 2
+
+    @pytest.mark.asyncio
+    async def test_retries_lost_query(self) -> None:
+        client = get_retry_client()
+        marker = "pnorm__retry__tests_lost"
+
+        terminate = asyncio.create_task(terminate_query(marker))
+        res = await client.select(
+            dict,
+            f"select 1 as value from pg_sleep(0.3) -- {marker}",
+        )
+        await terminate
+
+        assert res == ({"value": 1},)
+        assert client.check_connections() == 2
+
+    @pytest.mark.asyncio
+    async def test_no_retry_policy(self) -> None:
+        client = get_client()
+
+        async with client.start_session() as session:
+            assert session.connection is not None
+            await terminate_backend(session.connection.info.backend_pid)
+
+            with pytest.raises(psycopg.OperationalError):
+                await session.get(dict, "select 1 as value")
+
+    @pytest.mark.asyncio
+    async def test_writes_not_retried(self) -> None:
+        client = get_retry_client()
+        hook = RetryRecorderHook()
+
+        async with client.start_session() as session:
+            assert session.connection is not None
+            await terminate_backend(session.connection.info.backend_pid)
+
+            with pytest.raises(psycopg.OperationalError):
+                await session.execute("select 1", hooks=[hook])
+
+        assert hook.retries == []
+
+    @pytest.mark.asyncio
+    async def test_transactions_not_retried(self) -> None:
+        client = get_retry_client()
+
+        async with client.start_session() as session:
+            with pytest.raises(psycopg.OperationalError):
+                async with session.start_transaction() as tx:
+                    await tx.get(dict, "select 1 as value")
+
+                    assert tx.connection is not None
+                    await terminate_backend(tx.connection.info.backend_pid)
+
+                    await tx.get(dict, "select 1 as value")
+
+    @pytest.mark.asyncio
+    async def test_sql_errors_not_retried(self) -> None:
+        client = get_retry_client()
+        hook = RetryRecorderHook()
+
+        with pytest.raises(psycopg.errors.UndefinedTable):
+            await client.get(dict, "select * from pnorm__retry__missing", hooks=[hook])
+
+        assert hook.retries == []
+
+    @pytest.mark.asyncio
+    async def test_retries_exhausted(self) -> None:
+        credentials = get_creds()
+        credentials.port = 1
+        client = PostgresClientCounter(
+            credentials,
+            retry_policy=RetryPolicy(retries=2, backoff=0.01),
+        )
+        hook = RetryRecorderHook()
+
+        with pytest.raises(psycopg.OperationalError):
+            await client.get(dict, "select 1 as value", hooks=[hook])
+
+        assert [attempt for _, _, attempt, _, _ in hook.retries] == [1, 2]
+        assert len(hook.exceptions) == 1
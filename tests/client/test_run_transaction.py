@@ -0,0 +1,186 @@
+from typing import Any
+
+import psycopg
+import pytest
+import pytest_asyncio
+
+from pnorm import AsyncPostgresClient
+from pnorm.hooks.opentelemetry import OpenTelemetryHook
+from tests.fixutres.client_counter import (
+    PostgresClientCounter,
+    client,  # noqa: F401
+    get_client,
+)
+from tests.utils.hooks import RetryRecorderHook
+from tests.utils.telemetry import get_metric_points
+
+pytest_plugins = ("pytest_asyncio",)
+
+SERIALIZATION_FAILURE = """
+do $$ begin
+    raise exception 'could not serialize access' using errcode = 'serialization_failure';
+end $$
+"""
+
+
+def transaction_retries() -> int:
+    return sum(
+        point.value
+        for point in get_metric_points("database_requests_retries")
+        if point.attributes["db.operation.retry.kind"] == "transaction"
+        and point.attributes["error.type"] == "SerializationFailure"
+    )
+
+
+class TestRunTransaction:
+    @pytest_asyncio.fixture(autouse=True)
+    async def setup_tests(self, client: PostgresClientCounter) -> None:  # noqa: F811
+        async with client.start_session() as session:
+            await session.execute(
+                "create table if not exists pnorm__run_transaction__tests (user_id int unique, name text)"
+            )
+            await session.execute("delete from pnorm__run_transaction__tests")
+
+    @pytest.mark.asyncio
+    async def test_run_transaction(self) -> None:
+        client = get_client()  # noqa: F811
+
+        async def insert(tx: AsyncPostgresClient) -> int:
+            await tx.execute(
+                "insert into pnorm__run_transaction__tests (user_id, name) values (1, 'test')"
+            )
+            return 1
+
+        assert await client.run_transaction(insert) == 1
+
+        res = await client.select(dict, "select * from pnorm__run_transaction__tests")
+        assert res == ({"user_id": 1, "name": "test"},)
+        assert client.check_connections() == 2
+
+    @pytest.mark.asyncio
+    async def test_retries_serialization_failure(
+        self,
+        client: PostgresClientCounter,  # noqa: F811
+    ) -> None:
+        hook = RetryRecorderHook()
+        attempts = 0
+
+        async def insert(tx: AsyncPostgresClient) -> None:
+            nonlocal attempts
+            attempts += 1
+
+            await tx.execute(
+                "insert into pnorm__run_transaction__tests (user_id, name) values (%(user_id)s, 'test')",
+                {"user_id": attempts},
+            )
+
+            if attempts < 3:
+                await tx.execute(SERIALIZATION_FAILURE)
+
+        await client.run_transaction(insert, backoff=0.01, hooks=[hook])
+
+        assert attempts == 3
+        assert [
+            (context, operation, attempt)
+            for context, operation, attempt, _, _ in hook.retries
+        ] == [
+            (None, "transaction", 1),
+            (None, "transaction", 2),
+        ]
+        assert all(
+            isinstance(exception, psycopg.errors.SerializationFailure)
+            for _, _, _, exception, _ in hook.retries
+        )
+        assert all(0 <= delay <= 0.02 for _, _, _, _, delay in hook.retries)
+
+        # Failed attempts were rolled back
+        res = await client.select(dict, "select * from pnorm__run_transaction__tests")
+        assert res == ({"user_id": 3, "name": "test"},)
+
+    @pytest.mark.asyncio
+    async def test_retries_exhausted(
+        self,
+        client: PostgresClientCounter,  # noqa: F811
+    ) -> None:
+        attempts = 0
+
+        async def fail(tx: AsyncPostgresClient) -> None:
+            nonlocal attempts
+            attempts += 1
+            await tx.execute(SERIALIZATION_FAILURE)
+
+        with pytest.raises(psycopg.errors.SerializationFailure):
+            await client.run_transaction(fail, retries=2, backoff=0.01)
+
+        assert attempts == 3
+
+    @pytest.mark.asyncio
+    async def test_other_errors_not_retried(
+        self,
+        client: PostgresClientCounter,  # noqa: F811
+    ) -> None:
+        hook = RetryRecorderHook()
+        attempts = 0
+
+        async def fail(tx: AsyncPostgresClient) -> None:
+            nonlocal attempts
+            attempts += 1
+            await tx.execute("select * from pnorm__run_transaction__missing")
+
+        with pytest.raises(psycopg.errors.UndefinedTable):
+            await client.run_transaction(fail, hooks=[hook])
+
+        assert attempts == 1
+        assert hook.retries == []
+
+    @pytest.mark.asyncio
+    async def test_records_retry_metric(
+        self,
+        client: PostgresClientCounter,  # noqa: F811
+    ) -> None:
+        retries_before = transaction_retries()
+        attempts = 0
+
+        async def fail_once(tx: AsyncPostgresClient) -> Any:
+            nonlocal attempts
+            attempts += 1
+
+            if attempts == 1:
+                await tx.execute(SERIALIZATION_FAILURE)
+
+        await client.run_transaction(
+            fail_once,
+            backoff=0.01,
+            hooks=[OpenTelemetryHook()],
+        )
+
+        assert transaction_retries() == retries_before + 1
+
+    @pytest.mark.asyncio
+    async def test_in_transaction(self) -> None:
+        client = get_client()  # noqa: F811
+
+        async def insert(tx: AsyncPostgresClient) -> None:
+            await tx.execute(
+                "insert into pnorm__run_transaction__tests (user_id, name) values (2, 'inner')"
+            )
+
+        async with client.start_session() as session:
+            async with session.start_transaction() as tx:
+                await tx.execute(
+                    "insert into pnorm__run_transaction__tests (user_id, name) values (1, 'outer')"
+                )
+
+                with pytest.raises(RuntimeError):
+                    await tx.run_transaction(insert)
+
+                # The outer transaction is still open
+                res = await tx.select(
+                    dict, "select user_id from pnorm__run_transaction__tests"
+                )
+                assert res == ({"user_id": 1},)
+
+        res = await client.select(
+            dict, "select user_id from pnorm__run_transaction__tests"
+        )
+        assert res == ({"user_id": 1},)
@@ -0,0 +1,192 @@
+import asyncio
+import time
+
+import psycopg
+import pytest
+import pytest_asyncio
+
+from pnorm import AsyncPostgresClient, ShardedPostgresClient
+from pnorm.sharded_client import hash_shard_key
+from tests.fixutres.client_counter import get_creds
+
+pytest_plugins = ("pytest_asyncio",)
+
+# Databases on the test server standing in for shards
+SHARD_DATABASES = ("pnorm__shard_1", "pnorm__shard_2")
+
+
+def get_sharded_client(pool_size: int = 5) -> ShardedPostgresClient:
+    shards = []
+
+    for dbname in SHARD_DATABASES:
+        credentials = get_creds()
+        credentials.dbname = dbname
+        shards.append(credentials)
+
+    # Integer keys are placed on the shard at their index
+    return ShardedPostgresClient(shards, hash_function=int, pool_size=pool_size)
+
+
+async def backend_pid(
+    client: AsyncPostgresClient | ShardedPostgresClient, **kwargs
+) -> int:
+    result = await client.get(dict, "select pg_backend_pid() as pid", **kwargs)
+    return result["pid"]
+
+
+@pytest_asyncio.fixture(autouse=True, scope="module")
+async def setup_databases() -> None:
+    connection = await psycopg.AsyncConnection.connect(
+        **get_creds().as_dict(),
+        autocommit=True,
+    )
+
+    async with connection:
+        for dbname in SHARD_DATABASES:
+            cursor = await connection.execute(
+                "select 1 from pg_database where datname = %(dbname)s",
+                {"dbname": dbname},
+            )
+
+            if await cursor.fetchone() is None:
+                await connection.execute(f"create database {dbname}")
+
+    for dbname in SHARD_DATABASES:
+        credentials = get_creds()
+        credentials.dbname = dbname
+        connection = await psycopg.AsyncConnection.connect(
+            **credentials.as_dict(),
+            autocommit=True,
+        )
+
+        async with connection:
+            await connection.execute(
+                "create table if not exists pnorm__sharded__tests (tenant_id int, name text)"
+            )
+
+
+class TestShardedClient:
+    @pytest.mark.asyncio
+    async def test_routes_by_shard_key(self) -> None:
+        client = get_sharded_client()
+
+        for shard_key, dbname in enumerate(SHARD_DATABASES):
+            res = await client.get(
+                dict,
+                "select current_database() as dbname",
+                shard_key=shard_key,
+            )
+            assert res == {"dbname": dbname}
+
+        await client.close()
+
+    @pytest.mark.asyncio
+    async def test_writes_stay_on_shard(self) -> None:
+        client = get_sharded_client()
+        await client.execute(
+            "insert into pnorm__sharded__tests (tenant_id, name) values (%(tenant_id)s, 'routed')",
+            {"tenant_id": 3},
+            shard_key=3,
+        )
+
+        query = "select * from pnorm__sharded__tests where tenant_id = 3 and name = 'routed'"
+        assert len(await client.select(dict, query, shard_key=1)) >= 1
+        assert await client.find(dict, query, shard_key=0) is None
+
+        await client.close()
+
+    @pytest.mark.asyncio
+    async def test_reuses_connections(self) -> None:
+        client = get_sharded_client()
+
+        pid = await backend_pid(client, shard_key=0)
+        assert await backend_pid(client, shard_key=0) == pid
+        assert await backend_pid(client, shard_key=1) != pid
+
+        await client.close()
+        assert all(len(shard.idle) == 0 for shard in client.shards)
+
+    @pytest.mark.asyncio
+    async def test_pool_size(self) -> None:
+        client = get_sharded_client(pool_size=1)
+
+        start = time.perf_counter()
+        await asyncio.gather(
+            *[client.execute("select pg_sleep(0.1)", shard_key=0) for _ in range(3)]
+        )
+
+        # Queries waited for the only connection in turn
+        assert time.perf_counter() - start >= 0.3
+        assert len(client.shards[0].idle) == 1
+
+        await client.close()
+
+    @pytest.mark.asyncio
+    async def test_transaction(self) -> None:
+        client = get_sharded_client()
+
+        with pytest.raises(ValueError):
+            async with client.start_transaction(shard_key=0) as tx:
+                await tx.execute(
+                    "insert into pnorm__sharded__tests (tenant_id, name) values (0, 'rolled back')"
+                )
+                raise ValueError()
+
+        res = await client.find(
+            dict,
+            "select * from pnorm__sharded__tests where name = 'rolled back'",
+            shard_key=0,
+        )
+        assert res is None
+
+        # The connection went back to the pool after the rollback
+        assert len(client.shards[0].idle) == 1
+
+        async def count(tx: AsyncPostgresClient) -> int:
+            res = await tx.get(
+                dict, "select count(*) as count from pnorm__sharded__tests"
+            )
+            return res["count"]
+
+        assert await client.run_transaction(count, shard_key=0) >= 0
+
+        await client.close()
+
+    @pytest.mark.asyncio
+    async def test_session_schema_not_pooled(self) -> None:
+        client = get_sharded_client()
+
+        async with client.start_session(shard_key=0, schema="public") as session:
+            pid = await backend_pid(session)
+
+        # The connection with the schema set was closed
+        assert len(client.shards[0].idle) == 0
+        assert await backend_pid(client, shard_key=0) != pid
+
+        await client.close()
+
+    def test_hash_shard_key(self) -> None:
+        assert hash_shard_key("tenant") == hash_shard_key("tenant")
+        assert hash_shard_key("tenant") != hash_shard_key("other tenant")
+        assert hash_shard_key(b"1") == hash_shard_key(1)
+
+    def test_requires_shards(self) -> None:
+        with pytest.raises(ValueError):
+            ShardedPostgresClient([])
+
+    @pytest.mark.asyncio
+    async def test_gather_select(self) -> None:
+        client = get_sharded_client()
+
+        res = await client.gather_select(
+            dict,
+            "select current_database() as dbname",
+            order_by="dbname",
+            descending=True,
+        )
+
+        assert [row["dbname"] for row in res] == list(reversed(SHARD_DATABASES))
+        # The connections went back to each shard's pool
+        assert all(len(shard.idle) == 1 for shard in client.shards)
+
+        await client.close()
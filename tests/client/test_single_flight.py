@@ -0,0 +1,168 @@
+import asyncio
+
+import psycopg
+import pytest
+import pytest_asyncio
+
+from pnorm import DeadlineExceededException, deadline
+from pnorm.hooks.base import HookContext
+from tests.fixutres.client_counter import (
+    PostgresClientCounter,
+    client,  # noqa: F401
+    get_creds,
+)
+from tests.utils.hooks import ExceptionRecorderHook
+
+pytest_plugins = ("pytest_asyncio",)
+
+# Every time the query runs on the server it returns a new value
+COUNTER_QUERY = "select nextval('pnorm__single_flight__counter') as value"
+SLOW_COUNTER_QUERY = f"{COUNTER_QUERY} from pg_sleep(0.2)"
+
+
+def get_single_flight_client() -> PostgresClientCounter:
+    return PostgresClientCounter(get_creds(), single_flight=True)
+
+
+class TestSingleFlight:
+    @pytest_asyncio.fixture(autouse=True)
+    async def setup_tests(self, client: PostgresClientCounter) -> None:  # noqa: F811
+        await client.execute(
+            "create sequence if not exists pnorm__single_flight__counter"
+        )
+
+    @pytest.mark.asyncio
+    async def test_shares_identical_reads(self) -> None:
+        client = get_single_flight_client()  # noqa: F811
+
+        gets = [client.get(dict, SLOW_COUNTER_QUERY) for _ in range(5)]
+        selects = [client.select(dict, SLOW_COUNTER_QUERY) for _ in range(5)]
+        res = await asyncio.gather(*gets)
+        selected = await asyncio.gather(*selects)
+
+        assert len({row["value"] for row in res}) == 1
+        assert len({rows[0]["value"] for rows in selected}) == 1
+        assert client.check_connections() == 2
+        assert client._flights == {}
+
+    @pytest.mark.asyncio
+    async def test_reads_after_completion_run_again(self) -> None:
+        client = get_single_flight_client()  # noqa: F811
+
+        first = await client.get(dict, COUNTER_QUERY)
+        second = await client.get(dict, COUNTER_QUERY)
+
+        assert second["value"] > first["value"]
+
+    @pytest.mark.asyncio
+    async def test_different_operations_not_shared(self) -> None:
+        client = get_single_flight_client()  # noqa: F811
+
+        async with client.start_session() as session:
+            row, rows = await asyncio.gather(
+                session.get(dict, SLOW_COUNTER_QUERY),
+                session.select(dict, SLOW_COUNTER_QUERY),
+            )
+
+        assert row["value"] != rows[0]["value"]
+
+    @pytest.mark.asyncio
+    async def test_shares_errors(self) -> None:
+        client = get_single_flight_client()  # noqa: F811
+        hook = ExceptionRecorderHook()
+        query = "select * from pnorm__single_flight__missing, pg_sleep(0.1)"
+
+        res = await asyncio.gather(
+            *[client.get(dict, query, hooks=[hook]) for _ in range(3)],
+            return_exceptions=True,
+        )
+
+        assert all(isinstance(e, psycopg.errors.UndefinedTable) for e in res)
+        # Every caller's hooks see the exception
+        assert len(hook.exceptions) == 3
+
+    @pytest.mark.asyncio
+    async def test_waiting_read_takes_over_cancelled_read(self) -> None:
+        client = get_single_flight_client()  # noqa: F811
+
+        first = asyncio.create_task(client.get(dict, SLOW_COUNTER_QUERY))
+        await asyncio.sleep(0.05)
+        second = asyncio.create_task(client.get(dict, SLOW_COUNTER_QUERY))
+        await asyncio.sleep(0.05)
+        first.cancel()
+
+        res = await second
+
+        assert "value" in res
+        assert first.cancelled()
+        assert client.check_connections() == 2
+
+    @pytest.mark.asyncio
+    async def test_cancelled_waiting_read(self) -> None:
+        client = get_single_flight_client()  # noqa: F811
+
+        first = asyncio.create_task(client.get(dict, SLOW_COUNTER_QUERY))
+        await asyncio.sleep(0.05)
+        second = asyncio.create_task(client.get(dict, SLOW_COUNTER_QUERY))
+        await asyncio.sleep(0.05)
+        second.cancel()
+
+        # The shared read keeps running for the others
+        assert "value" in await first
+        assert second.cancelled()
+
+    @pytest.mark.asyncio
+    async def test_waiting_read_timeout(self) -> None:
+        client = get_single_flight_client()  # noqa: F811
+
+        first = asyncio.create_task(client.get(dict, SLOW_COUNTER_QUERY))
+        await asyncio.sleep(0.05)
+
+        with pytest.raises(TimeoutError):
+            await client.get(dict, SLOW_COUNTER_QUERY, timeout=0.01)
+
+        assert "value" in await first
+
+    @pytest.mark.asyncio
+    async def test_not_shared_in_transaction(self) -> None:
+        client = get_single_flight_client()  # noqa: F811
+
+        async with client.start_session() as session:
+            async with session.start_transaction() as tx:
+                assert tx._get_flight_key(HookContext(COUNTER_QUERY), "get") is None
+
+            assert (
+                session._get_flight_key(HookContext(COUNTER_QUERY), "get") is not None
+            )
+
+    @pytest.mark.asyncio
+    async def test_leader_deadline_not_shared(self) -> None:
+        client = get_single_flight_client()  # noqa: F811
+
+        with deadline(0.1):
+            first = asyncio.create_task(client.get(dict, SLOW_COUNTER_QUERY))
+
+        await asyncio.sleep(0.05)
+        # No deadline of its own, it runs the read again once the first one
+        # runs out of time
+        second = asyncio.create_task(client.get(dict, SLOW_COUNTER_QUERY))
+
+        with pytest.raises(DeadlineExceededException):
+            await first
+
+        assert "value" in await second
+
+    @pytest.mark.asyncio
+    async def test_leader_timeout_not_shared(self) -> None:
+        client = get_single_flight_client()  # noqa: F811
+
+        first = asyncio.create_task(
+            client.get(dict, SLOW_COUNTER_QUERY, timeout=0.1),
+        )
+        await asyncio.sleep(0.05)
+        second = asyncio.create_task(client.get(dict, SLOW_COUNTER_QUERY))
+
+        with pytest.raises(TimeoutError):
+            await first
+
+        assert "value" in await second
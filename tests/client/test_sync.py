@@ -1,6 +1,10 @@
+import asyncio
+
+import pytest
 import pytest_asyncio
 
 from pnorm import PostgresClient
+from pnorm.async_cursor import SingleCommitCursor
 from tests.fixutres.client_counter import (
     PostgresClientCounter,
     client,  # noqa: F401
@@ -98,3 +102,81 @@ class TestSyncMethods:
                 )
 
                 assert res == {"user_id": 3, "name": "test-123"}
+
+    def test_transaction_rolled_back_on_error(self) -> None:
+        client = PostgresClient(get_creds())  # noqa: F811
+
+        with client.start_session() as session:
+            with pytest.raises(ValueError):
+                with session.start_transaction() as tx:
+                    tx.execute(
+                        "update pnorm__sync__tests set name = 'rolled back' where user_id = 3"
+                    )
+                    assert tx._async_client.connection is not None
+                    asyncio.run(tx._async_client.connection.close())
+                    raise ValueError("Failed")
+
+            assert isinstance(session._async_client.cursor, SingleCommitCursor)
+            res = session.get(dict, "select name from pnorm__sync__tests where user_id = 3")
+            assert res["name"] != "rolled back"
+
+    def test_run_transaction(self) -> None:
+        client = PostgresClient(get_creds()) # noqa: F811
+        attempts = 0
+
+        def insert(tx: PostgresClient) -> dict:
+            nonlocal attempts
+            attempts += 1
+
+            if attempts == 1:
+                tx.execute(
+                    "do $$ begin raise exception 'conflict' using errcode = 'serialization_failure'; end $$"
+                )
+
+            tx.execute(
+                "delete from pnorm__sync__tests where user_id = %(user_id)s",
+                {"user_id": 5},
+            )
+            tx.execute(
+                "insert into pnorm__sync__tests (user_id, name) values (%(user_id)s, 'test-retried')",
+                {"user_id": 5},
+            )
+            return tx.get(
+                dict,
+                "select * from pnorm__sync__tests where user_id = %(user_id)s",
+                {"user_id": 5},
+            )
+
+        res = client.run_transaction(insert, backoff=0.01)
+
+        assert attempts == 2
+        assert res == {"user_id": 5, "name": "test-retried"}
+
+    def test_sync_gather_select(self) -> None:
+        client = PostgresClient(get_creds())  # noqa: F811
+        res = client.gather_select(
+            dict,
+            "select * from pnorm__sync__tests where user_id in (1, 3) order by user_id",
+            targets=[get_creds(), get_creds()],
+            order_by="user_id",
+        )
+
+        assert [row["user_id"] for row in res] == [1, 1, 3, 3]
+
+    def test_sync_execute_many(self) -> None:
+        client = PostgresClient(get_creds())  # noqa: F811
+        executed = client.execute_many(
+            "insert into pnorm__sync__tests (user_id, name) values (%(user_id)s, 'test') on conflict do nothing",
+            ({"user_id": user_id} for user_id in (1, 3)),
+            chunk_size=1,
+        )
+
+        assert executed == 2
+
+    def test_sync_execute_in_batches(self) -> None:
+        client = PostgresClient(get_creds())  # noqa: F811
+        rows = client.execute_in_batches(
+            "delete from pnorm__sync__tests where user_id < 0 and %(batch_size)s > 0",
+        )
+
+        assert rows == 0
@@ -80,3 +80,77 @@ class TestTransactions:
             assert res is None
 
         assert client.check_connections() == 1
+
+    @pytest.mark.asyncio
+    async def test_transaction_options(self) -> None:
+        client = get_client() # noqa: F811
+
+        async with client.start_session() as session:
+            async with session.start_transaction(
+                isolation="serializable",
+                read_only=True,
+                deferrable=True,
+                synchronous_commit="off",
+            ) as tx:
+                settings = await tx.get(
+                    dict,
+                    """
+                    select
+                        current_setting('transaction_isolation') as isolation,
+                        current_setting('transaction_read_only') as read_only,
+                        current_setting('transaction_deferrable') as deferrable,
+                        current_setting('synchronous_commit') as synchronous_commit
+                    """,
+                )
+
+            assert settings == {
+                "isolation": "serializable",
+                "read_only": "on",
+                "deferrable": "on",
+                "synchronous_commit": "off",
+            }
+
+            # Only applied to the transaction
+            settings = await session.get(
+                dict,
+                """
+                select
+                    current_setting('transaction_isolation') as isolation,
+                    current_setting('synchronous_commit') as synchronous_commit
+                """,
+            )
+
+            assert settings == {
+                "isolation": "read committed",
+                "synchronous_commit": "on",
+            }
+
+        assert client.check_connections() == 1
+
+    @pytest.mark.asyncio
+    async def test_read_only_transaction(self) -> None:
+        client = get_client() # noqa: F811
+
+        async with client.start_session() as session:
+            with pytest.raises(psycopg.errors.ReadOnlySqlTransaction):
+                async with session.start_transaction(read_only=True) as tx:
+                    await tx.execute(
+                        "insert into pnorm__transactions__tests (user_id, name) values (7, 'test')",
+                    )
+
+            res = await session.find(
+                dict,
+                "select * from pnorm__transactions__tests where user_id = %(user_id)s",
+                {"user_id": 7},
+            )
+
+            assert res is None
+
+    @pytest.mark.asyncio
+    async def test_invalid_isolation(self, client: PostgresClientCounter) -> None: # noqa: F811
+        async with client.start_session() as session:
+            with pytest.raises(ValueError):
+                async with session.start_transaction(isolation="snapshot"): # type: ignore
+                    ...
+
+            assert await session.get(dict, "select 1 as value") == {"value": 1}
@@ -0,0 +1,130 @@
+import pytest
+
+from pnorm import QueryContext
+from pnorm.hooks.attributes import REDACTED, TelemetryOptions, get_query_attributes
+from pnorm.hooks.base import HookContext
+from pnorm.hooks.opentelemetry import SpanHook
+from tests.fixutres.client_counter import PostgresClientCounter, get_creds
+from tests.utils.telemetry import capture_spans
+
+pytest_plugins = ("pytest_asyncio",)
+
+
+def parameter_attributes(attributes: dict) -> dict:
+    return {
+        key: value
+        for key, value in attributes.items()
+        if key.startswith("db.operation.parameter.")
+    }
+
+
+class TestParameterAttributes:
+    def test_max_param_rows(self) -> None:
+        params = [{"user_id": i} for i in range(50_000)]
+
+        attributes = get_query_attributes(
+            "insert into users (user_id) values (%(user_id)s)",
+            params,
+            options=TelemetryOptions(max_param_rows=2),
+        )
+
+        assert parameter_attributes(attributes) == {
+            "db.operation.parameter.0.user_id": 0,
+            "db.operation.parameter.1.user_id": 1,
+        }
+
+    def test_max_params(self) -> None:
+        params = [{"user_id": i, "name": f"user-{i}"} for i in range(10)]
+
+        attributes = get_query_attributes(
+            "insert into users (user_id, name) values (%(user_id)s, %(name)s)",
+            params,
+            options=TelemetryOptions(max_params=3),
+        )
+
+        assert parameter_attributes(attributes) == {
+            "db.operation.parameter.0.user_id": 0,
+            "db.operation.parameter.0.name": "user-0",
+            "db.operation.parameter.1.user_id": 1,
+        }
+
+    def test_unbounded(self) -> None:
+        params = [{"user_id": i} for i in range(20)]
+
+        attributes = get_query_attributes(
+            "insert into users (user_id) values (%(user_id)s)",
+            params,
+            options=TelemetryOptions(max_param_rows=None, max_params=None),
+        )
+
+        assert len(parameter_attributes(attributes)) == 20
+
+    def test_redact(self) -> None:
+        attributes = get_query_attributes(
+            "select * from users where email = %(email)s and id = %(id)s",
+            {"email": "test@example.com", "id": 1},
+            options=TelemetryOptions(redact={"email"}),
+        )
+
+        assert parameter_attributes(attributes) == {
+            "db.operation.parameter.email": REDACTED,
+            "db.operation.parameter.id": 1,
+        }
+
+    def test_truncate(self) -> None:
+        attributes = get_query_attributes(
+            "insert into documents (body, tags) values (%(body)s, %(tags)s)",
+            {"body": "a" * 100, "tags": ["b" * 100]},
+            options=TelemetryOptions(max_value_length=10),
+        )
+
+        assert parameter_attributes(attributes) == {
+            "db.operation.parameter.body": "a" * 10,
+            "db.operation.parameter.tags": "['" + "b" * 8,
+        }
+
+
+class TestSampling:
+    def test_sample_rate_by_operation(self) -> None:
+        options = TelemetryOptions(sample_rate=0, sample_rates={"SELECT": 1})
+
+        assert options.should_sample(QueryContext(operation_name="SELECT"))
+        assert not options.should_sample(QueryContext(operation_name="INSERT"))
+        assert not options.should_sample(None)
+
+    def test_unsampled_context_has_no_parameters(self) -> None:
+        context = HookContext(
+            "select * from users where id = %(id)s",
+            {"id": 1},
+            options=TelemetryOptions(sample_rate=0),
+        )
+
+        assert not context.sampled
+        assert parameter_attributes(context.attributes) == {}
+        assert context.attributes["db.query.text"] == context.query
+
+    @pytest.mark.asyncio
+    async def test_unsampled_query_has_no_span(self) -> None:
+        client = PostgresClientCounter(
+            get_creds(),
+            telemetry_options=TelemetryOptions(sample_rates={"INSERT": 0}),
+        )
+
+        with capture_spans() as exporter:
+            await client.select(
+                dict,
+                "select 1 as one",
+                query_context=QueryContext(operation_name="SELECT"),
+                hooks=[SpanHook()],
+            )
+            await client.select(
+                dict,
+                "select 1 as one",
+                query_context=QueryContext(operation_name="INSERT"),
+                hooks=[SpanHook()],
+            )
+
+        spans = exporter.get_finished_spans()
+        assert len(spans) == 1
+        assert spans[0].attributes is not None
+        assert spans[0].attributes["db.operation.name"] == "SELECT"
@@ -0,0 +1,388 @@
+import asyncio
+from typing import Any
+
+import psycopg
+import pytest
+
+from pnorm import MultipleRecordsReturnedException, QueryContext
+from pnorm.hooks.attributes import fingerprint_query
+from pnorm.hooks.base import BaseHook, HookContext, QueryPhase
+from pnorm.hooks.opentelemetry import (
+    OpenTelemetryHook,
+    RequestsCounterHook,
+    RequestsFailureHook,
+    RequestsPhaseTimingHook,
+    RequestsSuccessHook,
+    RequestsTimingHook,
+    SpanHook,
+)
+from tests.fixutres.client_counter import (  # noqa: F401
+    PostgresClientCounter,
+    client,
+    get_creds,
+)
+from tests.utils.telemetry import assert_span, capture_spans, get_metric_points
+
+pytest_plugins = ("pytest_asyncio",)
+
+
+class ContextRecorderHook(BaseHook):
+    def __init__(self) -> None:
+        self.contexts: list[HookContext] = []
+
+    def pre_query(self, context: HookContext) -> None:
+        self.contexts.append(context)
+
+    def post_query(self, context: HookContext, *args, **kwargs) -> None:
+        self.contexts.append(context)
+
+
+class StateRecorderHook(BaseHook[int]):
+    def __init__(self) -> None:
+        self.started = 0
+        self.states: list[int] = []
+
+    def pre_query(self, context: HookContext) -> int:
+        self.started += 1
+        return self.started
+
+    def post_query(self, context: HookContext, state: int, *args, **kwargs) -> None:
+        self.states.append(state)
+
+
+class PhaseRecorderHook(BaseHook[None]):
+    def __init__(self) -> None:
+        self.events: list[str] = []
+        self.timestamps: list[float] = []
+
+    def on_phase(
+        self,
+        context: HookContext,
+        state: None,
+        phase: QueryPhase,
+        timestamp: float,
+    ) -> None:
+        self.events.append(phase)
+        self.timestamps.append(timestamp)
+
+    def post_query(self, context: HookContext, *args, **kwargs) -> None:
+        self.events.append("post_query")
+
+    def on_exception(self, context: HookContext, *args, **kwargs) -> None:
+        self.events.append("on_exception")
+
+
+def get_points(name: str, query: str) -> list[Any]:
+    return [
+        point
+        for point in get_metric_points(name)
+        if point.attributes.get("db.query.fingerprint") == fingerprint_query(query)
+    ]
+
+
+def get_point(name: str, query: str) -> Any:
+    points = get_points(name, query)
+    assert len(points) == 1
+    return points[0]
+
+
+class TestHookContext:
+    def test_attributes_computed_once(self) -> None:
+        context = HookContext(
+            "select * from users where id = %(id)s",
+            {"id": 1},
+            QueryContext(primary_table_name="users"),
+        )
+
+        assert context.attributes is context.attributes
+        assert context.attributes["db.operation.parameter.id"] == 1
+        assert context.attributes["db.collection.name"] == "users"
+
+    @pytest.mark.asyncio
+    async def test_context_shared_across_hooks(
+        self,
+        client: PostgresClientCounter,  # noqa: F811
+    ) -> None:
+        first = ContextRecorderHook()
+        second = ContextRecorderHook()
+
+        await client.select(dict, "select 1 as one", hooks=[first, second])
+
+        assert len(first.contexts) == 2
+        assert all(context is first.contexts[0] for context in first.contexts)
+        assert all(context is first.contexts[0] for context in second.contexts)
+
+
+class TestOpenTelemetryHook:
+    @pytest.mark.asyncio
+    async def test_records_span_and_metrics(
+        self,
+        client: PostgresClientCounter,  # noqa: F811
+    ) -> None:
+        query = "select %(value)s::int as value -- open telemetry hook"
+
+        with assert_span(
+            {
+                "attributes": {
+                    "db.system.name": "postgresql",
+                    "db.query.text": query,
+                    "db.operation.parameter.value": 1,
+                    "db.response.returned_rows": 1,
+                    "db.operation.batch.size": 1,
+                }
+            }
+        ):
+            await client.select(
+                dict,
+                query,
+                {"value": 1},
+                hooks=[OpenTelemetryHook()],
+            )
+
+        assert get_point("database_requests_total", query).value == 1
+        assert get_point("database_requests_success", query).value == 1
+        assert get_point("database_requests_duration", query).count == 1
+        assert get_points("database_requests_failure", query) == []
+
+    @pytest.mark.asyncio
+    async def test_records_failure(
+        self,
+        client: PostgresClientCounter,  # noqa: F811
+    ) -> None:
+        query = "select 1 as value from generate_series(1, 2) -- open telemetry failure"
+
+        with pytest.raises(MultipleRecordsReturnedException):
+            await client.get(dict, query, hooks=[OpenTelemetryHook()])
+
+        assert get_point("database_requests_total", query).value == 1
+        assert get_point("database_requests_failure", query).value == 1
+
+    @pytest.mark.asyncio
+    async def test_standalone_hooks_record_failure(
+        self,
+        client: PostgresClientCounter,  # noqa: F811
+    ) -> None:
+        query = "select * from not_a_table -- standalone hooks failure"
+
+        with pytest.raises(psycopg.errors.UndefinedTable):
+            await client.select(
+                dict,
+                query,
+                hooks=[
+                    RequestsCounterHook(),
+                    RequestsSuccessHook(),
+                    RequestsFailureHook(),
+                    RequestsTimingHook(),
+                ],
+            )
+
+        failure = get_point("database_requests_failure", query)
+        assert failure.value == 1
+        assert failure.attributes["error.type"] == "UndefinedTable"
+        assert get_point("database_requests_total", query).value == 1
+        assert get_point("database_requests_duration", query).count == 1
+        assert get_points("database_requests_success", query) == []
+
+
+class TestHookState:
+    @pytest.mark.asyncio
+    async def test_state_passed_to_post_query(
+        self,
+        client: PostgresClientCounter,  # noqa: F811
+    ) -> None:
+        hook = StateRecorderHook()
+
+        await client.select(dict, "select 1 as one", hooks=[hook])
+        await client.select(dict, "select 1 as one", hooks=[hook])
+
+        assert hook.states == [1, 2]
+
+    @pytest.mark.asyncio
+    async def test_concurrent_queries_shared_hooks(self) -> None:
+        hooks: list[BaseHook] = [SpanHook(), OpenTelemetryHook()]
+        slow = PostgresClientCounter(get_creds(), hooks=hooks)
+        fast = PostgresClientCounter(get_creds(), hooks=hooks)
+
+        with capture_spans() as exporter:
+            await asyncio.gather(
+                slow.select(dict, "select 1 as slow from pg_sleep(0.2)"),
+                fast.select(dict, "select 1 as fast"),
+            )
+
+        spans = exporter.get_finished_spans()
+        assert sorted(span.name for span in spans) == [
+            "select 1 as fast",
+            "select 1 as fast",
+            "select 1 as slow from pg_sleep(0.2)",
+            "select 1 as slow from pg_sleep(0.2)",
+        ]
+
+        for span in spans:
+            assert span.attributes is not None
+            assert span.attributes["db.query.text"] == span.name
+            assert span.attributes["db.response.returned_rows"] == 1
+
+        durations = get_points(
+            "database_requests_duration",
+            "select 1 as slow from pg_sleep(0.2)",
+        )
+        assert all(point.min >= 0.2 for point in durations)
+
+
+class TestMetricAttributes:
+    def test_fingerprint_ignores_values(self) -> None:
+        assert fingerprint_query(
+            "select * from users where id = %(id)s and group_id in (1, 2, 3)"
+        ) == fingerprint_query(
+            "SELECT *\n  FROM users\n WHERE id = 7 AND group_id IN (4) -- comment"
+        )
+        assert fingerprint_query("select * from users") != fingerprint_query(
+            "select * from orders"
+        )
+
+    @pytest.mark.asyncio
+    async def test_low_cardinality_by_default(
+        self,
+        client: PostgresClientCounter,  # noqa: F811
+    ) -> None:
+        query = "select %(user_id)s::int as user_id -- low cardinality"
+
+        for user_id in range(3):
+            await client.select(
+                dict,
+                query,
+                {"user_id": user_id},
+                query_context=QueryContext(
+                    primary_table_name="users",
+                    operation_name="SELECT",
+                ),
+                hooks=[RequestsCounterHook(), OpenTelemetryHook()],
+            )
+
+        for name in ["database_requests_total", "database_requests_duration"]:
+            points = get_points(name, query)
+            assert len(points) == 1
+            assert dict(points[0].attributes) == {
+                "db.system.name": "postgresql",
+                "db.query.fingerprint": fingerprint_query(query),
+                "db.collection.name": "users",
+                "db.operation.name": "SELECT",
+                "db.response.result_type": "success",
+            }
+
+        # Both hooks add to the same counter
+        assert get_point("database_requests_total", query).value == 6
+
+    @pytest.mark.asyncio
+    async def test_full_attributes(
+        self,
+        client: PostgresClientCounter,  # noqa: F811
+    ) -> None:
+        query = "select %(user_id)s::int as user_id -- full attributes"
+
+        for user_id in range(3):
+            await client.select(
+                dict,
+                query,
+                {"user_id": user_id},
+                hooks=[RequestsCounterHook(full_attributes=True)],
+            )
+
+        points = [
+            point
+            for point in get_metric_points("database_requests_total")
+            if point.attributes.get("db.query.text") == query
+        ]
+        assert sorted(
+            point.attributes["db.operation.parameter.user_id"] for point in points
+        ) == [0, 1, 2]
+
+
+class TestQueryPhases:
+    @pytest.mark.asyncio
+    async def test_phase_order(
+        self,
+        client: PostgresClientCounter,  # noqa: F811
+    ) -> None:
+        hook = PhaseRecorderHook()
+
+        await client.select(dict, "select 1 as one", hooks=[hook])
+
+        assert hook.events == [
+            "connection_acquired",
+            "execute_sent",
+            "result_received",
+            "fetch_complete",
+            "post_query",
+            "marshal_complete",
+        ]
+        assert hook.timestamps == sorted(hook.timestamps)
+
+    @pytest.mark.asyncio
+    async def test_execute_phases(
+        self,
+        client: PostgresClientCounter,  # noqa: F811
+    ) -> None:
+        hook = PhaseRecorderHook()
+
+        await client.execute("select 1", hooks=[hook])
+
+        assert hook.events == [
+            "connection_acquired",
+            "execute_sent",
+            "result_received",
+            "fetch_complete",
+            "post_query",
+        ]
+
+    @pytest.mark.asyncio
+    async def test_exception_reported(
+        self,
+        client: PostgresClientCounter,  # noqa: F811
+    ) -> None:
+        hook = PhaseRecorderHook()
+
+        with pytest.raises(psycopg.errors.UndefinedTable):
+            await client.select(dict, "select * from not_a_table", hooks=[hook])
+
+        assert hook.events == [
+            "connection_acquired",
+            "execute_sent",
+            "on_exception",
+        ]
+
+    def test_phase_duration(self) -> None:
+        context = HookContext("select 1")
+        acquired = context.record_phase("connection_acquired")
+        sent = context.record_phase("execute_sent")
+
+        assert context.phase_duration("connection_acquired") == (
+            acquired - context.started_at
+        )
+        assert context.phase_duration("execute_sent") == sent - acquired
+
+        with pytest.raises(ValueError):
+            context.phase_duration("fetch_complete")
+
+    @pytest.mark.asyncio
+    async def test_phase_histogram(
+        self,
+        client: PostgresClientCounter,  # noqa: F811
+    ) -> None:
+        query = "select 1 as one from pg_sleep(0.1) -- phase histogram"
+
+        await client.select(dict, query, hooks=[RequestsPhaseTimingHook()])
+
+        phases = {
+            point.attributes["db.query.phase"]: point
+            for point in get_points("database_requests_phase_duration", query)
+        }
+
+        assert set(phases) == {
+            "connection_acquired",
+            "execute_sent",
+            "result_received",
+            "fetch_complete",
+            "marshal_complete",
+        }
+        assert phases["result_received"].min >= 0.1
@@ -0,0 +1,69 @@
+from typing import Optional
+
+from pnorm.hooks.base import BaseHook, BatchOperation, HookContext, RetryOperation
+
+
+class QueryRecorderHook(BaseHook[None]):
+    def __init__(self) -> None:
+        self.queries: list[str] = []
+        self.params: list[object] = []
+
+    def pre_query(self, context: HookContext) -> None:
+        self.queries.append(context.query)
+        self.params.append(context.query_params)
+
+
+class ExceptionRecorderHook(BaseHook[None]):
+    def __init__(self) -> None:
+        self.exceptions: list[BaseException] = []
+
+    def on_exception(
+        self,
+        context: HookContext,
+        state: None,
+        exception: BaseException,
+    ) -> None:
+        self.exceptions.append(exception)
+
+
+class RetryRecorderHook(ExceptionRecorderHook):
+    def __init__(self) -> None:
+        super().__init__()
+        self.retries: list[
+            tuple[Optional[HookContext], RetryOperation, int, BaseException, float]
+        ] = []
+
+    def on_retry(
+        self,
+        context: Optional[HookContext],
+        operation: RetryOperation,
+        attempt: int,
+        exception: BaseException,
+        delay: float,
+    ) -> None:
+        self.retries.append((context, operation, attempt, exception, delay))
+
+
+class BatchRecorderHook(BaseHook[None]):
+    def __init__(self) -> None:
+        self.batches: list[tuple[BatchOperation, int, int]] = []
+        self.batch_sizes: list[int] = []
+
+    def post_query(
+        self,
+        context: HookContext,
+        state: None,
+        result_type: object,
+        rows_returned: int,
+        batch_size: int = 1,
+    ) -> None:
+        self.batch_sizes.append(batch_size)
+
+    def on_batch(
+        self,
+        context: HookContext,
+        operation: BatchOperation,
+        batch: int,
+        rows: int,
+    ) -> None:
+        self.batches.append((operation, batch, rows))
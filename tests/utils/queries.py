@@ -0,0 +1,28 @@
+import asyncio
+
+from tests.fixutres.client_counter import get_client
+
+
+async def running_queries(marker: str) -> int:
+    client = get_client()
+
+    result = await client.get(
+        dict,
+        """
+        select count(*) as running from pg_stat_activity
+        where state = 'active' and query like %(marker)s and pid != pg_backend_pid()
+        """,
+        {"marker": f"%{marker}%"},
+    )
+
+    return result["running"]
+
+
+async def wait_for_running(marker: str, running: int) -> None:
+    for _ in range(100):
+        if await running_queries(marker) == running:
+            return
+
+        await asyncio.sleep(0.02)
+
+    raise AssertionError(f"Expected {running} running queries for {marker}")
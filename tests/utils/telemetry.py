@@ -1,8 +1,10 @@
 import json
 from contextlib import contextmanager
-from typing import Any
+from typing import Any, Generator
 
-from opentelemetry import trace
+from opentelemetry import metrics, trace
+from opentelemetry.sdk.metrics import MeterProvider
+from opentelemetry.sdk.metrics.export import InMemoryMetricReader
 from opentelemetry.sdk.trace import TracerProvider
 from opentelemetry.sdk.trace.export import SimpleSpanProcessor
 from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
@@ -10,6 +12,9 @@ from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanE
 trace_provider = TracerProvider()
 trace.set_tracer_provider(trace_provider)
 
+metric_reader = InMemoryMetricReader()
+metrics.set_meter_provider(MeterProvider(metric_readers=[metric_reader]))
+
 
 def test_dict_is_subset(test_dict: dict[str, Any], subset_dict: dict[str, Any]) -> bool:
     for key, value in subset_dict.items():
@@ -30,6 +35,14 @@ def test_dict_is_subset(test_dict: dict[str, Any], subset_dict: dict[str, Any])
     return True
 
 
+@contextmanager
+def capture_spans() -> Generator[InMemorySpanExporter, None, None]:
+    span_exporter = InMemorySpanExporter()
+    trace_provider.add_span_processor(SimpleSpanProcessor(span_exporter))
+
+    yield span_exporter
+
+
 @contextmanager
 def assert_span(expected_span: dict[str, Any]):
     span_exporter = InMemorySpanExporter()
@@ -43,3 +56,20 @@ def assert_span(expected_span: dict[str, Any]):
     assert len(exported) == 1
     print(exported[0].to_json())
     assert test_dict_is_subset(json.loads(exported[0].to_json()), expected_span)
+
+
+def get_metric_points(name: str) -> list[Any]:
+    """Data points recorded for a metric since the meter provider was created"""
+    metrics_data = metric_reader.get_metrics_data()
+
+    if metrics_data is None:
+        return []
+
+    return [
+        point
+        for resource_metric in metrics_data.resource_metrics
+        for scope_metric in resource_metric.scope_metrics
+        for metric in scope_metric.metrics
+        if metric.name == name
+        for point in metric.data.data_points
+    ]